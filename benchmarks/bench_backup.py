@@ -0,0 +1,85 @@
+"""
+Online backup and restore of the seeded catalog. Backups are timed per compression and step
+size, with the writes that committed while each one ran; restoring the snapshot is timed
+against replaying the same catalog through MovieRepo.create into an empty database.
+
+            python -m pytest benchmarks/bench_backup.py --catalog-size 100000
+"""
+import os
+import sqlite3
+import tempfile
+import threading
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from sql_app.migrations import create_schema
+from sql_app.repositories.movie_repository import MovieRepo
+from sql_app.schemas.movie_schema import MovieCreate
+from sqlite_db.backup import backup_database, default_compression, restore_database
+from sqlite_db.sqlite import profile
+
+
+@pytest.fixture(scope="module")
+def snapshot_directory():
+    return tempfile.mkdtemp(prefix="movie-api-backups-")
+
+
+@pytest.mark.parametrize("compression", sorted({default_compression(), "gzip", "none"}))
+@pytest.mark.parametrize("step_pages", [64, 1024, -1])
+def test_backup_with_live_writes(benchmark, snapshot_directory, compression, step_pages):
+    stop = threading.Event()
+    writes = []
+
+    def write():
+        connection = sqlite3.connect(profile.path, timeout=5)
+        while not stop.is_set():
+            with connection:
+                connection.execute("UPDATE movies SET price = price WHERE id = ?", (len(writes) % 1000 + 1,))
+            writes.append(1)
+        connection.close()
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    try:
+        report = benchmark(backup_database, profile.path,
+                           os.path.join(snapshot_directory, f"bench-{step_pages}.db.{compression}"),
+                           compression=compression, step_pages=step_pages)
+    finally:
+        stop.set()
+        writer.join()
+    benchmark.extra_info.update(database_bytes=report.database_bytes, snapshot_bytes=report.snapshot_bytes,
+                                restarts=report.restarts, writes_during_backups=len(writes))
+
+
+@pytest.fixture(scope="module")
+def snapshot(snapshot_directory):
+    return backup_database(profile.path, os.path.join(snapshot_directory, "restore-source"))
+
+
+def test_restore_snapshot(benchmark, snapshot, snapshot_directory):
+    target = os.path.join(snapshot_directory, "restored.db")
+    report = benchmark(restore_database, snapshot.path, target)
+    benchmark.extra_info["pages"] = report.pages
+
+
+def test_replay_through_create(benchmark, snapshot_directory):
+    connection = sqlite3.connect(profile.path)
+    movies = [MovieCreate(title=title, subtitle=subtitle, price=price, description=description)
+              for title, subtitle, price, description in
+              connection.execute("SELECT title, subtitle, price, description FROM movies ORDER BY id")]
+    connection.close()
+
+    def replay():
+        path = tempfile.mktemp(suffix=".db", dir=snapshot_directory)
+        engine = create_engine(f"sqlite:///{path}")
+        create_schema(engine)
+        with Session(engine) as db:
+            for movie in movies:
+                MovieRepo.create(db, movie, commit=False)
+            db.commit()
+        engine.dispose()
+
+    benchmark.pedantic(replay, rounds=1, iterations=1)
+    benchmark.extra_info["movies"] = len(movies)
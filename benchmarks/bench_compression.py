@@ -0,0 +1,45 @@
+"""
+CPU against bytes for each response coding: time to compress a full catalog page and the RSS
+feed, with the compressed size and ratio stored in extra_info. The cached cases measure a hot
+page whose compressed body is served from the precompressed cache.
+
+            python -m pytest benchmarks/bench_compression.py --benchmark-group-by=param:payload
+"""
+import pytest
+from starlette.testclient import TestClient
+
+from main import app
+from sql_app.compression import available_codecs, precompressed
+
+client = TestClient(app)
+CODECS = available_codecs()
+LEVELS = {"gzip": [1, 6, 9], "br": [1, 4, 9], "zstd": [1, 3, 9]}
+PAYLOADS = {"catalog-page": ("/movies", {"limit": 500}), "rss": ("/feeds/rss", {})}
+
+
+@pytest.fixture(scope="module", params=list(PAYLOADS))
+def payload(request):
+    path, params = PAYLOADS[request.param]
+    return client.get(path, params=params, headers={"Accept-Encoding": "identity"}).content
+
+
+@pytest.mark.parametrize("coding,level", [(coding, level) for coding in CODECS for level in LEVELS[coding]])
+def test_compress(benchmark, payload, coding, level):
+    codec = type(CODECS[coding])(level)
+    compressed = benchmark(codec.compress, payload)
+    benchmark.extra_info.update(
+        input_bytes=len(payload), output_bytes=len(compressed), ratio=round(len(payload) / len(compressed), 2)
+    )
+
+
+@pytest.mark.parametrize("coding", ["identity"] + list(CODECS))
+@pytest.mark.parametrize("cached", [False, True], ids=["compressed-per-request", "precompressed"])
+def test_catalog_page_response(benchmark, coding, cached):
+    def fetch():
+        if not cached:
+            precompressed.clear()
+        return client.get("/movies", params={"limit": 500}, headers={"Accept-Encoding": coding})
+
+    response = benchmark(fetch)
+    assert response.status_code == 200
+    benchmark.extra_info["wire_bytes"] = int(response.headers.get("content-length", len(response.content)))
@@ -0,0 +1,112 @@
+"""
+Latency of every endpoint, in process through the ASGI test client, against a throwaway
+database seeded with --catalog-size movies (1000, 100000 or 1000000).
+
+            python -m pytest benchmarks/bench_endpoints.py --catalog-size=100000 --benchmark-save=endpoints
+            python -m pytest benchmarks/bench_endpoints.py --benchmark-compare --benchmark-compare-fail=mean:15%
+
+The peak memory of one call, measured with tracemalloc, is stored per benchmark in extra_info.
+"""
+import itertools
+
+import pytest
+from starlette.testclient import TestClient
+
+from main import app
+from sql_app.pagination import encode_cursor
+
+client = TestClient(app)
+unique = itertools.count()
+
+
+@pytest.fixture(scope="module")
+def headers():
+    response = client.post("/keys", json={"domain": f"http://bench-{next(unique)}.test"})
+    return {"authorization": "Bearer " + response.json()["public"]}
+
+
+def _movie_payload():
+    number = next(unique)
+    return {"title": f"Benchmark {number}", "subtitle": "Write path", "price": 9.99, "description": "Created"}
+
+
+def _created_movie_id(headers) -> int:
+    return client.post("/movies", json=_movie_payload(), headers=headers).json()["id"]
+
+
+def _run(benchmark, record_peak_memory, operation, expected_status=200):
+    response = benchmark(operation)
+    assert response.status_code == expected_status
+    record_peak_memory(operation)
+
+
+class TestReadEndpoints:
+
+    def test_home(self, benchmark, record_peak_memory):
+        _run(benchmark, record_peak_memory, lambda: client.get("/"))
+
+    def test_movies_page(self, benchmark, record_peak_memory):
+        _run(benchmark, record_peak_memory, lambda: client.get("/movies", params={"limit": 500}))
+
+    def test_movies_deep_page(self, benchmark, record_peak_memory, catalog_size):
+        cursor = encode_cursor(catalog_size - 50)
+        _run(benchmark, record_peak_memory, lambda: client.get("/movies", params={"cursor": cursor}))
+
+    def test_movie_by_id(self, benchmark, record_peak_memory, catalog_size):
+        ids = itertools.cycle(range(1, catalog_size + 1, max(catalog_size // 997, 1)))
+        _run(benchmark, record_peak_memory, lambda: client.get(f"/movies/{next(ids)}"))
+
+    def test_title_lookup(self, benchmark, record_peak_memory, catalog_size):
+        numbers = itertools.cycle(range(0, catalog_size, max(catalog_size // 997, 1)))
+        _run(benchmark, record_peak_memory, lambda: client.get("/movies", params={"title": f"Movie {next(numbers)}"}))
+
+    def test_search(self, benchmark, record_peak_memory):
+        _run(benchmark, record_peak_memory, lambda: client.get("/movies/search", params={"q": "seeded movie 42"}))
+
+    def test_price_stats(self, benchmark, record_peak_memory):
+        _run(benchmark, record_peak_memory, lambda: client.get("/movies/stats"))
+
+    def test_price_range_page(self, benchmark, record_peak_memory):
+        _run(benchmark, record_peak_memory, lambda: client.get("/movies", params={"min_price": 5, "max_price": 6}))
+
+    def test_rss_feed(self, benchmark, record_peak_memory):
+        _run(benchmark, record_peak_memory, lambda: client.get("/feeds/rss"))
+
+    def test_atom_feed(self, benchmark, record_peak_memory):
+        _run(benchmark, record_peak_memory, lambda: client.get("/feeds/atom"))
+
+    def test_export_stream(self, benchmark, record_peak_memory, catalog_size):
+        if catalog_size > 100000:
+            pytest.skip("full export is measured by the load driver at this size")
+        _run(benchmark, record_peak_memory, lambda: client.get("/movies/export"))
+
+
+class TestWriteEndpoints:
+
+    def test_create_movie(self, benchmark, record_peak_memory, headers):
+        _run(benchmark, record_peak_memory,
+             lambda: client.post("/movies", json=_movie_payload(), headers=headers), expected_status=201)
+
+    def test_update_movie(self, benchmark, record_peak_memory, headers):
+        movie_id = _created_movie_id(headers)
+
+        def update():
+            payload = dict(_movie_payload(), id=movie_id)
+            return client.put(f"/movies/{movie_id}", json=payload, headers=headers)
+
+        _run(benchmark, record_peak_memory, update)
+
+    def test_delete_movie(self, benchmark, record_peak_memory, headers):
+        def setup():
+            return (_created_movie_id(headers),), {}
+
+        def delete(movie_id):
+            return client.delete(f"/movies/{movie_id}", headers=headers)
+
+        response = benchmark.pedantic(delete, setup=setup, rounds=50)
+        assert response.status_code == 200
+        record_peak_memory(lambda: delete(_created_movie_id(headers)))
+
+    def test_create_api_key(self, benchmark, record_peak_memory):
+        _run(benchmark, record_peak_memory,
+             lambda: client.post("/keys", json={"domain": f"http://bench-{next(unique)}.test"}), expected_status=201)
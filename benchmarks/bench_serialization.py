@@ -0,0 +1,79 @@
+"""
+List response serialization: FastAPI's response_model path against the row tuple + orjson
+path used by GET / and GET /movies.
+
+            python -m pytest benchmarks/bench_serialization.py --benchmark-columns=mean,median,ops
+"""
+import asyncio
+from typing import List
+
+import pytest
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from sql_app.fast_json import encode_movie_rows
+from sql_app.models.movie_model import Movie as MovieModel
+from sql_app.repositories.movie_repository import MovieRepo
+from sql_app.schemas.movie_schema import Movie
+from sqlite_db.sqlite import Base
+
+PAGE_SIZES = [50, 500]
+
+
+def fetch_page(db, limit: int = 50):
+    """
+    The first ``limit`` movies as ORM objects, the input the response_model path expects
+    """
+    return db.query(MovieModel).order_by(MovieModel.id).limit(limit).all()
+
+
+@pytest.fixture(scope="module")
+def db():
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.bulk_insert_mappings(MovieModel, [
+        {"title": f"Movie {number}", "subtitle": f"Part {number % 7}", "price": number / 4,
+         "description": "A benchmark movie with a description of typical length for the catalog"}
+        for number in range(max(PAGE_SIZES))
+    ])
+    session.commit()
+    yield session
+    session.close()
+
+
+@pytest.fixture(scope="module")
+def event_loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.mark.parametrize("page_size", PAGE_SIZES)
+def test_response_model_path(benchmark, db, event_loop, page_size):
+    field = create_response_field(name="Response_movies", type_=List[Movie])
+
+    def serialize():
+        movies = fetch_page(db, limit=page_size)
+        content = event_loop.run_until_complete(serialize_response(field=field, response_content=movies))
+        return JSONResponse(content).body
+
+    assert len(benchmark(serialize)) > 0
+
+
+@pytest.mark.parametrize("page_size", PAGE_SIZES)
+def test_row_tuple_orjson_path(benchmark, db, event_loop, page_size):
+    def serialize():
+        return encode_movie_rows(MovieRepo.fetch_page_rows(db, limit=page_size))
+
+    assert len(benchmark(serialize)) > 0
+
+
+def test_paths_produce_the_same_document(db, event_loop):
+    field = create_response_field(name="Response_movies", type_=List[Movie])
+    content = event_loop.run_until_complete(serialize_response(field=field, response_content=fetch_page(db)))
+    assert encode_movie_rows(MovieRepo.fetch_page_rows(db)) == JSONResponse(content).body
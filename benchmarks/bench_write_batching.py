@@ -0,0 +1,36 @@
+"""
+Concurrent movie creates through the write batcher, grouped into shared commits, against one
+commit per write (WRITE_BATCH_MAX=1).
+
+            python -m pytest benchmarks/bench_write_batching.py --benchmark-group-by=param:concurrency
+"""
+import asyncio
+import itertools
+
+import pytest
+
+from sql_app.repositories.movie_repository import MovieRepo
+from sql_app.schemas.movie_schema import MovieCreate
+from sql_app.write_batcher import WriteBatcher
+
+unique = itertools.count()
+
+
+def _create_concurrently(batcher: WriteBatcher, concurrency: int):
+    async def scenario():
+        movies = [
+            MovieCreate(title=f"Batched {next(unique)}", subtitle="Write batching", price=3.5, description="Created")
+            for _ in range(concurrency)
+        ]
+        return await asyncio.gather(*(batcher.submit(MovieRepo.create, movie) for movie in movies))
+
+    return asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("concurrency", [8, 64])
+@pytest.mark.parametrize("max_batch", [1, 64], ids=["commit-per-write", "group-commit"])
+def test_concurrent_creates(benchmark, concurrency, max_batch):
+    batcher = WriteBatcher(max_batch=max_batch)
+    created = benchmark(_create_concurrently, batcher, concurrency)
+    assert all(movie is not None for movie in created)
+    benchmark.extra_info["commits_per_round"] = round(batcher.batches / max(batcher.writes / concurrency, 1), 1)
@@ -0,0 +1,49 @@
+import os
+import tempfile
+import tracemalloc
+
+import pytest
+
+from benchmarks.seed import CATALOG_SIZES, seed_database
+
+
+def pytest_addoption(parser):
+    parser.addoption("--catalog-size", type=int, default=CATALOG_SIZES[0], choices=CATALOG_SIZES,
+                     help="number of movies seeded into the throwaway benchmark database")
+
+
+def pytest_configure(config):
+    # benchmarks measure the endpoints, not the limiter; set RATE_LIMIT_ENABLED=1 to include it
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+    # must happen before any benchmark module imports main and builds the engines
+    if config.getoption("--catalog-size", default=None) is not None and "SQLITE_PATH" not in os.environ:
+        size = config.getoption("--catalog-size")
+        path = os.path.join(tempfile.mkdtemp(prefix="movie-api-bench-"), f"catalog-{size}.db")
+        seed_database(path, size)
+        os.environ["SQLITE_PATH"] = path
+        os.environ["BENCH_CATALOG_SIZE"] = str(size)
+
+
+@pytest.fixture(scope="session")
+def catalog_size() -> int:
+    return int(os.environ.get("BENCH_CATALOG_SIZE", CATALOG_SIZES[0]))
+
+
+@pytest.fixture
+def record_peak_memory(benchmark):
+    """
+    Run the operation once more under tracemalloc and attach its peak allocation to the
+    benchmark's extra_info, which --benchmark-json and --benchmark-save keep
+    """
+
+    def record(operation):
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        try:
+            operation()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        benchmark.extra_info["tracemalloc_peak_kib"] = round(peak / 1024, 1)
+
+    return record
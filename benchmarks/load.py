@@ -0,0 +1,249 @@
+"""
+Concurrent load driver: starts uvicorn on a seeded throwaway database, drives every
+scenario with keep-alive client threads for a fixed duration and reports throughput and
+p50/p95/p99 latency.
+
+            python -m benchmarks.load --catalog-size 100000 --concurrency 32 --duration 10 \
+                --save benchmarks/baselines/catalog-100000.json
+            python -m benchmarks.load --catalog-size 100000 --compare benchmarks/baselines/catalog-100000.json
+
+--compare exits with status 1 when a scenario loses more than --tolerance of its baseline
+throughput or its p95/p99 latency grows by more than that fraction.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.client import HTTPConnection
+from typing import Callable, Dict, Tuple
+
+from benchmarks.seed import CATALOG_SIZES, REPOSITORY_ROOT, seed_database
+
+unique = itertools.count()
+
+
+class Client:
+    """
+    One keep-alive HTTP connection, used by a single driver thread
+    """
+
+    def __init__(self, port: int):
+        self.port = port
+        self.connection = HTTPConnection("127.0.0.1", port, timeout=30)
+
+    def request(self, method: str, path: str, payload=None, headers=None) -> Tuple[int, bytes, float]:
+        body = None if payload is None else json.dumps(payload).encode("utf-8")
+        headers = dict(headers or {}, **({"Content-Type": "application/json"} if body is not None else {}))
+        started = time.perf_counter()
+        try:
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            content = response.read()
+        except (OSError, ConnectionError):
+            self.connection.close()
+            self.connection = HTTPConnection("127.0.0.1", self.port, timeout=30)
+            return 599, b"", time.perf_counter() - started
+        return response.status, content, time.perf_counter() - started
+
+
+class Context:
+
+    def __init__(self, catalog_size: int, headers: dict):
+        self.catalog_size = catalog_size
+        self.headers = headers
+
+    def movie_id(self) -> int:
+        return next(unique) % self.catalog_size + 1
+
+    def new_movie(self) -> dict:
+        return {"title": f"Load {next(unique)}", "subtitle": "Load", "price": 1.5, "description": "Load test"}
+
+
+def _get(path_for: Callable[[Context], str]):
+    def scenario(client: Client, context: Context) -> Tuple[int, float]:
+        status, _, elapsed = client.request("GET", path_for(context))
+        return status, elapsed
+
+    return scenario
+
+
+def _create_movie(client: Client, context: Context) -> Tuple[int, float]:
+    status, _, elapsed = client.request("POST", "/movies", context.new_movie(), context.headers)
+    return status, elapsed
+
+
+def _update_movie(client: Client, context: Context) -> Tuple[int, float]:
+    movie_id = context.movie_id()
+    payload = dict(context.new_movie(), id=movie_id)
+    status, _, elapsed = client.request("PUT", f"/movies/{movie_id}", payload, context.headers)
+    return status, elapsed
+
+
+def _delete_movie(client: Client, context: Context) -> Tuple[int, float]:
+    # the movie to delete is created first; only the delete is timed
+    _, content, _ = client.request("POST", "/movies", context.new_movie(), context.headers)
+    status, _, elapsed = client.request("DELETE", f"/movies/{json.loads(content)['id']}", None, context.headers)
+    return status, elapsed
+
+
+def _create_api_key(client: Client, context: Context) -> Tuple[int, float]:
+    status, _, elapsed = client.request("POST", "/keys", {"domain": f"http://load-{next(unique)}.test"})
+    return status, elapsed
+
+
+SCENARIOS: Dict[str, Callable[[Client, Context], Tuple[int, float]]] = {
+    "home": _get(lambda context: "/"),
+    "movies_page": _get(lambda context: "/movies?limit=500"),
+    "movie_by_id": _get(lambda context: f"/movies/{context.movie_id()}"),
+    "title_lookup": _get(lambda context: f"/movies?title=Movie%20{context.movie_id() - 1}"),
+    "search": _get(lambda context: "/movies/search?q=seeded%20movie%2042"),
+    "rss_feed": _get(lambda context: "/feeds/rss"),
+    "atom_feed": _get(lambda context: "/feeds/atom"),
+    "create_movie": _create_movie,
+    "update_movie": _update_movie,
+    "delete_movie": _delete_movie,
+    "create_api_key": _create_api_key,
+}
+
+
+def _free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def start_server(database: str, port: int, extra_env=None) -> subprocess.Popen:
+    env = dict(os.environ, SQLITE_PATH=database, **(extra_env or {}))
+    # every load client shares one address and would otherwise be throttled as a single anonymous user
+    env.setdefault("RATE_LIMIT_ENABLED", "0")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=REPOSITORY_ROOT, env=env,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            connection = HTTPConnection("127.0.0.1", port, timeout=1)
+            connection.request("GET", "/movies?limit=1")
+            if connection.getresponse().status == 200:
+                return server
+        except OSError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("uvicorn did not start within 60 seconds")
+
+
+def run_scenario(scenario, port: int, context: Context, concurrency: int, duration: float) -> dict:
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def drive():
+        client = Client(port)
+        local_latencies = []
+        local_errors = 0
+        while time.perf_counter() < deadline:
+            status, elapsed = scenario(client, context)
+            if status >= 400:
+                local_errors += 1
+            local_latencies.append(elapsed)
+        with lock:
+            latencies.extend(local_latencies)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=drive) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    cut_points = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        "requests": len(latencies),
+        "errors": errors[0],
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(cut_points[49] * 1000, 3),
+        "p95_ms": round(cut_points[94] * 1000, 3),
+        "p99_ms": round(cut_points[98] * 1000, 3),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    regressions = []
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if previous is None:
+            continue
+        if current["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {current['throughput_rps']} < {previous['throughput_rps']} rps")
+        for percentile in ("p95_ms", "p99_ms"):
+            if current[percentile] > previous[percentile] * (1 + tolerance):
+                regressions.append(f"{name}: {percentile} {current[percentile]} > {previous[percentile]}")
+    return regressions
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--catalog-size", type=int, default=CATALOG_SIZES[0], choices=CATALOG_SIZES)
+    parser.add_argument("--database", help="reuse an already seeded database instead of seeding a new one")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per scenario")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="default: all of them")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to check the results against")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    database = args.database or seed_database(
+        os.path.join(tempfile.mkdtemp(prefix="movie-api-load-"), f"catalog-{args.catalog_size}.db"), args.catalog_size
+    )
+    port = _free_port()
+    server = start_server(database, port)
+    try:
+        key = json.loads(Client(port).request("POST", "/keys", {"domain": f"http://load-{os.getpid()}.test"})[1])
+        context = Context(args.catalog_size, {"Authorization": f"Bearer {key['public']}"})
+        results = {
+            "catalog_size": args.catalog_size,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "python": platform.python_version(),
+            "scenarios": {},
+        }
+        print(f"{'scenario':<16}{'requests':>10}{'errors':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        for name in args.scenario or SCENARIOS:
+            result = run_scenario(SCENARIOS[name], port, context, args.concurrency, args.duration)
+            results["scenarios"][name] = result
+            print(f"{name:<16}{result['requests']:>10}{result['errors']:>8}{result['throughput_rps']:>10}"
+                  f"{result['p50_ms']:>10}{result['p95_ms']:>10}{result['p99_ms']:>10}")
+    finally:
+        server.terminate()
+        server.wait()
+
+    if args.save:
+        with open(args.save, "w") as baseline_file:
+            json.dump(results, baseline_file, indent=2)
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
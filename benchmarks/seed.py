@@ -0,0 +1,30 @@
+import os
+import sqlite3
+import subprocess
+import sys
+
+REPOSITORY_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CATALOG_SIZES = [1000, 100000, 1000000]
+
+
+def seed_database(path: str, size: int, batch_size: int = 10000) -> str:
+    """
+    Create a fresh database at ``path`` through ``manage.py migrate`` and load ``size``
+    movies into it with executemany, firing the same triggers as the API would
+    """
+    env = dict(os.environ, SQLITE_PATH=path)
+    subprocess.run([sys.executable, "manage.py", "migrate"], cwd=REPOSITORY_ROOT, env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+    connection = sqlite3.connect(path)
+    with connection:
+        for start in range(0, size, batch_size):
+            connection.executemany(
+                "INSERT INTO movies (title, subtitle, price, description) VALUES (?, ?, ?, ?)",
+                (
+                    (f"Movie {number}", f"Part {number % 13}", round(number % 5000 / 4, 2),
+                     f"Seeded movie number {number} for benchmarking the catalog")
+                    for number in range(start, min(start + batch_size, size))
+                ),
+            )
+    connection.close()
+    return path
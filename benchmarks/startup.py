@@ -0,0 +1,119 @@
+"""
+Startup time: how long a fresh process takes from launch to its first response, against a
+seeded throwaway database whose schema is already migrated.
+
+- import: ``import main`` and the first request through the ASGI test client, in a new
+  interpreter each run
+- uvicorn: a single uvicorn process until it answers over HTTP
+- gunicorn: the preloaded gunicorn master with --workers forked workers (when gunicorn is
+  installed) until one answers
+
+            python -m benchmarks.startup --runs 5
+            python -m benchmarks.startup --catalog-size 100000 --workers 4 --save startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from http.client import HTTPConnection
+
+from benchmarks.load import _free_port
+from benchmarks.seed import CATALOG_SIZES, REPOSITORY_ROOT, seed_database
+
+IMPORT_PROBE = """
+import json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+from starlette.testclient import TestClient
+status = TestClient(main.app).get("/movies?limit=1").status_code
+answered = time.perf_counter()
+print(json.dumps({"import_ms": (imported - started) * 1000, "first_response_ms": (answered - started) * 1000,
+                  "status": status}))
+"""
+
+
+def measure_import(env: dict) -> dict:
+    started = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", IMPORT_PROBE], cwd=REPOSITORY_ROOT, env=env, check=True,
+                            capture_output=True, text=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    assert result.pop("status") == 200
+    result["process_ms"] = (time.perf_counter() - started) * 1000
+    return result
+
+
+def measure_server(command: list, env: dict, port: int) -> dict:
+    started = time.perf_counter()
+    server = subprocess.Popen(command, cwd=REPOSITORY_ROOT, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            try:
+                connection = HTTPConnection("127.0.0.1", port, timeout=1)
+                connection.request("GET", "/movies?limit=1")
+                if connection.getresponse().status == 200:
+                    return {"first_response_ms": (time.perf_counter() - started) * 1000}
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError(f"{command[2]} did not answer within 60 seconds")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def summarize(runs: list) -> dict:
+    return {metric: round(statistics.median(run[metric] for run in runs), 1) for metric in runs[0]}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--catalog-size", type=int, default=CATALOG_SIZES[0], choices=CATALOG_SIZES)
+    parser.add_argument("--database", help="reuse an already seeded database instead of seeding a new one")
+    parser.add_argument("--runs", type=int, default=5, help="medians are reported over this many launches")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn worker processes")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    database = args.database or seed_database(
+        os.path.join(tempfile.mkdtemp(prefix="movie-api-startup-"), f"catalog-{args.catalog_size}.db"),
+        args.catalog_size
+    )
+    env = dict(os.environ, SQLITE_PATH=database, RATE_LIMIT_ENABLED=os.environ.get("RATE_LIMIT_ENABLED", "0"))
+
+    results = {"catalog_size": args.catalog_size, "runs": args.runs, "modes": {}}
+    results["modes"]["import"] = summarize([measure_import(env) for _ in range(args.runs)])
+    servers = {"uvicorn": lambda port: [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+                                        "--log-level", "warning"]}
+    try:
+        import gunicorn  # noqa: F401
+        servers["gunicorn"] = lambda port: [sys.executable, "-m", "gunicorn", "--config", "gunicorn.conf.py",
+                                            "--workers", str(args.workers), "--bind", f"127.0.0.1:{port}",
+                                            "main:app"]
+    except ImportError:
+        print("gunicorn is not installed; skipping the gunicorn launch")
+    for name, command in servers.items():
+        runs = []
+        for _ in range(args.runs):
+            port = _free_port()
+            runs.append(measure_server(command(port), env, port))
+        results["modes"][name] = summarize(runs)
+
+    for mode, timings in results["modes"].items():
+        print(f"{mode:<10}" + "".join(f"{metric} {value:>8} ms   " for metric, value in timings.items()))
+    if args.save:
+        with open(args.save, "w") as results_file:
+            json.dump(results, results_file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,18 +1,20 @@
+from datetime import datetime
+
 from feedgenerator import Atom1Feed
 from sqlalchemy.orm import Session
 
+from feeds.feed_cache import as_utc
 from sql_app.repositories.movie_repository import MovieRepo
 
 
 class LatestAtomFeed(Atom1Feed):
-    title: str
-    price: float
-    feed_type = Atom1Feed
-    subtitle: str
+    title = "Movie API Server"
+    subtitle = "Latest movies added to the catalog"
+    max_items = 50
 
     @staticmethod
     def items(db: Session):
-        return MovieRepo.fetch_all(db)
+        return MovieRepo.fetch_latest(db, limit=LatestAtomFeed.max_items)
 
     @staticmethod
     def item_title(item):
@@ -25,3 +27,21 @@ class LatestAtomFeed(Atom1Feed):
     @staticmethod
     def item_price(item):
         return item.price
+
+    def latest_post_date(self):
+        # the catalog's newest change rather than the time of rendering, which differs per worker
+        return self.feed["updated"]
+
+    @classmethod
+    def render(cls, db: Session, base_url: str, updated: datetime) -> bytes:
+        feed = cls(title=cls.title, link=base_url, description=cls.subtitle, subtitle=cls.subtitle,
+                   feed_url=f"{base_url}feeds/atom", updated=updated)
+        for item in cls.items(db):
+            feed.add_item(
+                title=cls.item_title(item),
+                link=f"{base_url}movies/{item.id}",
+                description=item.description or cls.item_subtitle(item) or "",
+                unique_id=f"{base_url}movies/{item.id}",
+                updateddate=as_utc(item.updated_at) or updated,
+            )
+        return feed.writeString("utf-8").encode("utf-8")
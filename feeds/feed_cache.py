@@ -0,0 +1,81 @@
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Callable, Dict, Hashable, NamedTuple, Optional
+
+from sqlalchemy.orm import Session
+
+from sql_app.cache.movie_cache import LocalInvalidation, build_invalidation
+from sql_app.conditional import strong_etag
+from sql_app.events import catalog_events
+from sql_app.repositories.movie_repository import MovieRepo
+
+# feed date of an empty catalog
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class RenderedFeed(NamedTuple):
+    body: bytes
+    etag: str
+    last_modified: datetime
+
+
+def as_utc(moment: Optional[datetime]) -> Optional[datetime]:
+    # updated_at is stored as naive UTC
+    return None if moment is None else moment.replace(tzinfo=timezone.utc)
+
+
+class FeedCache:
+    """
+    Rendered feed documents, kept until the catalog changes. A document depends only on
+    the data: its date and Last-Modified are the newest updated_at in the catalog, so every
+    worker renders the same bytes and the same ETag. Rendering happens under a
+    lock so a burst of pollers after an invalidation triggers a single query. At most
+    ``maxsize`` documents are kept, the oldest going first, since every base URL a client
+    sends (see feed_base_url) renders a document of its own. Writes by other workers are
+    noticed through ``invalidation``, as in MovieCache.
+    """
+
+    def __init__(self, maxsize: int = 16, invalidation=None):
+        self.maxsize = maxsize
+        self.invalidation = invalidation or LocalInvalidation()
+        self.renders = 0
+        self._generation = 0
+        self._feeds: Dict[Hashable, RenderedFeed] = {}
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, key: Hashable, render: Callable[[datetime], bytes]) -> RenderedFeed:
+        if self.invalidation.is_stale(db):
+            self.invalidate()
+        feed = self._feeds.get(key)
+        if feed is not None:
+            return feed
+        with self._lock:
+            feed = self._feeds.get(key)
+            if feed is None:
+                generation = self._generation
+                updated = as_utc(MovieRepo.fetch_last_modified(db)) or EPOCH
+                body = render(updated)
+                self.renders += 1
+                feed = RenderedFeed(body=body, etag=strong_etag(body), last_modified=updated)
+                # a write that landed while rendering makes this body stale; serve it once but do not keep it
+                if generation == self._generation:
+                    while len(self._feeds) >= self.maxsize:
+                        del self._feeds[next(iter(self._feeds))]
+                    self._feeds[key] = feed
+        return feed
+
+    def invalidate(self, *_):
+        self._generation += 1
+        self._feeds = {}
+
+
+def feed_base_url(request_base_url: str) -> str:
+    """
+    PUBLIC_BASE_URL when it is set, so links do not depend on the Host header a client sends
+    """
+    return os.environ.get("PUBLIC_BASE_URL") or request_base_url
+
+
+feed_cache = FeedCache(maxsize=int(os.environ.get("FEED_CACHE_SIZE", 16)), invalidation=build_invalidation())
+catalog_events.subscribe(feed_cache.invalidate)
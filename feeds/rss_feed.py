@@ -1,16 +1,19 @@
+from datetime import datetime
+
+from feeds.feed_cache import as_utc
 from sql_app.repositories.movie_repository import MovieRepo
-from feedgenerator import RssFeed
+from feedgenerator import Rss201rev2Feed
 from sqlalchemy.orm import Session
 
 
-class LatestRssFeed(RssFeed):
-    title: str
-    price: float
-    description: str
+class LatestRssFeed(Rss201rev2Feed):
+    title = "Movie API Server"
+    description = "Latest movies added to the catalog"
+    max_items = 50
 
     @staticmethod
     def items(db: Session):
-        return MovieRepo.fetch_all(db)
+        return MovieRepo.fetch_latest(db, limit=LatestRssFeed.max_items)
 
     @staticmethod
     def item_title(item):
@@ -22,4 +25,22 @@ class LatestRssFeed(RssFeed):
 
     @staticmethod
     def item_description(item):
-        return item.description
+        return item.description or ""
+
+    def latest_post_date(self):
+        # the catalog's newest change rather than the time of rendering, which differs per worker
+        return self.feed["updated"]
+
+    @classmethod
+    def render(cls, db: Session, base_url: str, updated: datetime) -> bytes:
+        feed = cls(title=cls.title, link=base_url, description=cls.description, feed_url=f"{base_url}feeds/rss",
+                   updated=updated)
+        for item in cls.items(db):
+            feed.add_item(
+                title=cls.item_title(item),
+                link=f"{base_url}movies/{item.id}",
+                description=cls.item_description(item),
+                unique_id=f"{base_url}movies/{item.id}",
+                updateddate=as_utc(item.updated_at) or updated,
+            )
+        return feed.writeString("utf-8").encode("utf-8")
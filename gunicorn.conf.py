@@ -0,0 +1,54 @@
+"""
+Production server: a gunicorn master that imports the app once and forks uvicorn workers.
+
+            python manage.py migrate
+            python manage.py serve --workers 4
+
+Signals to the master: HUP replaces the workers one by one with fresh ones forked from the
+master (configuration changes, leaked memory); to deploy new code, USR2 starts a new master
+next to the old one, and TERM to the old master then lets its workers finish their requests.
+"""
+import multiprocessing
+import os
+import sys
+
+bind = os.environ.get("BIND", "0.0.0.0:9000")
+# SQLite has a single writer, so past a few processes more workers only add lock contention
+workers = int(os.environ.get("WEB_CONCURRENCY", min(multiprocessing.cpu_count(), 4)))
+worker_class = "uvicorn.workers.UvicornWorker"
+# token buckets in process memory would give every worker a full allowance of its own; set
+# before the app is preloaded, which is when the rate limiter is built
+if workers > 1:
+    os.environ.setdefault("RATE_LIMIT_BACKEND", "sqlite")
+
+# import main once in the master; workers are forked with everything already loaded
+preload_app = True
+
+# a worker asked to stop gets this long to finish in-flight requests; event streams are cut
+# at the deadline and their clients reconnect with Last-Event-ID
+graceful_timeout = int(os.environ.get("GRACEFUL_TIMEOUT", 30))
+timeout = int(os.environ.get("WORKER_TIMEOUT", 60))
+keepalive = int(os.environ.get("KEEPALIVE", 5))
+# recycle workers after this many requests; 0 keeps them for the life of the master
+max_requests = int(os.environ.get("MAX_REQUESTS", 0))
+max_requests_jitter = int(os.environ.get("MAX_REQUESTS_JITTER", 0))
+
+accesslog = os.environ.get("ACCESS_LOG")
+loglevel = os.environ.get("LOG_LEVEL", "info")
+
+
+def post_fork(server, worker):
+    from main import after_fork
+
+    after_fork()
+
+
+def on_starting(server):
+    # also catches a worker count given on the command line (-w) rather than WEB_CONCURRENCY
+    from sql_app.security.rate_limiter import MemoryBuckets, rate_limiter
+
+    if server.cfg.workers > 1 and rate_limiter is not None and isinstance(rate_limiter.buckets, MemoryBuckets):
+        sys.exit(
+            f"RATE_LIMIT_BACKEND=memory would give each of the {server.cfg.workers} workers its own rate limits; "
+            "use RATE_LIMIT_BACKEND=sqlite, or WEB_CONCURRENCY=1"
+        )
@@ -1,27 +1,63 @@
-from typing import List, Optional
+import os
+from datetime import datetime
+from typing import List, Optional, Tuple
 
-import uvicorn
-from fastapi import FastAPI, HTTPException, Depends, Security
+import orjson
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Request, Response, Security
 from fastapi.encoders import jsonable_encoder
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.security.api_key import APIKey as FastApiKey, APIKeyHeader
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from starlette.middleware.cors import CORSMiddleware
 from starlette.status import HTTP_403_FORBIDDEN
 
 from feeds.atom_feed import LatestAtomFeed
+from feeds.feed_cache import RenderedFeed, feed_base_url, feed_cache
 from feeds.rss_feed import LatestRssFeed
-from sql_app.models import movie_model, api_key_model
+from monitoring import collectors  # noqa: F401  registers the cache collectors
+from monitoring.admin import ADMIN_KEY_HEADER, admin_key_matches
+from monitoring.metrics import registry
+from monitoring.middleware import MetricsMiddleware
+from monitoring.profiling import ProfilingMiddleware, profiles
+from monitoring.slow_queries import slow_queries
+from sql_app.bulk_import import import_movies, iter_json_array, iter_ndjson
+from sql_app.cache.api_key_cache import verified_api_keys
+from sql_app.cache.catalog_snapshot import catalog_snapshot
+from sql_app.cache.movie_cache import movie_cache
+from sql_app.change_feed import ChangesCompacted, fetch_changes
+from sql_app.change_stream import change_stream
+from sql_app.compression import CompressionMiddleware
+from sql_app.conditional import catalog_etag, http_date, if_match_fails, is_not_modified, movie_etag
+from sql_app.fast_json import encode_movie_rows
+from sql_app.migrations import create_schema
+from sql_app.movie_query import DEFAULT_SORT, MovieFilter, SortKey, format_sort, parse_sort
+from sql_app.pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, decode_keys_cursor, encode_cursor, encode_keys_cursor
+)
+from sql_app.projection import parse_fields, parse_ids, project_json, select_fields
 from sql_app.repositories.api_key_repository import ApiKeyRepo
-from sql_app.repositories.movie_repository import MovieRepo
-from sql_app.schemas.api_key_schema import ApiKey, ApiKeyCreate, ApiDomain
-from sql_app.schemas.movie_schema import Movie, MovieCreate
-from sqlite_db.sqlite import engine, get_db
+from sql_app.repositories.cached_movie_repository import CachedMovieRepo
+from sql_app.repositories.movie_repository import MOVIE_ROW_FIELDS, MovieRepo
+from sql_app.schemas.api_key_schema import ApiKey, ApiKeyCreate, ApiDomain, ApiKeyRateLimit
+from sql_app.schemas.movie_schema import (
+    BulkMovieReport, Movie, MovieChangePage, MovieCreate, MovieFields, MovieIdsRequest, MoviePriceStats,
+    MovieSearchResult
+)
+from sql_app.security.api_key_verifier import ApiKeyVerifier
+from sql_app.security.rate_limit_middleware import RateLimitMiddleware
+from sql_app.security.rate_limiter import rate_limiter
+from sql_app.streaming import iter_movies_json_array, iter_movies_ndjson
+from sql_app.write_batcher import write_batcher
+from sqlite_db.backup import BACKUP_DIR, DEFAULT_STEP_PAGES, snapshot_name, start_backup
+from sqlite_db.sqlite import async_engine, dispose_after_fork, engine, get_db, profile, read_engine
 
 app = FastAPI(title="Movie API Server",
               description="get more deep info about movies.",
-              debug=True
+              debug=profile.debug
               )
+# innermost, so rejected requests still get CORS headers and are counted in the metrics
+app.add_middleware(RateLimitMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:4200"],
@@ -29,10 +65,30 @@ app.add_middleware(
     allow_headers=["*"],
     allow_credentials=True
 )
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(CompressionMiddleware, minimum_size=int(os.environ.get("COMPRESSION_MIN_SIZE", 1024)))
+# added last so it wraps everything else and times the whole request
+app.add_middleware(MetricsMiddleware)
 
-movie_model.Base.metadata.create_all(bind=engine)
-api_key_model.Base.metadata.create_all(bind=engine)
 api_key_header = APIKeyHeader(name="Authorization", auto_error=False)
+admin_key_header = APIKeyHeader(name=ADMIN_KEY_HEADER, auto_error=False)
+
+
+def after_fork():
+    """
+    Per-worker setup, called by gunicorn.conf.py in every worker forked from the preloaded
+    master: database connections and the rate limiter file must not be shared across processes
+    """
+    dispose_after_fork()
+    if rate_limiter is not None:
+        rate_limiter.after_fork()
+
+
+@app.on_event("shutdown")
+async def dispose_engines():
+    await async_engine.dispose()
+    read_engine.dispose()
+    engine.dispose()
 
 
 async def validate_public_key(api_token: str = Security(api_key_header)):
@@ -44,27 +100,175 @@ async def validate_public_key(api_token: str = Security(api_key_header)):
         )
 
 
+async def require_admin_key(admin_key: str = Security(admin_key_header)):
+    if not admin_key_matches(admin_key):
+        raise HTTPException(
+            status_code=HTTP_403_FORBIDDEN, detail="Could not validate credentials"
+        )
+
+
 @app.exception_handler(Exception)
 def validation_exception_handler(request, err):
     base_error_message = f"Execution Failed: {request.method}: {request.url}"
     return JSONResponse(status_code=400, content={"message": f"{base_error_message}. Detail: {err}"})
 
 
+def validator_headers(etag: str, last_modified: Optional[datetime] = None) -> dict:
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=0, must-revalidate"}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+
+def conditional_response(request: Request, body: bytes, media_type: str, etag: str,
+                         last_modified: Optional[datetime] = None) -> Response:
+    """
+    304 with just the validators when the client's copy is current, the full body otherwise
+    """
+    headers = validator_headers(etag, last_modified)
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+def requested_fields(fields: Optional[str]) -> Tuple[str, ...]:
+    try:
+        return parse_fields(fields)
+    except ValueError as err:
+        raise HTTPException(status_code=400, detail=str(err))
+
+
+def price_bounds(min_price: Optional[float], max_price: Optional[float]):
+    if min_price is not None and max_price is not None and min_price > max_price:
+        raise HTTPException(status_code=400, detail="min_price must not be greater than max_price")
+
+
+def rows_in_price_range(db: Session, min_price: Optional[float], max_price: Optional[float],
+                        after_id: Optional[int], count: int, fields: Tuple[str, ...]) -> list:
+    """
+    Up to ``count`` rows priced within [min_price, max_price] after ``after_id``, in id order.
+    The snapshot's price index picks the ids and the rows come from the database. The snapshot
+    may be ahead of this read transaction, so ids it cannot see are skipped and the prices
+    it sees are checked again.
+    """
+    loaded_fields = fields if "price" in fields else fields + ("price",)
+    rows = []
+    while len(rows) < count:
+        page_ids = catalog_snapshot.ids_in_price_range(db, min_price, max_price, after_id, count - len(rows))
+        if not len(page_ids):
+            break
+        rows.extend(
+            row for row in MovieRepo.fetch_by_ids(db, page_ids.tolist(), loaded_fields)
+            if (min_price is None or row.price >= min_price) and (max_price is None or row.price <= max_price)
+        )
+        after_id = int(page_ids[-1])
+    # encode_movie_rows pairs ``fields`` with the leading columns, so an added price is left out
+    return rows
+
+
+def paginate_movies(db: Session, request: Request, cursor: Optional[str], limit: int,
+                    fields: Tuple[str, ...] = MOVIE_ROW_FIELDS,
+                    min_price: Optional[float] = None, max_price: Optional[float] = None) -> Response:
+    try:
+        after_id = decode_cursor(cursor)
+    except ValueError as err:
+        raise HTTPException(status_code=400, detail=str(err))
+    price_bounds(min_price, max_price)
+    # the version and the page are read in one transaction, so the ETag always matches the body
+    etag = catalog_etag(MovieRepo.fetch_catalog_version(db))
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers=validator_headers(etag))
+    if min_price is None and max_price is None:
+        rows = MovieRepo.fetch_page_rows(db, after_id=after_id, limit=limit + 1, fields=fields)
+    else:
+        rows = rows_in_price_range(db, min_price, max_price, after_id, limit + 1, fields)
+    headers = validator_headers(etag)
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].id)
+        headers["X-Next-Cursor"] = next_cursor
+        next_url = request.url.include_query_params(cursor=next_cursor, limit=limit)
+        headers["Link"] = f'<{next_url}>; rel="next"'
+    return Response(content=encode_movie_rows(rows, fields), media_type="application/json", headers=headers)
+
+
+def requested_sort(sort: Optional[str]) -> Tuple[SortKey, ...]:
+    try:
+        return parse_sort(sort)
+    except ValueError as err:
+        raise HTTPException(status_code=400, detail=str(err))
+
+
+def paginate_sorted_movies(db: Session, request: Request, cursor: Optional[str], limit: int,
+                           fields: Tuple[str, ...], movie_filter: MovieFilter,
+                           sort: Tuple[SortKey, ...]) -> Response:
+    """
+    Keyset pages of the filtered catalog in ``sort`` order. The page is picked from a sort
+    index by its keys alone, then only the rows of that page are read.
+    """
+    sort_spec = format_sort(sort)
+    try:
+        after = decode_keys_cursor(cursor, sort_spec, len(sort))
+    except ValueError as err:
+        raise HTTPException(status_code=400, detail=str(err))
+    price_bounds(movie_filter.min_price, movie_filter.max_price)
+    etag = catalog_etag(MovieRepo.fetch_catalog_version(db))
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers=validator_headers(etag))
+    keys = MovieRepo.fetch_sorted_keys(db, movie_filter, sort, after=after, limit=limit + 1)
+    headers = validator_headers(etag)
+    if len(keys) > limit:
+        keys = keys[:limit]
+        next_cursor = encode_keys_cursor(sort_spec, keys[-1])
+        headers["X-Next-Cursor"] = next_cursor
+        next_url = request.url.include_query_params(cursor=next_cursor, limit=limit)
+        headers["Link"] = f'<{next_url}>; rel="next"'
+    rows = MovieRepo.fetch_by_ids(db, [key[-1] for key in keys], fields)
+    return Response(content=encode_movie_rows(rows, fields), media_type="application/json", headers=headers)
+
+
+def movies_by_ids(db: Session, request: Request, ids: List[int], fields: Tuple[str, ...]) -> Response:
+    etag = catalog_etag(MovieRepo.fetch_catalog_version(db))
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers=validator_headers(etag))
+    rows = MovieRepo.fetch_by_ids(db, ids, fields)
+    return Response(content=encode_movie_rows(rows, fields), media_type="application/json",
+                    headers=validator_headers(etag))
+
+
 @app.get('/', tags=["home"], response_model=List[Movie])
-def home(db: Session = Depends(get_db)):
-    MovieRepo.fetch_all(db)
+def home(request: Request,
+         db: Session = Depends(get_db),
+         cursor: Optional[str] = None,
+         limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+         fields: Optional[str] = None):
+    return paginate_movies(db, request, cursor, limit, requested_fields(fields))
 
 
-@app.get('/feeds/rss', tags=["rss"], response_model=List[Movie])
-def get_rss_feeds(db: Session = Depends(get_db)):
-    rss = LatestRssFeed(title="Hey", price=34.00, description="hello Again", link="")
-    return rss.items(db)
+def feed_response(request: Request, feed: RenderedFeed, media_type: str) -> Response:
+    return conditional_response(request, feed.body, media_type, feed.etag, feed.last_modified)
 
 
-@app.get('/feeds/atom', tags=["atom"], response_model=List[Movie])
-def get_atom_feeds(db: Session = Depends(get_db)):
-    rss = LatestAtomFeed(title="Hey", subtitle="What happened", price=34.00, description="hello Again", link="")
-    return rss.items(db)
+@app.get('/feeds/rss', tags=["rss"], response_class=Response,
+         responses={200: {"content": {"application/rss+xml": {}}}, 304: {"description": "Not Modified"}})
+def get_rss_feeds(request: Request, db: Session = Depends(get_db)):
+    """
+    RSS 2.0 feed of the latest movies, re-rendered only after the catalog changes
+    """
+    base_url = feed_base_url(str(request.base_url))
+    feed = feed_cache.get(db, ("rss", base_url), lambda updated: LatestRssFeed.render(db, base_url, updated))
+    return feed_response(request, feed, LatestRssFeed.mime_type)
+
+
+@app.get('/feeds/atom', tags=["atom"], response_class=Response,
+         responses={200: {"content": {"application/atom+xml": {}}}, 304: {"description": "Not Modified"}})
+def get_atom_feeds(request: Request, db: Session = Depends(get_db)):
+    """
+    Atom feed of the latest movies, re-rendered only after the catalog changes
+    """
+    base_url = feed_base_url(str(request.base_url))
+    feed = feed_cache.get(db, ("atom", base_url), lambda updated: LatestAtomFeed.render(db, base_url, updated))
+    return feed_response(request, feed, LatestAtomFeed.mime_type)
 
 
 @app.post('/movies', tags=["Movie"], response_model=Movie, status_code=201)
@@ -76,42 +280,200 @@ async def create_movie(
     """
     Create a movie and store it in the database
     """
-    db_existing_key = ApiKeyRepo.fetch_by_public(db, api_key[7:])
-    if db_existing_key:
-        db_movie = MovieRepo.fetch_by_title_and_subtitle(db, title=movie_request.title, subtitle=movie_request.subtitle)
-        if db_movie:
-            raise HTTPException(status_code=400, detail="Movie already exists!")
-    else:
+    db_existing_key = await ApiKeyVerifier.verify_in_threadpool(db, api_key)
+    if not db_existing_key:
         raise HTTPException(
             status_code=HTTP_403_FORBIDDEN, detail="Could not validate credentials"
         )
 
-    return await MovieRepo.create(db, movie=movie_request)
+    db_movie = await write_batcher.submit(MovieRepo.create, movie_request)
+    if db_movie is None:
+        raise HTTPException(status_code=400, detail="Movie already exists!")
+    return db_movie
 
 
-@app.get('/movies', tags=["Movie"], response_model=List[Movie])
-def get_all_movies(db: Session = Depends(get_db), title: Optional[str] = None):
+@app.post('/movies/bulk', tags=["Movie"], response_model=BulkMovieReport, openapi_extra={
+    "requestBody": {"required": True, "content": {
+        "application/json": {"schema": {"type": "array", "items": {"$ref": "#/components/schemas/MovieCreate"}}},
+        "application/x-ndjson": {"schema": {"$ref": "#/components/schemas/MovieCreate"}},
+    }}
+})
+async def create_movies_in_bulk(request: Request,
+                                api_key: FastApiKey = Depends(validate_public_key),
+                                db: Session = Depends(get_db)):
     """
-    Get all the Items stored in database
+    Import many movies at once from a JSON array or an NDJSON stream (one movie per line).
+    Each row is reported back as created, duplicate or invalid, in request order.
     """
-    if title:
-        movies = []
-        db_movie = MovieRepo.fetch_by_title(db, title)
-        movies.append(db_movie)
-        return movies
+    db_existing_key = await ApiKeyVerifier.verify_in_threadpool(db, api_key)
+    # the body may take a while to arrive; do not hold a read connection meanwhile
+    db.close()
+    if not db_existing_key:
+        raise HTTPException(
+            status_code=HTTP_403_FORBIDDEN, detail="Could not validate credentials"
+        )
+    if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+        rows = iter_ndjson(request.stream())
     else:
-        return MovieRepo.fetch_all(db)
+        try:
+            rows = iter_json_array(await request.body())
+        except ValueError as err:
+            raise HTTPException(status_code=400, detail=str(err))
+    return await import_movies(rows)
+
+
+@app.get('/movies', tags=["Movie"], response_model=List[MovieFields])
+def get_all_movies(request: Request,
+                   db: Session = Depends(get_db),
+                   title: Optional[str] = None,
+                   ids: Optional[str] = Query(None, description="comma separated movie ids, fetched in one query"),
+                   fields: Optional[str] = Query(None,
+                                                 description="comma separated fields to return; id is always included"),
+                   title_prefix: Optional[str] = Query(None, max_length=100,
+                                                       description="titles starting with this, case sensitive"),
+                   subtitle: Optional[str] = None,
+                   min_price: Optional[float] = None,
+                   max_price: Optional[float] = None,
+                   sort: Optional[str] = Query(None, description="e.g. price,-title; - sorts descending"),
+                   cursor: Optional[str] = None,
+                   limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)):
+    """
+    Get the Items stored in database one page at a time. When more items remain, the
+    X-Next-Cursor header holds the cursor for the next page. With ``ids`` only those movies
+    are returned, in the order given; with ``fields`` every item carries only ``id`` and the
+    listed fields, otherwise all of them. ``min_price`` and ``max_price`` (inclusive) keep
+    the pages to movies in that price range, ``title_prefix`` and ``subtitle`` filter on the
+    title and subtitle. ``sort`` orders the pages by up to two of title and price (``-`` for
+    descending), ties broken by id; the default is id order.
+    """
+    selected = requested_fields(fields)
+    if ids is not None:
+        try:
+            movie_ids = parse_ids(ids)
+        except ValueError as err:
+            raise HTTPException(status_code=400, detail=str(err))
+        return movies_by_ids(db, request, movie_ids, selected)
+    if title:
+        version = MovieRepo.fetch_catalog_version(db)
+        etag = catalog_etag(version)
+        if is_not_modified(request, etag):
+            return Response(status_code=304, headers=validator_headers(etag))
+        body = project_json(CachedMovieRepo.fetch_by_title(db, title, version), selected)
+        return Response(content=body, media_type="application/json", headers=validator_headers(etag))
+    movie_sort = requested_sort(sort)
+    if movie_sort == DEFAULT_SORT and not title_prefix and subtitle is None:
+        return paginate_movies(db, request, cursor, limit, selected, min_price, max_price)
+    movie_filter = MovieFilter(title_prefix, subtitle, min_price, max_price)
+    return paginate_sorted_movies(db, request, cursor, limit, selected, movie_filter, movie_sort)
+
+
+@app.post('/movies/by-ids', tags=["Movie"], response_model=List[MovieFields])
+def get_movies_by_ids(request: Request, ids_request: MovieIdsRequest, db: Session = Depends(get_db)):
+    """
+    Same as GET /movies?ids= for id lists too long for a query string
+    """
+    try:
+        selected = select_fields(ids_request.fields)
+    except ValueError as err:
+        raise HTTPException(status_code=400, detail=str(err))
+    return movies_by_ids(db, request, ids_request.ids, selected)
 
 
-@app.get('/movies/{movie_id}', tags=["Movie"], response_model=Movie)
-def get_movie(movie_id: int, db: Session = Depends(get_db)):
+@app.get('/movies/export', tags=["Movie"], response_model=List[Movie])
+def export_movies(db: Session = Depends(get_db), format: str = Query("ndjson", regex="^(ndjson|json)$")):
     """
-    Get the Item with the given ID provided by User stored in database
+    Stream every Item stored in database, either as NDJSON or as one chunked JSON array
     """
-    db_movie = MovieRepo.fetch_movie_by_id(db, movie_id)
-    if db_movie is None:
+    if format == "json":
+        return StreamingResponse(iter_movies_json_array(db), media_type="application/json")
+    return StreamingResponse(iter_movies_ndjson(db), media_type="application/x-ndjson")
+
+
+@app.get('/movies/search', tags=["Movie"], response_model=List[MovieSearchResult])
+def search_movies(q: str = Query(..., min_length=1, max_length=200),
+                  limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                  offset: int = Query(0, ge=0),
+                  db: Session = Depends(get_db)):
+    """
+    Full-text search over title, subtitle and description, best matches first, with the
+    matching words wrapped in <mark> in each snippet
+    """
+    return MovieRepo.search(db, q, limit=limit, offset=offset)
+
+
+@app.get('/movies/stats', tags=["Movie"], response_model=MoviePriceStats)
+def get_movie_stats(db: Session = Depends(get_db),
+                    min_price: Optional[float] = None,
+                    max_price: Optional[float] = None,
+                    bins: int = Query(10, ge=1, le=100),
+                    percentiles: str = Query("5,25,50,75,95", description="comma separated, between 0 and 100")):
+    """
+    Count, min, max, mean, percentiles and histogram of the movie prices, optionally within a
+    price range. Computed from the in-memory columnar snapshot of the catalog.
+    """
+    price_bounds(min_price, max_price)
+    try:
+        requested = [float(value) for value in percentiles.split(",") if value.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid percentiles: {percentiles}")
+    if any(not 0 <= value <= 100 for value in requested):
+        raise HTTPException(status_code=400, detail="percentiles must be between 0 and 100")
+    return catalog_snapshot.price_stats(db, min_price, max_price, bins=bins, percentiles=requested)
+
+
+@app.get('/movies/changes', tags=["Movie"], response_model=MovieChangePage,
+         responses={410: {"description": "since is older than the compacted part of the log"}})
+def get_movie_changes(since: int = Query(0, ge=0),
+                      limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                      db: Session = Depends(get_db)):
+    """
+    Upserts and tombstones after the change sequence number ``since``. Keep ``next_since``
+    for the next call; repeat while ``has_more``. A 410 means the log no longer reaches back
+    that far: fetch the catalog again, then continue from its X-Latest-Seq header.
+    """
+    try:
+        page = fetch_changes(db, since, limit)
+    except ChangesCompacted as err:
+        raise HTTPException(status_code=410, detail=str(err), headers={"X-Latest-Seq": str(err.latest)})
+    return Response(content=orjson.dumps(page), media_type="application/json")
+
+
+@app.get('/movies/stream', tags=["Movie"], response_class=StreamingResponse,
+         responses={200: {"content": {"text/event-stream": {}}}})
+async def stream_movie_changes(since: Optional[int] = Query(None, ge=0),
+                               last_event_id: Optional[str] = Header(None)):
+    """
+    Server-Sent Events stream of catalog changes, as "upsert" and "delete" events whose id is
+    the change sequence number. Reconnecting clients send Last-Event-ID (or ``since``) and
+    first receive what they missed. A "reset" event means the client fell behind the
+    compacted change log and should refetch the catalog.
+    """
+    if last_event_id is not None:
+        try:
+            since = int(last_event_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Last-Event-ID must be a change sequence number")
+    return StreamingResponse(
+        change_stream.stream(since), media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get('/movies/{movie_id}', tags=["Movie"], response_model=Movie,
+         responses={304: {"description": "Not Modified"}})
+def get_movie(movie_id: int, request: Request, db: Session = Depends(get_db), fields: Optional[str] = None):
+    """
+    Get the Item with the given ID provided by User stored in database. Honours
+    If-None-Match / If-Modified-Since with a 304.
+    """
+    selected = requested_fields(fields)
+    cached = CachedMovieRepo.fetch_movie_by_id(db, movie_id)
+    if cached is None:
         raise HTTPException(status_code=404, detail="Movie not found with the given ID")
-    return db_movie
+    headers = validator_headers(cached.etag, cached.last_modified)
+    if is_not_modified(request, cached.etag, cached.last_modified):
+        return Response(status_code=304, headers=headers)
+    return Response(content=project_json(cached.body, selected), media_type="application/json", headers=headers)
 
 
 @app.delete('/movies/{movie_id}', tags=["Movie"])
@@ -121,38 +483,54 @@ async def delete_movie(movie_id: int,
     """
     Delete the movie with the given ID provided by User stored in database
     """
-    db_existing_key = ApiKeyRepo.fetch_by_public(db, api_key)
-    if db_existing_key:
-        db_movie = MovieRepo.fetch_movie_by_id(db, movie_id)
-        if db_movie is None:
-            raise HTTPException(status_code=404, detail="Movie not found with the given ID")
-    else:
+    db_existing_key = await ApiKeyVerifier.verify_in_threadpool(db, api_key)
+    if not db_existing_key:
         raise HTTPException(
             status_code=HTTP_403_FORBIDDEN, detail="Could not validate credentials"
         )
 
-    await MovieRepo.delete(db, movie_id)
+    # no lookup first: a concurrent delete could still win between it and the DELETE
+    if not await write_batcher.submit(MovieRepo.delete, movie_id):
+        raise HTTPException(status_code=404, detail="Movie not found with the given ID")
     return "Movie deleted successfully!"
 
 
-@app.put('/movies/{movie_id}', tags=["Movie"], response_model=Movie)
+@app.put('/movies/{movie_id}', tags=["Movie"], response_model=Movie,
+         responses={412: {"description": "The movie changed since the If-Match ETag was read"}})
 async def update_movie(movie_id: int,
                        movie_request: Movie,
+                       request: Request,
+                       response: Response,
                        db: Session = Depends(get_db),
                        api_key: FastApiKey = Depends(validate_public_key)):
     """
-    Update a movie saved in the database
+    Update a movie saved in the database. With If-Match, the update only applies while the
+    movie still has that ETag.
     """
-    db_existing_key = ApiKeyRepo.fetch_by_public(db, api_key)
+    db_existing_key = await ApiKeyVerifier.verify_in_threadpool(db, api_key)
     if db_existing_key:
-        db_movie = MovieRepo.fetch_movie_by_id(db, movie_id)
+        db_movie = await run_in_threadpool(MovieRepo.fetch_movie_by_id, db, movie_id)
         if db_movie:
+            current_version = db_movie.version
+            if if_match_fails(request, movie_etag(db_movie.id, current_version)):
+                raise HTTPException(status_code=412, detail="Movie was modified since it was read")
             update_movie_encoded = jsonable_encoder(movie_request)
-            db_movie.title = update_movie_encoded['title']
-            db_movie.subtitle = update_movie_encoded['subtitle']
-            db_movie.price = update_movie_encoded['price']
-            db_movie.description = update_movie_encoded['description']
-            return await MovieRepo.update(db, movie_data=db_movie)
+            movie_data = Movie(
+                id=movie_id,
+                title=update_movie_encoded['title'],
+                subtitle=update_movie_encoded['subtitle'],
+                price=update_movie_encoded['price'],
+                description=update_movie_encoded['description'],
+            )
+            expected_version = current_version if "if-match" in request.headers else None
+            updated_movie = await write_batcher.submit(MovieRepo.update, movie_data, expected_version)
+            if updated_movie is None and expected_version is not None:
+                raise HTTPException(status_code=412, detail="Movie was modified since it was read")
+            if updated_movie is None:
+                # without a version to match, nothing updated means a concurrent delete won
+                raise HTTPException(status_code=404, detail="Movie not found with the given ID")
+            response.headers["ETag"] = movie_etag(updated_movie.id, updated_movie.version)
+            return updated_movie
         else:
             raise HTTPException(status_code=400, detail="Movie not found with the given ID")
     else:
@@ -161,6 +539,99 @@ async def update_movie(movie_id: int,
         )
 
 
+@app.get('/cache/stats', tags=["cache"])
+def get_cache_stats():
+    """
+    Hit, miss and eviction counters of the in-process caches
+    """
+    return {
+        "movies": movie_cache.stats(),
+        "api_keys": {
+            "hits": verified_api_keys.hits,
+            "misses": verified_api_keys.misses,
+            "evictions": verified_api_keys.evictions,
+            "size": len(verified_api_keys),
+        },
+    }
+
+
+@app.get('/metrics', tags=["cache"], include_in_schema=False)
+def get_metrics():
+    """
+    Request, SQL and cache metrics in the Prometheus text format
+    """
+    return Response(registry.render(), media_type=registry.content_type)
+
+
+@app.get('/admin/profiles', tags=["admin"], dependencies=[Depends(require_admin_key)])
+def list_profiles():
+    """
+    Requests profiled on demand with the X-Profile header, most recent first
+    """
+    return [profile.summary() for profile in profiles.recent()]
+
+
+@app.get('/admin/profiles/{profile_id}', tags=["admin"], dependencies=[Depends(require_admin_key)])
+def get_profile(profile_id: str, format: str = Query("json", regex="^(json|raw)$")):
+    """
+    One profile: the report and its SQL statements, or with format=raw the pstats file
+    (cProfile) or folded stacks (sample) for external viewers
+    """
+    profile = profiles.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "raw":
+        extension = "prof" if profile.mode == "cprofile" else "folded"
+        return Response(
+            profile.raw, media_type="application/octet-stream",
+            headers={"Content-Disposition": f'attachment; filename="{profile.id}.{extension}"'}
+        )
+    return profile.as_dict()
+
+
+@app.put('/admin/keys/{domain}/rate-limit', tags=["admin"], response_model=ApiKeyRateLimit,
+         dependencies=[Depends(require_admin_key)])
+async def set_api_key_rate_limit(domain: str, rate_limit: ApiKeyRateLimit):
+    """
+    Set the rate limit of a domain's API key; null values fall back to the server defaults
+    """
+    db_key = await write_batcher.submit(
+        ApiKeyRepo.set_rate_limit, domain, rate_limit.rate_limit_per_minute, rate_limit.rate_limit_burst
+    )
+    if db_key is None:
+        raise HTTPException(status_code=404, detail="Api key not found with the given domain")
+    return db_key
+
+
+@app.get('/admin/slow-queries', tags=["admin"], dependencies=[Depends(require_admin_key)])
+def get_slow_queries():
+    """
+    Statements slower than SQLITE_SLOW_QUERY_MS with their query plans, most recent first
+    """
+    return {
+        "threshold_ms": slow_queries.threshold_ms,
+        "queries": [entry._asdict() for entry in slow_queries.recent()],
+    }
+
+
+@app.post('/admin/backups', tags=["admin"], dependencies=[Depends(require_admin_key)],
+          responses={200: {"content": {"application/x-ndjson": {}}}, 409: {"description": "Backup already running"}})
+async def create_backup(compression: Optional[str] = Query(None, regex="^(zstd|gzip|none)$"),
+                        step_pages: int = Query(DEFAULT_STEP_PAGES, ge=1),
+                        pause_ms: float = Query(0, ge=0, le=1000)):
+    """
+    Online backup of the database into BACKUP_DIR while the API keeps serving. Streams the
+    progress as NDJSON, a line per step of ``step_pages`` pages, then the snapshot's report.
+    """
+    snapshot_path = os.path.join(BACKUP_DIR, snapshot_name(compression))
+    try:
+        progress = start_backup(profile.path, snapshot_path, compression=compression, step_pages=step_pages,
+                                pause=pause_ms / 1000)
+    except RuntimeError as err:
+        raise HTTPException(status_code=409, detail=str(err))
+    return StreamingResponse(progress, media_type="application/x-ndjson")
+
+
 @app.post('/keys', tags=["ApiKey"], response_model=ApiKey, status_code=201)
 async def create_api_key(key_request: ApiKeyCreate, db: Session = Depends(get_db)):
     """
@@ -170,24 +641,24 @@ async def create_api_key(key_request: ApiKeyCreate, db: Session = Depends(get_db
     is_public_key_unique = False
     secret_key = ''
     public_key = ''
-    db_key = ApiKeyRepo.fetch_by_domain(db, domain=key_request.domain)
+    db_key = await run_in_threadpool(ApiKeyRepo.fetch_by_domain, db, key_request.domain)
     if db_key:
         raise HTTPException(status_code=400, detail="Domain already exists!")
 
     while is_secret_key_unique is False and is_public_key_unique is False:
         if is_secret_key_unique is not True:
             secret_key = ApiKeyRepo.generate_secret_key()
-            db_existing_secret = ApiKeyRepo.fetch_by_secret(db, secret=secret_key)
+            db_existing_secret = await run_in_threadpool(ApiKeyRepo.fetch_by_secret, db, secret_key)
             if db_existing_secret is None:
                 is_secret_key_unique = True
         if is_public_key_unique is not True:
             public_key = ApiKeyRepo.generate_public_key()
-            db_existing_public = ApiKeyRepo.fetch_by_public(db, public=public_key)
+            db_existing_public = await run_in_threadpool(ApiKeyRepo.fetch_by_public, db, public_key)
             if db_existing_public is None:
                 is_public_key_unique = True
     key_request.secret = secret_key
     key_request.public = public_key
-    return await ApiKeyRepo.create(db, api_key=key_request)
+    return await write_batcher.submit(ApiKeyRepo.create, key_request)
 
 
 @app.get('/keys/{key_id}', tags=["ApiKey"], response_model=ApiKey)
@@ -197,7 +668,7 @@ def get_key(key_id: int,
     """
     Get the Item with the given ID provided by User stored in database
     """
-    db_existing_key = ApiKeyRepo.fetch_by_public(db, api_key)
+    db_existing_key = ApiKeyVerifier.verify(db, api_key)
     if db_existing_key:
         db_key = ApiKeyRepo.fetch_api_key_by_id(db, key_id)
         if db_key is None:
@@ -216,7 +687,7 @@ def get_key_using_domain(domain: str,
     """
     Get the Item with the given ID provided by User stored in database
     """
-    db_existing_key = ApiKeyRepo.fetch_by_public(db, api_key)
+    db_existing_key = ApiKeyVerifier.verify(db, api_key)
     if db_existing_key:
         db_key = ApiKeyRepo.fetch_by_domain(db, domain)
         if db_key is None:
@@ -235,16 +706,17 @@ async def delete_key(domain: str,
     """
     Delete the key with the given domain provided by User stored in database
     """
-    db_existing_key = ApiKeyRepo.fetch_by_public(db, api_key)
+    db_existing_key = await ApiKeyVerifier.verify_in_threadpool(db, api_key)
     if db_existing_key:
-        db_key = ApiKeyRepo.fetch_by_domain(db, domain)
+        db_key = await run_in_threadpool(ApiKeyRepo.fetch_by_domain, db, domain)
         if db_key is None:
             raise HTTPException(status_code=404, detail="Key not found with the given domain")
     else:
         raise HTTPException(
             status_code=HTTP_403_FORBIDDEN, detail="Could not validate credentials"
         )
-    await ApiKeyRepo.delete(db, domain)
+    if not await write_batcher.submit(ApiKeyRepo.delete, db_key.id):
+        raise HTTPException(status_code=404, detail="Key not found with the given domain")
     return "Key deleted successfully!"
 
 
@@ -253,15 +725,19 @@ async def update_key(domain: int, key_request: ApiKey, db: Session = Depends(get
     """
     Update a key stored in the database
     """
-    db_key = ApiKeyRepo.fetch_by_domain(db, domain)
+    db_key = await run_in_threadpool(ApiKeyRepo.fetch_by_domain, db, domain)
     if db_key:
         update_movie_encoded = jsonable_encoder(key_request)
         db_key.secret = update_movie_encoded['title']
         db_key.public = update_movie_encoded['subtitle']
-        return await ApiKeyRepo.update(db, api_key_data=db_key)
+        return await write_batcher.submit(ApiKeyRepo.update, api_key_data=db_key)
     else:
         raise HTTPException(status_code=400, detail="Key not found with the given domain")
 
 
 if __name__ == "__main__":
+    import uvicorn
+
+    # development server: one process with the reloader; production runs `manage.py serve`
+    create_schema(engine)
     uvicorn.run("main:app", port=9000, reload=True)
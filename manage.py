@@ -0,0 +1,149 @@
+"""
+Administrative commands for the movie API server.
+
+            python manage.py migrate
+            python manage.py rebuild-search-index
+            python manage.py dedupe-movies
+            python manage.py compact-changes --tombstone-days 30
+            python manage.py backup backups/
+            python manage.py restore backups/sqlite-20260101T000000Z.db.zst
+            python manage.py serve --workers 4
+"""
+import argparse
+import importlib.util
+import os
+import sys
+from datetime import timedelta
+
+
+def migrate(args):
+    from sql_app.migrations import create_schema
+    from sqlite_db.sqlite import engine
+
+    create_schema(engine)
+    print("Database schema is up to date")
+
+
+def rebuild_search_index(args):
+    from sql_app.migrations import rebuild_movie_search_index
+    from sqlite_db.sqlite import engine
+
+    with engine.begin() as connection:
+        rebuild_movie_search_index(connection)
+    print("Movie search index rebuilt")
+
+
+def dedupe_movies(args):
+    """
+    Give later copies of a duplicated (title, subtitle) a subtitle of their own so the
+    unique index can be built; no movie is deleted
+    """
+    from sql_app.migrations import dedupe_movies as rename_duplicates
+    from sqlite_db.sqlite import engine
+
+    renamed = rename_duplicates(engine)
+    for movie_id, subtitle in renamed:
+        print(f"Movie {movie_id}: subtitle is now {subtitle!r}")
+    print(f"Renamed {len(renamed)} duplicate movies; run `python manage.py migrate` next")
+
+
+def compact_changes(args):
+    from sql_app.repositories.change_log_repository import ChangeLogRepo
+    from sqlite_db.sqlite import SessionLocal
+
+    db = SessionLocal()
+    try:
+        superseded, trimmed = ChangeLogRepo.compact(db, timedelta(days=args.tombstone_days))
+    finally:
+        db.close()
+    print(f"Removed {superseded} superseded changes and {trimmed} expired tombstones")
+
+
+def _print_progress(step):
+    percent = 100 * step.copied / step.total if step.total else 100
+    print(f"\r{step.copied}/{step.total} pages ({percent:.0f}%)", end="", flush=True)
+
+
+def backup(args):
+    """
+    Online backup of the database the API is serving; writes go on while it runs
+    """
+    from sqlite_db.backup import backup_database, snapshot_name
+    from sqlite_db.sqlite import profile
+
+    snapshot_path = args.target
+    if os.path.isdir(snapshot_path) or snapshot_path.endswith(os.sep):
+        snapshot_path = os.path.join(snapshot_path, snapshot_name(args.compression))
+    report = backup_database(profile.path, snapshot_path, compression=args.compression,
+                             step_pages=args.step_pages, pause=args.pause_ms / 1000, progress=_print_progress)
+    print(f"\nWrote {report.path}: {report.database_bytes} bytes as {report.snapshot_bytes} ({report.compression}) "
+          f"in {report.seconds}s, restarted {report.restarts} times")
+
+
+def restore(args):
+    """
+    Replace the database with a snapshot; stop the service first
+    """
+    from sqlite_db.backup import restore_database
+    from sqlite_db.sqlite import profile
+
+    report = restore_database(args.snapshot, profile.path, journal_mode=profile.journal_mode)
+    print(f"Restored {report.pages} pages from {args.snapshot} in {report.seconds}s")
+
+
+def serve(args):
+    """
+    Replace this process with a gunicorn master running gunicorn.conf.py; the schema has to be
+    up to date already (``migrate``)
+    """
+    if importlib.util.find_spec("gunicorn") is None:
+        sys.exit("gunicorn is not installed: pip install gunicorn")
+    if args.workers is not None:
+        os.environ["WEB_CONCURRENCY"] = str(args.workers)
+    if args.bind is not None:
+        os.environ["BIND"] = args.bind
+    config = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gunicorn.conf.py")
+    os.execv(sys.executable, [sys.executable, "-m", "gunicorn", "--config", config, "main:app"])
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Movie API Server administration")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("migrate", help="create missing tables and apply migrations").set_defaults(handler=migrate)
+    commands.add_parser(
+        "rebuild-search-index", help="re-index every movie for full-text search"
+    ).set_defaults(handler=rebuild_search_index)
+    commands.add_parser(
+        "dedupe-movies", help="rename duplicate (title, subtitle) movies so migrate can index them"
+    ).set_defaults(handler=dedupe_movies)
+    compact = commands.add_parser(
+        "compact-changes", help="drop superseded change-log entries and tombstones past retention"
+    )
+    compact.add_argument("--tombstone-days", type=float, default=30.0,
+                         help="keep deletes this long so clients that sync less often still see them")
+    compact.set_defaults(handler=compact_changes)
+    snapshot = commands.add_parser("backup", help="copy the live database into a compressed snapshot")
+    snapshot.add_argument("target", nargs="?", default="backups" + os.sep,
+                          help="snapshot file, or a directory to create a timestamped one in (default: backups/)")
+    snapshot.add_argument("--compression", choices=["zstd", "gzip", "none"],
+                          help="default: zstd when zstandard is installed, gzip otherwise")
+    snapshot.add_argument("--step-pages", type=int, default=1024, help="pages copied per step")
+    snapshot.add_argument("--pause-ms", type=float, default=0.0, help="pause between steps for writers to go first")
+    snapshot.set_defaults(handler=backup)
+    load = commands.add_parser("restore", help="replace the database with a snapshot (service stopped)")
+    load.add_argument("snapshot", help="a file written by backup")
+    load.set_defaults(handler=restore)
+    server = commands.add_parser("serve", help="run the API with gunicorn worker processes (see gunicorn.conf.py)")
+    server.add_argument("--workers", type=int, help="worker processes (default: WEB_CONCURRENCY)")
+    server.add_argument("--bind", help="address to listen on (default: BIND or 0.0.0.0:9000)")
+    server.set_defaults(handler=serve)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
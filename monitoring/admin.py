@@ -0,0 +1,15 @@
+import hmac
+import os
+from typing import Optional
+
+ADMIN_KEY_HEADER = "X-Admin-Key"
+
+
+def admin_key_matches(admin_key: Optional[str]) -> bool:
+    """
+    Compare against ADMIN_API_KEY in constant time; admin features stay off while it is unset
+    """
+    expected = os.environ.get("ADMIN_API_KEY")
+    if not expected or not admin_key:
+        return False
+    return hmac.compare_digest(admin_key.encode("utf-8"), expected.encode("utf-8"))
@@ -0,0 +1,38 @@
+from feeds.feed_cache import feed_cache
+from monitoring.metrics import Counter, Gauge, registry
+from sql_app.cache.api_key_cache import verified_api_keys
+from sql_app.cache.catalog_snapshot import catalog_snapshot
+from sql_app.cache.movie_cache import movie_cache
+from sql_app.change_stream import change_stream
+from sql_app.compression import precompressed
+from sql_app.write_batcher import write_batcher
+
+
+@registry.collector
+def cache_metrics():
+    hits = Counter("cache_hits_total", "Cache lookups answered from memory.", ["cache"])
+    misses = Counter("cache_misses_total", "Cache lookups that went to the database.", ["cache"])
+    evictions = Counter("cache_evictions_total", "Entries evicted to respect the size bound.", ["cache"])
+    size = Gauge("cache_entries", "Entries currently cached.", ["cache"])
+    for name, cache in (("movies", movie_cache.entries), ("api_keys", verified_api_keys),
+                        ("compressed", precompressed)):
+        hits.inc(name, amount=cache.hits)
+        misses.inc(name, amount=cache.misses)
+        evictions.inc(name, amount=cache.evictions)
+        size.inc(name, amount=len(cache))
+    renders = Counter("feed_renders_total", "Feed documents rendered after a catalog change.")
+    renders.inc(amount=feed_cache.renders)
+    subscribers = Gauge("movie_stream_subscribers", "Clients connected to /movies/stream.")
+    subscribers.inc(amount=len(change_stream))
+    dropped = Counter("movie_stream_dropped_total", "Stream subscribers dropped for falling behind.")
+    dropped.inc(amount=change_stream.dropped)
+    batches = Counter("write_batches_total", "Transactions committed by the write batcher.")
+    batches.inc(amount=write_batcher.batches)
+    writes = Counter("write_batch_writes_total", "Writes committed through the write batcher.")
+    writes.inc(amount=write_batcher.writes)
+    snapshot_movies = Gauge("catalog_snapshot_movies", "Movies held by the columnar catalog snapshot.")
+    snapshot_movies.inc(amount=len(catalog_snapshot))
+    snapshot_bytes = Gauge("catalog_snapshot_bytes", "Memory used by the columnar catalog snapshot.")
+    snapshot_bytes.inc(amount=catalog_snapshot.nbytes())
+    return [hits, misses, evictions, size, renders, subscribers, dropped, batches, writes, snapshot_movies,
+            snapshot_bytes]
@@ -0,0 +1,68 @@
+from time import perf_counter
+
+from monitoring.metrics import registry
+from monitoring.sql_metrics import RequestStats, current_request_stats
+
+requests_total = registry.counter(
+    "http_requests_total", "HTTP requests served.", ["method", "route", "status"]
+)
+request_duration = registry.histogram(
+    "http_request_duration_seconds", "Time to serve an HTTP request, body included.", ["method", "route"]
+)
+request_sql_statements = registry.histogram(
+    "http_request_sql_statements", "SQL statements executed per HTTP request.", ["method", "route"],
+    buckets=(0, 1, 2, 3, 5, 10, 25, 100)
+)
+request_db_duration = registry.histogram(
+    "http_request_db_seconds", "Time spent in SQLite per HTTP request.", ["method", "route"]
+)
+requests_in_flight = registry.gauge("http_requests_in_flight", "HTTP requests being served.")
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware, so streamed bodies pass through untouched. Requests are labelled
+    by route template rather than raw path to keep the number of series bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._templates = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        requests_in_flight.inc()
+        started = perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = perf_counter() - started
+            requests_in_flight.dec()
+            current_request_stats.reset(token)
+            method, route = scope["method"], self.route_template(scope)
+            requests_total.inc(method, route, f"{status[0] // 100}xx")
+            request_duration.observe(elapsed, method, route)
+            request_sql_statements.observe(stats.statements, method, route)
+            request_db_duration.observe(stats.db_seconds, method, route)
+
+    def route_template(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if self._templates is None:
+            self._templates = {
+                route.endpoint: route.path for route in scope["app"].routes if hasattr(route, "endpoint")
+            }
+        return self._templates.get(endpoint, "unmatched")
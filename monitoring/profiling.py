@@ -0,0 +1,204 @@
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from typing import List, Optional
+
+from monitoring.admin import ADMIN_KEY_HEADER, admin_key_matches
+from monitoring.sql_metrics import RequestStats, current_request_stats
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+PROFILE_MODES = ("cprofile", "sample")
+
+# a sampled stack ending in one of these files is a thread waiting for work, not doing it
+IDLE_FILES = ("threading.py", "selectors.py", "queue.py")
+
+
+class RequestProfile:
+    """
+    One profiled request: the profiler output plus every SQL statement it executed
+    """
+
+    def __init__(self, profile_id: str, mode: str, method: str, path: str):
+        self.id = profile_id
+        self.mode = mode
+        self.method = method
+        self.path = path
+        self.created_at = time.time()
+        self.status: Optional[int] = None
+        self.duration_ms = 0.0
+        self.statements: List[dict] = []
+        self.report = ""
+        # cProfile: marshalled pstats data (what Stats.dump_stats writes); sample: folded stacks
+        self.raw = b""
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "mode": self.mode,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "created_at": self.created_at,
+            "duration_ms": self.duration_ms,
+            "sql_statements": len(self.statements),
+            "sql_ms": round(sum(statement["duration_ms"] for statement in self.statements), 3),
+        }
+
+    def as_dict(self) -> dict:
+        return dict(self.summary(), statements=self.statements, report=self.report)
+
+
+class ProfileStore:
+    """
+    The most recent profiles, oldest dropped first
+    """
+
+    def __init__(self, maxsize: int = 20):
+        self.maxsize = maxsize
+        self._profiles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, profile: RequestProfile):
+        with self._lock:
+            self._profiles[profile.id] = profile
+            while len(self._profiles) > self.maxsize:
+                self._profiles.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[RequestProfile]:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def recent(self) -> List[RequestProfile]:
+        with self._lock:
+            return list(reversed(self._profiles.values()))
+
+
+class StackSampler:
+    """
+    Samples the stacks of every other thread, so work in the threadpool (sync endpoints,
+    run_sync sessions) shows up too. Stacks are kept in the folded format flame graph tools read.
+    """
+
+    def __init__(self, interval: float = 0.002):
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stopped.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own or os.path.basename(frame.f_code.co_filename) in IDLE_FILES:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class ProfilingMiddleware:
+    """
+    Profiles a single request when it carries X-Profile: cprofile|sample together with a valid
+    X-Admin-Key. The response gets an X-Profile-Id header; the profile is read back from
+    /admin/profiles/{id}. One request is profiled at a time, and everything else running in the
+    process meanwhile is included, so profile on a quiet worker.
+
+    cProfile is deterministic but only sees the event loop thread (async endpoints, middleware);
+    the sampler sees every thread.
+    """
+
+    def __init__(self, app, store: Optional[ProfileStore] = None):
+        self.app = app
+        self.store = store or profiles
+        self._busy = threading.Lock()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope["headers"]}
+        mode = headers.get(PROFILE_HEADER.lower(), "").lower()
+        if mode not in PROFILE_MODES or not admin_key_matches(headers.get(ADMIN_KEY_HEADER.lower())):
+            await self.app(scope, receive, send)
+            return
+        if not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self._profile(mode, scope, receive, send)
+        finally:
+            self._busy.release()
+
+    async def _profile(self, mode, scope, receive, send):
+        profile = RequestProfile(uuid.uuid4().hex, mode, scope["method"], scope["path"])
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (PROFILE_ID_HEADER.lower().encode("latin-1"), profile.id.encode("latin-1"))
+                ]
+            await send(message)
+
+        stats = current_request_stats.get()
+        token = None
+        if stats is None:
+            stats = RequestStats()
+            token = current_request_stats.set(stats)
+        stats.log = profile.statements
+
+        profiler = cProfile.Profile() if mode == "cprofile" else StackSampler()
+        started = time.perf_counter()
+        if mode == "cprofile":
+            profiler.enable()
+        else:
+            profiler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            if mode == "cprofile":
+                profiler.disable()
+            else:
+                profiler.stop()
+            profile.duration_ms = round((time.perf_counter() - started) * 1000, 3)
+            stats.log = None
+            if token is not None:
+                current_request_stats.reset(token)
+            self._finish(profile, profiler)
+            self.store.add(profile)
+
+    @staticmethod
+    def _finish(profile: RequestProfile, profiler):
+        if isinstance(profiler, cProfile.Profile):
+            report = io.StringIO()
+            pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(60)
+            profile.report = report.getvalue()
+            profiler.create_stats()
+            profile.raw = marshal.dumps(profiler.stats)
+        else:
+            profile.report = profiler.folded()
+            profile.raw = profile.report.encode("utf-8")
+
+
+profiles = ProfileStore(maxsize=int(os.environ.get("PROFILE_STORE_SIZE", "20")))
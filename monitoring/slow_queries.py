@@ -0,0 +1,89 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import List, NamedTuple
+
+from monitoring.metrics import registry
+
+logger = logging.getLogger("monitoring.slow_queries")
+
+slow_statements = registry.counter(
+    "sqlite_slow_statements_total", "SQL statements slower than the slow-query threshold.", ["engine"]
+)
+
+# statements that have no useful plan, or that cannot be explained at all
+UNEXPLAINED_PREFIXES = ("EXPLAIN", "PRAGMA", "BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE", "CREATE", "DROP")
+
+
+class SlowQuery(NamedTuple):
+    recorded_at: float
+    engine: str
+    statement: str
+    parameters: str
+    duration_ms: float
+    plan: List[str]
+
+
+class SlowQueryLog:
+    """
+    Statements over threshold_ms, with their EXPLAIN QUERY PLAN, logged and kept in a bounded buffer
+    """
+
+    def __init__(self, threshold_ms: float = 100.0, maxsize: int = 200):
+        self.threshold_ms = threshold_ms
+        self.entries = deque(maxlen=maxsize)
+        self._lock = threading.Lock()
+
+    def is_slow(self, elapsed: float) -> bool:
+        return self.threshold_ms >= 0 and elapsed * 1000 >= self.threshold_ms
+
+    def record(self, conn, statement: str, parameters, elapsed: float, engine: str, executemany: bool):
+        plan = [] if executemany else explain(conn, statement, parameters)
+        entry = SlowQuery(time.time(), engine, statement, repr(parameters)[:500], round(elapsed * 1000, 3), plan)
+        with self._lock:
+            self.entries.append(entry)
+        slow_statements.inc(engine)
+        logger.warning("slow query on %s (%.1f ms): %s | plan: %s",
+                       engine, entry.duration_ms, statement, "; ".join(plan) or "n/a")
+        return entry
+
+    def recent(self) -> List[SlowQuery]:
+        with self._lock:
+            return list(reversed(self.entries))
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+
+
+def explain(conn, statement: str, parameters) -> List[str]:
+    """
+    EXPLAIN QUERY PLAN on the connection that just ran the statement, through a raw cursor so
+    it is neither counted nor timed itself. Never lets a failure reach the caller's query.
+    """
+    if statement.lstrip().upper().startswith(UNEXPLAINED_PREFIXES):
+        return []
+    try:
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+            return [row[-1] for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+    except Exception as err:
+        return [f"plan unavailable: {err}"]
+
+
+def build_slow_query_log() -> SlowQueryLog:
+    """
+    SQLITE_SLOW_QUERY_MS sets the threshold (default 100); a negative value turns the log off
+    """
+    return SlowQueryLog(
+        threshold_ms=float(os.environ.get("SQLITE_SLOW_QUERY_MS", "100")),
+        maxsize=int(os.environ.get("SQLITE_SLOW_QUERY_LOG_SIZE", "200")),
+    )
+
+
+slow_queries = build_slow_query_log()
@@ -0,0 +1,70 @@
+from contextvars import ContextVar
+from time import perf_counter
+from typing import List, Optional
+
+from sqlalchemy import event
+
+from monitoring.metrics import registry
+from monitoring.slow_queries import slow_queries
+
+SQL_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+sql_statements = registry.counter("sqlite_statements_total", "SQL statements executed.", ["engine"])
+sql_errors = registry.counter("sqlite_statement_errors_total", "SQL statements that raised.", ["engine"])
+sql_duration = registry.histogram(
+    "sqlite_statement_duration_seconds", "Time spent executing one SQL statement.", ["engine"], SQL_BUCKETS
+)
+
+
+class RequestStats:
+    """
+    SQL work attributed to the request being served in the current context
+    """
+    __slots__ = ("statements", "db_seconds", "log")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_seconds = 0.0
+        # only kept while the request is being profiled
+        self.log: Optional[List[dict]] = None
+
+
+current_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("current_request_stats", default=None)
+
+
+def instrument_engine(engine, name: str):
+    """
+    Count and time every statement the engine sends to SQLite, globally and for the
+    request in progress, and hand slow ones to the slow-query log
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("statement_started", []).append(perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = perf_counter() - conn.info["statement_started"].pop()
+        sql_statements.inc(name)
+        sql_duration.observe(elapsed, name)
+        stats = current_request_stats.get()
+        if stats is not None:
+            stats.statements += 1
+            stats.db_seconds += elapsed
+            if stats.log is not None:
+                stats.log.append({
+                    "engine": name,
+                    "statement": statement,
+                    "parameters": repr(parameters)[:500],
+                    "executemany": executemany,
+                    "duration_ms": round(elapsed * 1000, 3),
+                })
+        if slow_queries.is_slow(elapsed):
+            slow_queries.record(conn, statement, parameters, elapsed, name, executemany)
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        started = exception_context.connection.info.get("statement_started") if exception_context.connection else None
+        if started:
+            started.pop()
+        sql_errors.inc(name)
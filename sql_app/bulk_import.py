@@ -0,0 +1,97 @@
+import json
+from typing import Any, AsyncIterator, List, NamedTuple
+
+from pydantic import ValidationError
+
+from sql_app.repositories.movie_repository import MovieRepo
+from sql_app.schemas.movie_schema import BulkMovieReport, BulkMovieResult, MovieCreate
+from sql_app.write_batcher import write_batcher
+
+BULK_CHUNK_SIZE = 1000
+
+
+class InvalidRow(NamedTuple):
+    error: str
+
+
+def _decode_line(line: bytes):
+    try:
+        return json.loads(line)
+    except ValueError as err:
+        return InvalidRow(f"Invalid JSON: {err}")
+
+
+async def iter_ndjson(stream: AsyncIterator[bytes]) -> AsyncIterator[Any]:
+    """
+    Decode a newline delimited JSON request body as it arrives; an undecodable line becomes
+    an InvalidRow instead of failing the whole import
+    """
+    buffer = b""
+    async for chunk in stream:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield _decode_line(line)
+    if buffer.strip():
+        yield _decode_line(buffer)
+
+
+def iter_json_array(body: bytes) -> AsyncIterator[Any]:
+    """
+    Decode a JSON array request body up front, raising ValueError when it is not one
+    """
+    rows = json.loads(body)
+    if not isinstance(rows, list):
+        raise ValueError("Expected a JSON array of movies")
+    return _iterate(rows)
+
+
+async def _iterate(rows: list) -> AsyncIterator[Any]:
+    for row in rows:
+        yield row
+
+
+async def import_movies(rows: AsyncIterator[Any], chunk_size: int = BULK_CHUNK_SIZE) -> BulkMovieReport:
+    """
+    Validate and insert rows ``chunk_size`` at a time. Each chunk is one write of the write
+    batcher, so the writer connection is only used once a chunk has fully arrived and never
+    waits on a slow upload.
+    """
+    results: List[BulkMovieResult] = []
+    chunk = []
+    async for row in rows:
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            results.extend(await _import_chunk(len(results), chunk))
+            chunk = []
+    if chunk:
+        results.extend(await _import_chunk(len(results), chunk))
+
+    statuses = [result.status for result in results]
+    return BulkMovieReport(
+        created=statuses.count("created"),
+        duplicates=statuses.count("duplicate"),
+        invalid=statuses.count("invalid"),
+        results=results,
+    )
+
+
+async def _import_chunk(start: int, rows: list) -> List[BulkMovieResult]:
+    results = [None] * len(rows)
+    movies = []
+    positions = []
+    for offset, row in enumerate(rows):
+        if isinstance(row, InvalidRow):
+            results[offset] = BulkMovieResult(index=start + offset, status="invalid", error=row.error)
+            continue
+        try:
+            movies.append(MovieCreate.parse_obj(row))
+            positions.append(offset)
+        except ValidationError as err:
+            results[offset] = BulkMovieResult(index=start + offset, status="invalid", error=str(err))
+    if movies:
+        statuses = await write_batcher.submit(MovieRepo.bulk_create, movies)
+        for offset, status in zip(positions, statuses):
+            results[offset] = BulkMovieResult(index=start + offset, status=status)
+    return results
@@ -0,0 +1,7 @@
+from sql_app.cache.ttl_cache import TTLCache
+
+# public key digest -> VerifiedKey, shared by the verifier and ApiKeyRepo write paths
+verified_api_keys = TTLCache(maxsize=4096, ttl=300.0)
+# digests of tokens that matched no key, so repeated bad tokens cost no query; kept briefly
+# and evicted by ApiKeyRepo.create for the digest it stores
+unknown_api_keys = TTLCache(maxsize=4096, ttl=30.0)
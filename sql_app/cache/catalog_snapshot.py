@@ -0,0 +1,205 @@
+import sys
+import threading
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from sql_app.change_feed import ChangesCompacted, fetch_changes
+from sql_app.models.movie_model import Movie
+from sql_app.repositories.change_log_repository import ChangeLogRepo
+
+# change log entries read per query while catching up
+CHANGES_PAGE = 5000
+# a price range holding more than this share of the catalog is paged with a scan in id order
+# instead of sorting its ids
+SCAN_SHARE = 1 / 16
+
+
+class Columns(NamedTuple):
+    ids: np.ndarray
+    prices: np.ndarray
+    # codes into CatalogSnapshot.titles
+    titles: np.ndarray
+    # prices ascending, and the id each one belongs to
+    by_price: np.ndarray
+    by_price_ids: np.ndarray
+
+    @classmethod
+    def build(cls, ids: np.ndarray, prices: np.ndarray, titles: np.ndarray) -> "Columns":
+        order = np.argsort(prices, kind="stable")
+        return cls(ids, prices, titles, prices[order], ids[order])
+
+    @property
+    def nbytes(self) -> int:
+        return sum(column.nbytes for column in self)
+
+    def price_range(self, min_price: Optional[float], max_price: Optional[float]) -> Tuple[int, int]:
+        """
+        Bounds of the movies priced within [min_price, max_price] in by_price
+        """
+        low = 0 if min_price is None else int(np.searchsorted(self.by_price, min_price, side="left"))
+        high = len(self.by_price) if max_price is None else int(np.searchsorted(self.by_price, max_price, side="right"))
+        return low, max(low, high)
+
+
+EMPTY = Columns.build(np.empty(0, np.int64), np.empty(0, np.float64), np.empty(0, np.int32))
+
+
+class CatalogSnapshot:
+    """
+    Columnar copy of the movies table (ids, prices and interned titles) in NumPy arrays, for
+    aggregates and price ranges that would otherwise materialize the whole catalog. Loaded on
+    first use, then kept current from the change log: every access compares the latest change
+    seq with the one applied and merges only the movies changed since, so writes made by
+    other workers are picked up too.
+    """
+
+    def __init__(self):
+        self.position: Optional[int] = None
+        self.titles: List[str] = []
+        self._title_codes: Dict[str, int] = {}
+        self._columns = EMPTY
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._columns.ids)
+
+    def columns(self, db: Session) -> Columns:
+        """
+        The columns as of the latest change visible to ``db``, or of a later one: a read
+        transaction older than the snapshot gets the newer columns, since the change log
+        cannot be applied backwards. Callers check the rows they load against them.
+        """
+        latest = ChangeLogRepo.fetch_latest_seq(db)
+        if self.position is None or latest > self.position:
+            with self._lock:
+                if self.position is None or latest > self.position:
+                    self._refresh(db, latest)
+        return self._columns
+
+    def nbytes(self) -> int:
+        return self._columns.nbytes + sum(sys.getsizeof(title) for title in self.titles)
+
+    def ids_in_price_range(self, db: Session, min_price: Optional[float] = None, max_price: Optional[float] = None,
+                           after_id: Optional[int] = None, limit: Optional[int] = None) -> np.ndarray:
+        """
+        Ids of the movies priced within [min_price, max_price], ascending, after ``after_id``
+        and at most ``limit`` of them
+        """
+        columns = self.columns(db)
+        low, high = columns.price_range(min_price, max_price)
+        start = 0 if after_id is None else int(np.searchsorted(columns.ids, after_id, side="right"))
+        if high - low > len(columns.ids) * SCAN_SHARE:
+            prices = columns.prices[start:]
+            matches = np.ones(len(prices), dtype=bool)
+            if min_price is not None:
+                matches &= prices >= min_price
+            if max_price is not None:
+                matches &= prices <= max_price
+            ids = columns.ids[start:][matches]
+        else:
+            ids = np.sort(columns.by_price_ids[low:high])
+            if after_id is not None:
+                ids = ids[np.searchsorted(ids, after_id, side="right"):]
+        return ids if limit is None else ids[:limit]
+
+    def price_stats(self, db: Session, min_price: Optional[float] = None, max_price: Optional[float] = None,
+                    bins: int = 10, percentiles: Sequence[float] = (5, 25, 50, 75, 95)) -> dict:
+        columns = self.columns(db)
+        low, high = columns.price_range(min_price, max_price)
+        prices = columns.by_price[low:high]
+        if not len(prices):
+            return {"count": 0, "min": None, "max": None, "mean": None, "percentiles": {},
+                    "histogram": {"edges": [], "counts": []}}
+        counts, edges = np.histogram(prices, bins=bins)
+        return {
+            "count": int(len(prices)),
+            "min": float(prices[0]),
+            "max": float(prices[-1]),
+            "mean": float(prices.mean()),
+            "percentiles": {
+                f"p{percentile:g}": float(value)
+                for percentile, value in zip(percentiles, np.percentile(prices, percentiles))
+            },
+            "histogram": {"edges": edges.tolist(), "counts": counts.tolist()},
+        }
+
+    def _refresh(self, db: Session, latest: int):
+        if self.position is None:
+            self._load(db, latest)
+            return
+        upserts = {}
+        deleted = set()
+        since = self.position
+        try:
+            while True:
+                page = fetch_changes(db, since, CHANGES_PAGE)
+                for change in page["changes"]:
+                    if change["action"] == "delete":
+                        upserts.pop(change["id"], None)
+                        deleted.add(change["id"])
+                    else:
+                        deleted.discard(change["id"])
+                        upserts[change["id"]] = (change["movie"]["title"], change["movie"]["price"])
+                since = page["next_since"]
+                if not page["has_more"]:
+                    break
+        except ChangesCompacted:
+            self._load(db, latest)
+            return
+        self._columns = self._merge(self._columns, upserts, deleted)
+        # every change up to ``latest`` is visible in this read transaction
+        self.position = latest
+
+    def _load(self, db: Session, latest: int):
+        # same read transaction as ``latest``, so no change is applied twice or missed
+        rows = db.query(Movie.id, Movie.price, Movie.title).order_by(Movie.id).all()
+        vocabulary, codes = [], {}
+        for row in rows:
+            if row[2] not in codes:
+                codes[row[2]] = len(vocabulary)
+                vocabulary.append(sys.intern(row[2]))
+        columns = Columns.build(
+            np.fromiter((row[0] for row in rows), np.int64, len(rows)),
+            np.fromiter((row[1] for row in rows), np.float64, len(rows)),
+            np.fromiter((codes[row[2]] for row in rows), np.int32, len(rows)),
+        )
+        self.titles, self._title_codes, self._columns = vocabulary, codes, columns
+        self.position = latest
+
+    def _merge(self, columns: Columns, upserts: Dict[int, Tuple[str, float]], deleted: set) -> Columns:
+        """
+        New columns without the changed and deleted movies, with the upserted ones inserted
+        at their place in both orders
+        """
+        changed = np.fromiter(list(upserts) + list(deleted), np.int64, len(upserts) + len(deleted))
+        keep = ~np.isin(columns.ids, changed)
+        keep_by_price = ~np.isin(columns.by_price_ids, changed)
+        new_ids = np.array(sorted(upserts), dtype=np.int64)
+        new_prices = np.fromiter((upserts[movie_id][1] for movie_id in new_ids.tolist()), np.float64, len(new_ids))
+        new_titles = np.fromiter((self._intern(upserts[movie_id][0]) for movie_id in new_ids.tolist()),
+                                 np.int32, len(new_ids))
+
+        ids = columns.ids[keep]
+        at = np.searchsorted(ids, new_ids)
+        by_price = columns.by_price[keep_by_price]
+        order = np.argsort(new_prices, kind="stable")
+        at_price = np.searchsorted(by_price, new_prices[order], side="right")
+        return Columns(
+            np.insert(ids, at, new_ids),
+            np.insert(columns.prices[keep], at, new_prices),
+            np.insert(columns.titles[keep], at, new_titles),
+            np.insert(by_price, at_price, new_prices[order]),
+            np.insert(columns.by_price_ids[keep_by_price], at_price, new_ids[order]),
+        )
+
+    def _intern(self, title: str) -> int:
+        code = self._title_codes.get(title)
+        if code is None:
+            code = self._title_codes[title] = len(self.titles)
+            self.titles.append(sys.intern(title))
+        return code
+
+
+catalog_snapshot = CatalogSnapshot()
@@ -0,0 +1,124 @@
+import os
+import threading
+import time
+from typing import Callable, Hashable, Optional
+
+from sqlalchemy.orm import Session
+
+from sql_app.cache.ttl_cache import TTLCache
+from sql_app.events import catalog_events
+from sql_app.repositories.movie_repository import MovieRepo
+
+
+class LocalInvalidation:
+    """
+    Single process deployments: every write goes through this process's MovieRepo, so the
+    catalog events alone keep the cache current
+    """
+
+    def is_due(self) -> bool:
+        return False
+
+    def is_stale(self, db: Session) -> bool:
+        return False
+
+
+class DatabaseVersionInvalidation:
+    """
+    Multi-worker deployments: compare a version counter kept in the database (the catalog's
+    by default) with the last one seen, at most once per ``check_interval`` seconds. Writes
+    made by other workers become visible within that interval.
+    """
+
+    def __init__(self, check_interval: float = 0.5, timer=time.monotonic,
+                 fetch_version: Callable[[Session], int] = MovieRepo.fetch_catalog_version):
+        self.check_interval = check_interval
+        self.fetch_version = fetch_version
+        self.version: Optional[int] = None
+        self._checked_at = None
+        self._timer = timer
+        self._lock = threading.Lock()
+
+    def is_due(self) -> bool:
+        """
+        Whether the next is_stale will query the database; lets callers without a session at
+        hand (the event loop) fetch one only when needed
+        """
+        return self._checked_at is None or self._timer() - self._checked_at >= self.check_interval
+
+    def is_stale(self, db: Session) -> bool:
+        now = self._timer()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return False
+        with self._lock:
+            if self._checked_at is not None and now - self._checked_at < self.check_interval:
+                return False
+            self._checked_at = now
+            version = self.fetch_version(db)
+            stale = self.version is not None and version != self.version
+            self.version = version
+        return stale
+
+
+class MovieCache:
+    """
+    Read-through cache of encoded movie responses, dropped as a whole whenever the catalog
+    changes
+    """
+
+    def __init__(self, invalidation=None, maxsize: int = 10000, ttl: float = 300.0):
+        self.invalidation = invalidation or LocalInvalidation()
+        self.entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._generation = 0
+
+    def get_or_load(self, db: Session, key: Hashable, load: Callable[[], Optional[bytes]]) -> Optional[bytes]:
+        if self.invalidation.is_stale(db):
+            self.invalidate()
+        body = self.entries.get(key)
+        if body is not None:
+            return body
+        generation = self._generation
+        body = load()
+        # a write that committed while loading may have been missed by the query; do not keep it
+        if body is not None and generation == self._generation:
+            self.entries.set(key, body)
+        return body
+
+    def invalidate(self, *_):
+        self._generation += 1
+        self.entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.entries.hits,
+            "misses": self.entries.misses,
+            "evictions": self.entries.evictions,
+            "size": len(self.entries),
+        }
+
+
+def build_invalidation(fetch_version: Callable[[Session], int] = MovieRepo.fetch_catalog_version):
+    """
+    How a worker's in-process cache learns of writes, from MOVIE_CACHE_BACKEND; the movie,
+    feed and API key caches all follow it
+    """
+    backend = os.environ.get("MOVIE_CACHE_BACKEND", "database")
+    if backend == "local":
+        return LocalInvalidation()
+    elif backend == "database":
+        return DatabaseVersionInvalidation(
+            float(os.environ.get("MOVIE_CACHE_CHECK_INTERVAL", 0.5)), fetch_version=fetch_version
+        )
+    raise ValueError(f"Unknown MOVIE_CACHE_BACKEND: {backend}")
+
+
+def build_movie_cache() -> MovieCache:
+    return MovieCache(
+        build_invalidation(),
+        maxsize=int(os.environ.get("MOVIE_CACHE_SIZE", 10000)),
+        ttl=float(os.environ.get("MOVIE_CACHE_TTL", 300)),
+    )
+
+
+movie_cache = build_movie_cache()
+catalog_events.subscribe(movie_cache.invalidate)
@@ -0,0 +1,55 @@
+from sqlalchemy.orm import Session
+
+from sql_app.models.movie_model import Movie
+from sql_app.repositories.change_log_repository import ChangeLogRepo
+from sql_app.repositories.movie_repository import MOVIE_ROW_COLUMNS, MOVIE_ROW_FIELDS
+
+
+class ChangesCompacted(ValueError):
+    """
+    The requested position is older than the compaction horizon; the client has to resync
+    the catalog and continue from ``latest``
+    """
+
+    def __init__(self, message: str, latest: int):
+        super().__init__(message)
+        self.latest = latest
+
+
+def fetch_changes(db: Session, since: int, limit: int) -> dict:
+    """
+    One page of the change feed after ``since``: the latest state of every movie upserted in
+    the page and a tombstone for every movie deleted. Several changes of one movie collapse
+    into the newest. Reads happen in one transaction, so an upsert whose row is gone is
+    always followed by its tombstone.
+    """
+    horizon = ChangeLogRepo.fetch_horizon(db)
+    if since < horizon:
+        raise ChangesCompacted(f"Changes up to {horizon} were compacted, resync the catalog",
+                               ChangeLogRepo.fetch_latest_seq(db))
+    rows = ChangeLogRepo.fetch_since(db, since, limit + 1)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    latest = {}
+    for seq, movie_id, action in rows:
+        latest.pop(movie_id, None)
+        latest[movie_id] = (seq, action)
+    upserted_ids = [movie_id for movie_id, (_, action) in latest.items() if action == "upsert"]
+    movies = {}
+    if upserted_ids:
+        for row in db.query(*MOVIE_ROW_COLUMNS).filter(Movie.id.in_(upserted_ids)):
+            movies[row.id] = dict(zip(MOVIE_ROW_FIELDS, row))
+
+    changes = []
+    for movie_id, (seq, action) in latest.items():
+        if action == "delete":
+            changes.append({"seq": seq, "action": "delete", "id": movie_id})
+        elif movie_id in movies:
+            changes.append({"seq": seq, "action": "upsert", "id": movie_id, "movie": movies[movie_id]})
+    return {
+        "changes": changes,
+        "next_since": rows[-1].seq if rows else since,
+        "has_more": has_more,
+        "latest": ChangeLogRepo.fetch_latest_seq(db),
+    }
@@ -0,0 +1,191 @@
+import asyncio
+import os
+from typing import AsyncIterator, Optional, Set
+
+import orjson
+from starlette.concurrency import run_in_threadpool
+
+from sql_app.change_feed import ChangesCompacted, fetch_changes
+from sql_app.events import catalog_events
+from sql_app.pagination import MAX_PAGE_SIZE
+from sql_app.repositories.change_log_repository import ChangeLogRepo
+from sqlite_db.sqlite import ReadSessionLocal
+
+# tells EventSource clients how long to wait before reconnecting, in milliseconds
+STREAM_PREAMBLE = b"retry: 3000\n\n"
+HEARTBEAT = b": keepalive\n\n"
+DROPPED = b"event: dropped\ndata: {\"reason\":\"slow consumer\"}\n\n"
+
+
+def format_event(change: dict) -> bytes:
+    return b"id: %d\nevent: %s\ndata: %s\n\n" % (change["seq"], change["action"].encode("ascii"), orjson.dumps(change))
+
+
+def format_reset(latest: int) -> bytes:
+    # the log no longer reaches back to the client's position: it must refetch the catalog
+    return b"id: %d\nevent: reset\ndata: %s\n\n" % (latest, orjson.dumps({"latest": latest}))
+
+
+class Subscription:
+    __slots__ = ("queue", "dropped")
+
+    def __init__(self, maxsize: int):
+        self.queue = asyncio.Queue(maxsize)
+        self.dropped = False
+
+
+class ChangeStreamHub:
+    """
+    Fans catalog changes out to Server-Sent Events subscribers. A single pump task reads new
+    entries from the change log once per notification (or every poll_interval, to pick up
+    writes made by other workers) and encodes each event once for every subscriber.
+
+    Subscribers only cost a bounded queue each. One that falls queue_size events behind is
+    dropped: it gets a final "dropped" event after draining its queue and, on reconnecting with
+    Last-Event-ID, catches up from the change log instead.
+    """
+
+    def __init__(self, session_factory=ReadSessionLocal, queue_size: int = 256,
+                 poll_interval: float = 1.0, heartbeat_interval: float = 15.0):
+        self.session_factory = session_factory
+        self.queue_size = queue_size
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.dropped = 0
+        # seq of the newest change fanned out; None while nobody is subscribed
+        self.position: Optional[int] = None
+        self._subscribers: Set[Subscription] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._pump: Optional[asyncio.Task] = None
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    def notify(self, *_):
+        """
+        catalog_events listener; may be called from any thread
+        """
+        loop = self._loop
+        if loop is not None and self._subscribers and not loop.is_closed():
+            loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def stream(self, since: Optional[int] = None) -> AsyncIterator[bytes]:
+        """
+        SSE body: the changes after ``since`` from the change log, then live changes
+        """
+        subscription = await self._subscribe()
+        caught_up_to = self.position
+        try:
+            yield STREAM_PREAMBLE
+            if since is not None and since < caught_up_to:
+                async for event in self._replay(since, caught_up_to):
+                    yield event
+            while True:
+                if subscription.dropped and subscription.queue.empty():
+                    yield DROPPED
+                    return
+                yield await subscription.queue.get()
+        finally:
+            self._subscribers.discard(subscription)
+
+    async def _replay(self, since: int, until: int) -> AsyncIterator[bytes]:
+        while since < until:
+            try:
+                page = await run_in_threadpool(self._load_changes, since, MAX_PAGE_SIZE)
+            except ChangesCompacted as err:
+                yield format_reset(err.latest)
+                return
+            for change in page["changes"]:
+                # anything newer is delivered through the live queue
+                if change["seq"] <= until:
+                    yield format_event(change)
+            since = page["next_since"]
+            if not page["has_more"]:
+                return
+
+    async def _subscribe(self) -> Subscription:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # subscriptions and the pump are bound to the loop that created them
+            self._loop, self._wakeup, self._pump, self.position = loop, asyncio.Event(), None, None
+            self._subscribers = set()
+        if self.position is None:
+            latest = await run_in_threadpool(self._load_latest)
+            if self.position is None:
+                self.position = latest
+        subscription = Subscription(self.queue_size)
+        self._subscribers.add(subscription)
+        if self._pump is None:
+            self._pump = loop.create_task(self._run())
+        return subscription
+
+    async def _run(self):
+        last_heartbeat = self._loop.time()
+        try:
+            while self._subscribers:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                await self._fan_out_new_changes()
+                if self._loop.time() - last_heartbeat >= self.heartbeat_interval:
+                    last_heartbeat = self._loop.time()
+                    self._broadcast(HEARTBEAT, drop_when_full=False)
+        finally:
+            self._pump = None
+            if not self._subscribers:
+                self.position = None
+
+    async def _fan_out_new_changes(self):
+        while self._subscribers:
+            try:
+                page = await run_in_threadpool(self._load_changes, self.position, MAX_PAGE_SIZE)
+            except ChangesCompacted as err:
+                self._broadcast(format_reset(err.latest))
+                self.position = err.latest
+                return
+            for change in page["changes"]:
+                self._broadcast(format_event(change))
+            # set right after broadcasting, with no await in between, so a new subscriber
+            # replays exactly up to what it did not receive live
+            self.position = page["next_since"]
+            if not page["has_more"]:
+                return
+
+    def _broadcast(self, event: bytes, drop_when_full: bool = True):
+        for subscription in list(self._subscribers):
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                if drop_when_full:
+                    subscription.dropped = True
+                    self._subscribers.discard(subscription)
+                    self.dropped += 1
+
+    def _load_changes(self, since: int, limit: int) -> dict:
+        db = self.session_factory()
+        try:
+            return fetch_changes(db, since, limit)
+        finally:
+            db.close()
+
+    def _load_latest(self) -> int:
+        db = self.session_factory()
+        try:
+            return ChangeLogRepo.fetch_latest_seq(db)
+        finally:
+            db.close()
+
+
+def build_change_stream_hub() -> ChangeStreamHub:
+    return ChangeStreamHub(
+        queue_size=int(os.environ.get("MOVIE_STREAM_QUEUE_SIZE", 256)),
+        poll_interval=float(os.environ.get("MOVIE_STREAM_POLL_INTERVAL", 1.0)),
+        heartbeat_interval=float(os.environ.get("MOVIE_STREAM_HEARTBEAT", 15.0)),
+    )
+
+
+change_stream = build_change_stream_hub()
+catalog_events.subscribe(change_stream.notify)
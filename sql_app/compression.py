@@ -0,0 +1,317 @@
+import hashlib
+import os
+import zlib
+from typing import Dict, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from monitoring.metrics import registry
+from sql_app.cache.ttl_cache import TTLCache
+
+try:
+    import brotli
+except ImportError:  # optional: br is only offered when the package is installed
+    brotli = None
+try:
+    import zstandard
+except ImportError:  # optional: zstd is only offered when the package is installed
+    zstandard = None
+
+# media types worth compressing; everything else (already compressed or binary) passes through
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/x-ndjson", "application/xml",
+                      "application/rss+xml", "application/atom+xml", "application/javascript")
+# bodies larger than this are compressed in the threadpool rather than on the event loop
+THREADPOOL_SIZE = 64 * 1024
+
+compressed_responses = registry.counter(
+    "http_compressed_responses_total", "Responses sent compressed, by encoding and how.", ["encoding", "mode"]
+)
+compression_input_bytes = registry.counter(
+    "http_compression_input_bytes_total", "Response bytes before compression.", ["encoding"]
+)
+compression_output_bytes = registry.counter(
+    "http_compression_output_bytes_total", "Response bytes after compression.", ["encoding"]
+)
+
+
+class Gzip:
+    name = "gzip"
+
+    def __init__(self, level: int = 6):
+        self.level = level
+
+    def compress(self, body: bytes) -> bytes:
+        compressor = self.compressor()
+        return compressor.compress(body) + compressor.flush()
+
+    def compressor(self):
+        return _StreamingZlib(zlib.compressobj(self.level, zlib.DEFLATED, 31))
+
+
+class _StreamingZlib:
+
+    def __init__(self, compressobj):
+        self._compressobj = compressobj
+
+    def compress(self, chunk: bytes) -> bytes:
+        # a sync flush ends every chunk on a byte boundary, so the client can decode it right away
+        return self._compressobj.compress(chunk) + self._compressobj.flush(zlib.Z_SYNC_FLUSH)
+
+    def flush(self) -> bytes:
+        return self._compressobj.flush()
+
+
+class Brotli:
+    name = "br"
+
+    def __init__(self, quality: int = 4):
+        self.quality = quality
+
+    def compress(self, body: bytes) -> bytes:
+        return brotli.compress(body, quality=self.quality)
+
+    def compressor(self):
+        return _StreamingBrotli(brotli.Compressor(quality=self.quality))
+
+
+class _StreamingBrotli:
+
+    def __init__(self, compressor):
+        self._compressor = compressor
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._compressor.process(chunk) + self._compressor.flush()
+
+    def flush(self) -> bytes:
+        return self._compressor.finish()
+
+
+class Zstd:
+    name = "zstd"
+
+    def __init__(self, level: int = 3):
+        self.level = level
+
+    def compress(self, body: bytes) -> bytes:
+        return zstandard.ZstdCompressor(level=self.level).compress(body)
+
+    def compressor(self):
+        return _StreamingZstd(zstandard.ZstdCompressor(level=self.level).compressobj())
+
+
+class _StreamingZstd:
+
+    def __init__(self, compressobj):
+        self._compressobj = compressobj
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._compressobj.compress(chunk) + self._compressobj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def flush(self) -> bytes:
+        return self._compressobj.flush()
+
+
+def available_codecs(gzip_level: int = 6, brotli_quality: int = 4, zstd_level: int = 3) -> Dict[str, object]:
+    """
+    The codecs this process can offer, most preferred first
+    """
+    codecs = {}
+    if zstandard is not None:
+        codecs["zstd"] = Zstd(zstd_level)
+    if brotli is not None:
+        codecs["br"] = Brotli(brotli_quality)
+    codecs["gzip"] = Gzip(gzip_level)
+    return codecs
+
+
+def negotiate(accept_encoding: Optional[str], offered: List[str]) -> Optional[str]:
+    """
+    The coding of ``offered`` the client ranks highest in Accept-Encoding; ties go to the
+    order of ``offered``. None means the response is sent as is.
+    """
+    if not accept_encoding:
+        return None
+    weights = {}
+    for item in accept_encoding.split(","):
+        coding, _, parameters = item.strip().partition(";")
+        weight = 1.0
+        name, _, value = parameters.strip().partition("=")
+        if name.strip().lower() == "q":
+            try:
+                weight = float(value)
+            except ValueError:
+                weight = 0.0
+        weights[coding.strip().lower()] = weight
+    best, best_weight = None, 0.0
+    for coding in offered:
+        weight = weights.get(coding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses with the best coding the client accepts: zstd and br when their
+    packages are installed, gzip always. Bodies below ``minimum_size`` are sent as is.
+    Every response of a compressible type carries ``Vary: Accept-Encoding``, compressed or not,
+    so shared caches keep the identity and compressed variants apart.
+    Streamed responses are compressed chunk by chunk and flushed after each one, so NDJSON
+    exports and Server-Sent Events still reach the client as they are produced.
+
+    A response with an ETag is a cacheable representation: its compressed body is kept in
+    ``cache``, so hot catalog pages and feeds are compressed once rather than on every request.
+    Compressed responses get a weak ETag, which If-None-Match still matches.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, codecs: Optional[Dict[str, object]] = None,
+                 cache: Optional[TTLCache] = None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.codecs = codecs if codecs is not None else build_codecs()
+        self.cache = cache if cache is not None else precompressed
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept_encoding = None
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+        coding = negotiate(accept_encoding, list(self.codecs))
+        responder = _CompressingResponder(self, None if coding is None else self.codecs[coding], send)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressingResponder:
+
+    def __init__(self, middleware: CompressionMiddleware, codec, send):
+        self.middleware = middleware
+        self.codec = codec
+        self._send = send
+        self._start = None
+        self._compressor = None
+        self._passthrough = False
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            self._start = message
+            compressible = self._compressible(message)
+            self._passthrough = not compressible or self.codec is None
+            if self._passthrough:
+                await self._send(_varied_start(message) if compressible else message)
+            return
+        if message["type"] != "http.response.body" or self._passthrough:
+            await self._send(message)
+            return
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self._compressor is None and not more_body:
+            await self._send_whole(body)
+        else:
+            await self._send_chunk(body, more_body)
+
+    def _compressible(self, start) -> bool:
+        headers = _headers(start)
+        if start["status"] < 200 or start["status"] in (204, 304) or b"content-encoding" in headers:
+            return False
+        media_type = headers.get(b"content-type", b"").decode("latin-1")
+        return media_type.startswith(COMPRESSIBLE_TYPES)
+
+    async def _send_whole(self, body: bytes):
+        start = self._start
+        if len(body) < self.middleware.minimum_size:
+            await self._send(_varied_start(start))
+            await self._send({"type": "http.response.body", "body": body})
+            return
+        etag = _headers(start).get(b"etag")
+        # pages of one catalog version share an ETag, so the body's digest tells them apart
+        key = None if etag is None else (etag, self.codec.name, hashlib.blake2b(body, digest_size=16).digest())
+        compressed = None if key is None else self.middleware.cache.get(key)
+        if compressed is not None:
+            compressed_responses.inc(self.codec.name, "cached")
+        else:
+            if len(body) > THREADPOOL_SIZE:
+                compressed = await run_in_threadpool(self.codec.compress, body)
+            else:
+                compressed = self.codec.compress(body)
+            if key is not None:
+                self.middleware.cache.set(key, compressed)
+            compressed_responses.inc(self.codec.name, "whole")
+            compression_input_bytes.inc(self.codec.name, amount=len(body))
+            compression_output_bytes.inc(self.codec.name, amount=len(compressed))
+        await self._send(_compressed_start(start, self.codec.name, len(compressed)))
+        await self._send({"type": "http.response.body", "body": compressed})
+
+    async def _send_chunk(self, chunk: bytes, more_body: bool):
+        if self._compressor is None:
+            self._compressor = self.codec.compressor()
+            compressed_responses.inc(self.codec.name, "streamed")
+            await self._send(_compressed_start(self._start, self.codec.name))
+        compressed = self._compressor.compress(chunk) if chunk else b""
+        if not more_body:
+            compressed += self._compressor.flush()
+        compression_input_bytes.inc(self.codec.name, amount=len(chunk))
+        compression_output_bytes.inc(self.codec.name, amount=len(compressed))
+        if compressed or not more_body:
+            await self._send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+
+
+def _headers(start) -> dict:
+    return {name.lower(): value for name, value in start.get("headers", [])}
+
+
+def _varied_start(start) -> dict:
+    """
+    ``start`` with Accept-Encoding added to its Vary header
+    """
+    headers = []
+    vary = []
+    for name, value in start.get("headers", []):
+        if name.lower() == b"vary":
+            vary.append(value)
+            continue
+        headers.append((name, value))
+    if not any(b"accept-encoding" in value.lower() for value in vary):
+        vary.append(b"Accept-Encoding")
+    headers.append((b"vary", b", ".join(vary)))
+    return dict(start, headers=headers)
+
+
+def _compressed_start(start, coding: str, length: Optional[int] = None) -> dict:
+    headers = []
+    for name, value in _varied_start(start)["headers"]:
+        lowered = name.lower()
+        if lowered == b"content-length":
+            continue
+        if lowered == b"etag" and not value.startswith(b"W/"):
+            value = b"W/" + value
+        headers.append((name, value))
+    headers.append((b"content-encoding", coding.encode("latin-1")))
+    if length is not None:
+        headers.append((b"content-length", str(length).encode("latin-1")))
+    return dict(start, headers=headers)
+
+
+def build_codecs() -> Dict[str, object]:
+    """
+    Levels from COMPRESSION_GZIP_LEVEL (6), COMPRESSION_BROTLI_QUALITY (4) and
+    COMPRESSION_ZSTD_LEVEL (3); COMPRESSION_ENCODINGS=gzip limits what is offered
+    """
+    codecs = available_codecs(
+        gzip_level=int(os.environ.get("COMPRESSION_GZIP_LEVEL", 6)),
+        brotli_quality=int(os.environ.get("COMPRESSION_BROTLI_QUALITY", 4)),
+        zstd_level=int(os.environ.get("COMPRESSION_ZSTD_LEVEL", 3)),
+    )
+    allowed = os.environ.get("COMPRESSION_ENCODINGS")
+    if allowed:
+        wanted = [coding.strip() for coding in allowed.split(",") if coding.strip()]
+        codecs = {coding: codecs[coding] for coding in wanted if coding in codecs}
+    return codecs
+
+
+precompressed = TTLCache(
+    maxsize=int(os.environ.get("COMPRESSION_CACHE_SIZE", 512)),
+    ttl=float(os.environ.get("COMPRESSION_CACHE_TTL", 300)),
+)
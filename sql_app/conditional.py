@@ -0,0 +1,55 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from starlette.requests import Request
+
+
+def strong_etag(body: bytes) -> str:
+    return '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+
+
+def movie_etag(movie_id: int, version: int) -> str:
+    return f'"movie-{movie_id}-v{version}"'
+
+
+def catalog_etag(version: int) -> str:
+    return f'"catalog-v{version}"'
+
+
+def http_date(moment: datetime) -> str:
+    return format_datetime(moment.astimezone(timezone.utc).replace(microsecond=0), usegmt=True)
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """
+    Evaluate If-None-Match / If-Modified-Since the way RFC 7232 orders them: when the client
+    sends validators in If-None-Match, If-Modified-Since is ignored
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+        return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def if_match_fails(request: Request, etag: str) -> bool:
+    """
+    True when an If-Match header is present and names neither the current ETag nor "*";
+    If-Match uses the strong comparison, so weak validators never match
+    """
+    if_match = request.headers.get("if-match")
+    if if_match is None:
+        return False
+    candidates = [candidate.strip() for candidate in if_match.split(",")]
+    return "*" not in candidates and etag not in candidates
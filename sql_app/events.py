@@ -0,0 +1,67 @@
+import logging
+import threading
+from typing import Callable, List, NamedTuple, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogChange(NamedTuple):
+    action: str
+    movie_id: Optional[int] = None
+
+
+class CatalogEvents:
+    """
+    In-process notifications of committed writes to the movie catalog. MovieRepo publishes
+    after each commit; caches and other derived views subscribe to stay current.
+    """
+
+    def __init__(self):
+        self._listeners: List[Callable[[CatalogChange], None]] = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, listener: Callable[[CatalogChange], None]):
+        with self._lock:
+            self._listeners = self._listeners + [listener]
+        return listener
+
+    def unsubscribe(self, listener: Callable[[CatalogChange], None]):
+        with self._lock:
+            self._listeners = [existing for existing in self._listeners if existing is not listener]
+
+    def publish(self, action: str, movie_id: Optional[int] = None):
+        change = CatalogChange(action, movie_id)
+        for listener in self._listeners:
+            try:
+                listener(change)
+            except Exception:
+                # the write is already committed; a failing listener must not turn it into an error
+                logger.exception("Catalog listener %r failed for %s", listener, change)
+
+
+catalog_events = CatalogEvents()
+
+
+# Session.info key for changes waiting on their transaction
+PENDING_CHANGES = "pending_catalog_changes"
+
+
+def publish_after_commit(db: Session, action: str, movie_id: Optional[int] = None):
+    """
+    Publish the change once ``db`` commits, whoever commits it; dropped if it rolls back
+    """
+    db.info.setdefault(PENDING_CHANGES, []).append(CatalogChange(action, movie_id))
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_committed_changes(session: Session):
+    for change in session.info.pop(PENDING_CHANGES, ()):
+        catalog_events.publish(*change)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back_changes(session: Session):
+    session.info.pop(PENDING_CHANGES, None)
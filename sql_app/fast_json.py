@@ -0,0 +1,18 @@
+from typing import Iterable, Sequence
+
+import orjson
+
+from sql_app.repositories.movie_repository import MOVIE_ROW_FIELDS
+
+
+def encode_movie_rows(rows: Iterable[Sequence], fields: Sequence[str] = MOVIE_ROW_FIELDS) -> bytes:
+    """
+    JSON array of movies straight from row tuples: the same document the List[Movie]
+    response model produces, without per-row Pydantic validation and jsonable_encoder.
+    ``fields`` names the row's columns when only some were selected.
+    """
+    return orjson.dumps([dict(zip(fields, row)) for row in rows])
+
+
+def encode_movie_row(row: Sequence) -> bytes:
+    return orjson.dumps(dict(zip(MOVIE_ROW_FIELDS, row)))
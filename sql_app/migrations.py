@@ -0,0 +1,322 @@
+"""
+Idempotent, in-place schema upgrades for databases created before a column or index
+existed. ``create_all`` only creates missing tables, so changes to existing tables live here.
+
+Run them once per deployment with ``python manage.py migrate`` (see ``create_schema``);
+the development server also applies them before starting.
+"""
+from typing import Dict, List, Tuple
+
+from sqlalchemy import inspect, text, update
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateIndex
+
+from sql_app.models.api_key_model import ApiKey
+from sql_app.models.movie_model import MOVIE_SORT_INDEXES
+from sql_app.repositories.api_key_repository import ApiKeyRepo
+
+
+def _column_names(connection, table: str) -> set:
+    return {column["name"] for column in inspect(connection).get_columns(table)}
+
+
+def add_api_key_public_digest(engine):
+    with engine.begin() as connection:
+        if "public_digest" not in _column_names(connection, "api_keys"):
+            connection.execute(text("ALTER TABLE api_keys ADD COLUMN public_digest VARCHAR(64)"))
+        connection.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS ix_api_keys_public_digest ON api_keys (public_digest)"
+        ))
+
+    # one-time backfill: decrypt each legacy public key once and store its digest. Only the columns
+    # needed are loaded, since columns added by later migrations may not exist yet.
+    with Session(bind=engine) as db:
+        for key_id, public in db.query(ApiKey.id, ApiKey.public).filter(ApiKey.public_digest.is_(None)).all():
+            db.execute(
+                update(ApiKey).where(ApiKey.id == key_id)
+                .values(public_digest=ApiKeyRepo.digest_public_key(public))
+            )
+        db.commit()
+
+
+def add_api_key_rate_limits(engine):
+    with engine.begin() as connection:
+        columns = _column_names(connection, "api_keys")
+        for column in ("rate_limit_per_minute", "rate_limit_burst"):
+            if column not in columns:
+                connection.execute(text(f"ALTER TABLE api_keys ADD COLUMN {column} INTEGER"))
+
+
+def add_movie_version_columns(engine):
+    """
+    SQLite cannot add a column with a CURRENT_TIMESTAMP default, so updated_at is backfilled
+    """
+    with engine.begin() as connection:
+        columns = _column_names(connection, "movies")
+        if "version" not in columns:
+            connection.execute(text("ALTER TABLE movies ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+        if "updated_at" not in columns:
+            connection.execute(text("ALTER TABLE movies ADD COLUMN updated_at DATETIME"))
+            connection.execute(text("UPDATE movies SET updated_at = CURRENT_TIMESTAMP WHERE updated_at IS NULL"))
+
+
+MOVIE_SEARCH_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS movies_fts USING fts5(
+        title, subtitle, description,
+        content='movies', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS movies_fts_ai AFTER INSERT ON movies BEGIN
+        INSERT INTO movies_fts(rowid, title, subtitle, description)
+        VALUES (new.id, new.title, new.subtitle, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS movies_fts_ad AFTER DELETE ON movies BEGIN
+        INSERT INTO movies_fts(movies_fts, rowid, title, subtitle, description)
+        VALUES ('delete', old.id, old.title, old.subtitle, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS movies_fts_au AFTER UPDATE OF title, subtitle, description ON movies BEGIN
+        INSERT INTO movies_fts(movies_fts, rowid, title, subtitle, description)
+        VALUES ('delete', old.id, old.title, old.subtitle, old.description);
+        INSERT INTO movies_fts(rowid, title, subtitle, description)
+        VALUES (new.id, new.title, new.subtitle, new.description);
+    END
+    """,
+]
+
+
+def add_movie_search_index(engine):
+    with engine.begin() as connection:
+        exists = connection.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'movies_fts'"
+        )).first()
+        for statement in MOVIE_SEARCH_DDL:
+            connection.execute(text(statement))
+        if not exists:
+            rebuild_movie_search_index(connection)
+
+
+def rebuild_movie_search_index(connection):
+    """
+    Re-index every row of ``movies`` from scratch, e.g. after rows were loaded with the
+    triggers missing
+    """
+    connection.execute(text("INSERT INTO movies_fts(movies_fts) VALUES ('rebuild')"))
+
+
+class DuplicateMoviesError(RuntimeError):
+    """
+    The movies table holds several rows for one (title, subtitle), so the unique index
+    cannot be built. ``groups`` maps each (title, subtitle) to its ids, oldest first.
+    """
+
+    def __init__(self, groups: Dict[Tuple[str, str], List[int]]):
+        listing = "; ".join(f"{title!r}/{subtitle!r}: ids {ids}" for (title, subtitle), ids in groups.items())
+        super().__init__(
+            f"{len(groups)} (title, subtitle) pairs are held by more than one movie ({listing}). "
+            "Nothing was changed; run `python manage.py dedupe-movies` to make the copies unique, then migrate again."
+        )
+        self.groups = groups
+
+
+def find_duplicate_movies(connection) -> Dict[Tuple[str, str], List[int]]:
+    groups = {}
+    for title, subtitle, movie_id in connection.execute(text(
+        "SELECT title, coalesce(subtitle, ''), id FROM movies WHERE (title, coalesce(subtitle, '')) IN "
+        "(SELECT title, coalesce(subtitle, '') FROM movies GROUP BY 1, 2 HAVING count(*) > 1) "
+        "ORDER BY title, coalesce(subtitle, ''), id"
+    )):
+        groups.setdefault((title, subtitle), []).append(movie_id)
+    return groups
+
+
+def dedupe_movies(engine) -> List[Tuple[int, str]]:
+    """
+    Keep the oldest movie of each duplicated (title, subtitle) as it is and give every later
+    copy a subtitle of its own ("<subtitle> (copy <id>)"). No row is deleted. Returns the
+    (id, new subtitle) of each renamed movie.
+    """
+    renamed = []
+    with engine.begin() as connection:
+        for (_, subtitle), ids in find_duplicate_movies(connection).items():
+            for movie_id in ids[1:]:
+                new_subtitle = f"{subtitle} (copy {movie_id})".lstrip()
+                connection.execute(text("UPDATE movies SET subtitle = :subtitle WHERE id = :id"),
+                                   {"subtitle": new_subtitle, "id": movie_id})
+                renamed.append((movie_id, new_subtitle))
+    return renamed
+
+
+def add_movie_title_subtitle_unique_index(engine):
+    """
+    Older databases may already hold several rows for one (title, subtitle). Rather than
+    pick which to drop, the migration stops with DuplicateMoviesError and leaves the rows
+    as they are; ``manage.py dedupe-movies`` resolves them.
+    """
+    with engine.begin() as connection:
+        exists = connection.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'ux_movies_title_subtitle'"
+        )).first()
+        if exists:
+            return
+        duplicates = find_duplicate_movies(connection)
+        if duplicates:
+            raise DuplicateMoviesError(duplicates)
+        connection.execute(text(
+            "CREATE UNIQUE INDEX ux_movies_title_subtitle ON movies (title, coalesce(subtitle, ''))"
+        ))
+
+
+CATALOG_VERSION_DDL = [
+    "CREATE TABLE IF NOT EXISTS cache_versions (name VARCHAR(50) PRIMARY KEY, version INTEGER NOT NULL)",
+    "INSERT OR IGNORE INTO cache_versions (name, version) VALUES ('movies', 0)",
+    """
+    CREATE TRIGGER IF NOT EXISTS movies_version_ai AFTER INSERT ON movies BEGIN
+        UPDATE cache_versions SET version = version + 1 WHERE name = 'movies';
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS movies_version_au AFTER UPDATE ON movies BEGIN
+        UPDATE cache_versions SET version = version + 1 WHERE name = 'movies';
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS movies_version_ad AFTER DELETE ON movies BEGIN
+        UPDATE cache_versions SET version = version + 1 WHERE name = 'movies';
+    END
+    """,
+]
+
+
+def add_catalog_version_counter(engine):
+    """
+    A counter bumped in the same transaction as every change to ``movies``, so worker
+    processes can tell that their cached view of the catalog is out of date
+    """
+    with engine.begin() as connection:
+        for statement in CATALOG_VERSION_DDL:
+            connection.execute(text(statement))
+
+
+API_KEY_VERSION_DDL = [
+    "INSERT OR IGNORE INTO cache_versions (name, version) VALUES ('api_keys', 0)",
+    """
+    CREATE TRIGGER IF NOT EXISTS api_keys_version_ai AFTER INSERT ON api_keys BEGIN
+        UPDATE cache_versions SET version = version + 1 WHERE name = 'api_keys';
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS api_keys_version_au AFTER UPDATE ON api_keys BEGIN
+        UPDATE cache_versions SET version = version + 1 WHERE name = 'api_keys';
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS api_keys_version_ad AFTER DELETE ON api_keys BEGIN
+        UPDATE cache_versions SET version = version + 1 WHERE name = 'api_keys';
+    END
+    """,
+]
+
+
+def add_api_key_version_counter(engine):
+    """
+    Same counter as the catalog's for ``api_keys``, so every worker drops its verified keys
+    when a key is deleted, replaced or given other limits by another worker
+    """
+    with engine.begin() as connection:
+        for statement in API_KEY_VERSION_DDL:
+            connection.execute(text(statement))
+
+
+MOVIE_CHANGE_LOG_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS movie_changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        movie_id INTEGER NOT NULL,
+        action VARCHAR(10) NOT NULL,
+        changed_at DATETIME NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_movie_changes_movie_id_seq ON movie_changes (movie_id, seq)",
+    "INSERT OR IGNORE INTO cache_versions (name, version) VALUES ('movie_changes_horizon', 0)",
+    """
+    CREATE TRIGGER IF NOT EXISTS movie_changes_ai AFTER INSERT ON movies BEGIN
+        INSERT INTO movie_changes (movie_id, action, changed_at) VALUES (new.id, 'upsert', CURRENT_TIMESTAMP);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS movie_changes_au AFTER UPDATE ON movies BEGIN
+        INSERT INTO movie_changes (movie_id, action, changed_at) VALUES (new.id, 'upsert', CURRENT_TIMESTAMP);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS movie_changes_ad AFTER DELETE ON movies BEGIN
+        INSERT INTO movie_changes (movie_id, action, changed_at) VALUES (old.id, 'delete', CURRENT_TIMESTAMP);
+    END
+    """,
+]
+
+
+def add_movie_change_log(engine):
+    """
+    Change log behind GET /movies/changes. Movies that exist when the log is first created
+    are entered as upserts, so syncing from seq 0 replays the whole catalog.
+    """
+    with engine.begin() as connection:
+        exists = connection.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'movie_changes_ai'"
+        )).first()
+        for statement in MOVIE_CHANGE_LOG_DDL:
+            connection.execute(text(statement))
+        if not exists:
+            connection.execute(text(
+                "INSERT INTO movie_changes (movie_id, action, changed_at) "
+                "SELECT id, 'upsert', CURRENT_TIMESTAMP FROM movies ORDER BY id"
+            ))
+
+
+def add_movie_sort_indexes(engine):
+    """
+    Indexes behind the filters and sorts of GET /movies; each one is built only if missing
+    """
+    with engine.begin() as connection:
+        for index in MOVIE_SORT_INDEXES:
+            connection.execute(CreateIndex(index, if_not_exists=True))
+
+
+MIGRATIONS = [
+    add_api_key_public_digest,
+    add_movie_search_index,
+    add_movie_title_subtitle_unique_index,
+    add_catalog_version_counter,
+    add_api_key_rate_limits,
+    add_movie_version_columns,
+    add_movie_change_log,
+    add_movie_sort_indexes,
+    add_api_key_version_counter,
+]
+
+
+def run_migrations(engine):
+    for migration in MIGRATIONS:
+        migration(engine)
+
+
+def create_schema(engine):
+    """
+    Create missing tables and apply the migrations. Run once per deployment, through
+    ``python manage.py migrate``, rather than by every worker that starts.
+    """
+    from sqlite_db.sqlite import Base
+    import sql_app.models.api_key_model  # noqa: F401 - registers the tables on Base
+    import sql_app.models.movie_change_model  # noqa: F401
+    import sql_app.models.movie_model  # noqa: F401
+
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
@@ -12,7 +12,12 @@ class ApiKey(Base):
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     secret = Column(StringEncryptedType(String, key=encryption_key), nullable=False, unique=True)
     public = Column(StringEncryptedType(String, key=encryption_key), nullable=False, unique=True)
+    # keyed HMAC of the public key, so authentication never has to filter on the encrypted column
+    public_digest = Column(String(64), nullable=True, unique=True, index=True)
     domain = Column(String(100), nullable=False, unique=True)
+    # per-domain rate limit; NULL falls back to RATE_LIMIT_PER_MINUTE / RATE_LIMIT_BURST
+    rate_limit_per_minute = Column(Integer, nullable=True)
+    rate_limit_burst = Column(Integer, nullable=True)
 
     # helper method to print the object at runtime
     def __repr__(self):
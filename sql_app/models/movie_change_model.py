@@ -0,0 +1,27 @@
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Index, Integer, String
+
+from sqlite_db.sqlite import Base
+
+
+class MovieChange(Base):
+    """
+    One row per insert, update or delete of a movie, written by triggers in the same
+    transaction as the change. AUTOINCREMENT keeps seq monotonic even after compaction
+    deletes the newest rows.
+    """
+    __tablename__ = "movie_changes"
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    movie_id = Column(Integer, nullable=False)
+    # "upsert" or "delete"
+    action = Column(String(10), nullable=False)
+    changed_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return 'MovieChangeModel(seq=%s, movie_id=%s, action=%s)' % (self.seq, self.movie_id, self.action)
+
+
+Index("ix_movie_changes_movie_id_seq", MovieChange.movie_id, MovieChange.seq)
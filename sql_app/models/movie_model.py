@@ -1,4 +1,6 @@
-from sqlalchemy import Column, Integer, String, Float
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, String, Float, Index, func
 from sqlite_db.sqlite import Base
 
 
@@ -10,8 +12,27 @@ class Movie(Base):
     subtitle = Column(String(150), nullable=True)
     price = Column(Float(precision=2), nullable=False)
     description = Column(String(200), nullable=True)
+    # bumped by every MovieRepo.update; together with the id it is the movie's ETag
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    # naive UTC; NULL only for rows inserted by hand into a database migrated from before this column
+    updated_at = Column(DateTime, nullable=True, default=datetime.utcnow, server_default=func.current_timestamp())
 
     # helper method to print the object at runtime
     def __repr__(self):
         return 'MovieModel(title=%s, subtitle=%s, price=%s, description=%s,)' \
-               % (self.title, self.subtitle, self.price, self.description)
\ No newline at end of file
+               % (self.title, self.subtitle, self.price, self.description)
+
+
+# a movie is identified by its title and subtitle; a missing subtitle counts as one value, not as distinct NULLs
+Index("ux_movies_title_subtitle", Movie.title, func.coalesce(Movie.subtitle, ""), unique=True)
+
+# behind the filters and sorts of GET /movies (see sql_app/movie_query.py). Every SQLite index ends
+# with the rowid, which is the id tie-breaker, so a page is read straight off one of these in order.
+MOVIE_SORT_INDEXES = [
+    Index("ix_movies_price", Movie.price),
+    Index("ix_movies_price_title", Movie.price, Movie.title),
+    Index("ix_movies_price_title_desc", Movie.price, Movie.title.desc()),
+    Index("ix_movies_title_price", Movie.title, Movie.price),
+    Index("ix_movies_title_price_desc", Movie.title, Movie.price.desc()),
+    Index("ix_movies_subtitle", Movie.subtitle),
+]
@@ -0,0 +1,103 @@
+from typing import NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, or_
+
+from sql_app.models.movie_model import Movie
+
+SORTABLE_FIELDS = ("title", "price")
+# every supported order has an index of its own in MOVIE_SORT_INDEXES
+MAX_SORT_KEYS = 2
+
+
+class SortKey(NamedTuple):
+    field: str
+    descending: bool = False
+
+    @property
+    def column(self):
+        return getattr(Movie, self.field)
+
+    def order_by(self):
+        return self.column.desc() if self.descending else self.column.asc()
+
+
+DEFAULT_SORT = (SortKey("id"),)
+
+
+class MovieFilter(NamedTuple):
+    title_prefix: Optional[str] = None
+    subtitle: Optional[str] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+
+    def conditions(self) -> list:
+        conditions = []
+        if self.title_prefix:
+            # a range on the title rather than LIKE, so the title indexes apply; case sensitive
+            conditions.append(Movie.title >= self.title_prefix)
+            upper = prefix_upper_bound(self.title_prefix)
+            if upper is not None:
+                conditions.append(Movie.title < upper)
+        if self.subtitle is not None:
+            conditions.append(Movie.subtitle == self.subtitle)
+        if self.min_price is not None:
+            conditions.append(Movie.price >= self.min_price)
+        if self.max_price is not None:
+            conditions.append(Movie.price <= self.max_price)
+        return conditions
+
+
+def prefix_upper_bound(prefix: str) -> Optional[str]:
+    """
+    The smallest string greater than every string starting with ``prefix``, or None when
+    there is none
+    """
+    while prefix and prefix[-1] == chr(0x10FFFF):
+        prefix = prefix[:-1]
+    if not prefix:
+        return None
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def parse_sort(sort: Optional[str]) -> Tuple[SortKey, ...]:
+    """
+    ``price,-title`` -> price ascending, then title descending, then id. ``-`` sorts a key
+    descending. id always breaks ties, in the direction of the first key, which is the order
+    the matching index is read in; on its own it sorts by id alone (``id`` or ``-id``).
+    """
+    if not sort:
+        return DEFAULT_SORT
+    keys = []
+    for item in sort.split(","):
+        item = item.strip()
+        descending = item.startswith("-")
+        field = item.lstrip("-")
+        if field == "id" and len(sort.split(",")) == 1:
+            return (SortKey("id", descending),)
+        if field not in SORTABLE_FIELDS:
+            raise ValueError(f"Cannot sort by {item!r}. Choose from {', '.join(SORTABLE_FIELDS)}, or id alone")
+        if any(key.field == field for key in keys):
+            raise ValueError(f"{field} is listed twice in sort")
+        keys.append(SortKey(field, descending))
+    if len(keys) > MAX_SORT_KEYS:
+        raise ValueError(f"At most {MAX_SORT_KEYS} sort keys")
+    return tuple(keys) + (SortKey("id", keys[0].descending),)
+
+
+def keyset_after(sort: Sequence[SortKey], values: Sequence) -> object:
+    """
+    Rows strictly after the row whose sort keys are ``values``, in ``sort`` order. The
+    redundant bound on the first key gives SQLite a range to search the index with.
+    """
+    alternatives = []
+    for position, key in enumerate(sort):
+        equal = [earlier.column == value for earlier, value in zip(sort[:position], values)]
+        after = key.column < values[position] if key.descending else key.column > values[position]
+        alternatives.append(and_(*equal, after))
+    first = sort[0]
+    bound = first.column <= values[0] if first.descending else first.column >= values[0]
+    return and_(bound, or_(*alternatives))
+
+
+def format_sort(sort: Sequence[SortKey]) -> str:
+    return ",".join(("-" if key.descending else "") + key.field for key in sort)
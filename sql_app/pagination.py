@@ -0,0 +1,56 @@
+import base64
+import binascii
+from typing import Optional, Sequence
+
+import orjson
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(last_id: int) -> str:
+    """
+    Opaque keyset cursor pointing just past the row with the given id
+    """
+    return base64.urlsafe_b64encode(f"id:{last_id}".encode("ascii")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[int]:
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        prefix, _, value = base64.urlsafe_b64decode(padded.encode("ascii")).decode("ascii").partition(":")
+        if prefix != "id":
+            raise ValueError(cursor)
+        return int(value)
+    except (binascii.Error, UnicodeError, ValueError):
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+
+def encode_keys_cursor(sort: str, values: Sequence) -> str:
+    """
+    Opaque keyset cursor for a sorted page: the sort it belongs to and the sort keys of the
+    last row sent
+    """
+    payload = b"keys:" + orjson.dumps([sort] + list(values))
+    return base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+
+
+def decode_keys_cursor(cursor: Optional[str], sort: str, count: int) -> Optional[list]:
+    """
+    The sort keys in ``cursor``; a cursor made for another sort is rejected
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        prefix, _, value = base64.urlsafe_b64decode(padded.encode("ascii")).partition(b":")
+        if prefix != b"keys":
+            raise ValueError(cursor)
+        values = orjson.loads(value)
+        if not isinstance(values, list) or len(values) != count + 1 or values[0] != sort:
+            raise ValueError(cursor)
+        return values[1:]
+    except (binascii.Error, orjson.JSONDecodeError, ValueError):
+        raise ValueError(f"Invalid cursor: {cursor}")
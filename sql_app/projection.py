@@ -0,0 +1,49 @@
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import orjson
+
+from sql_app.repositories.movie_repository import MOVIE_ROW_FIELDS
+
+# one GET query string of ids; longer lists go through POST /movies/by-ids
+MAX_QUERY_IDS = 500
+
+
+def select_fields(requested: Optional[Iterable[str]]) -> Tuple[str, ...]:
+    """
+    Validated subset of MOVIE_ROW_FIELDS in canonical order. ``id`` is always included:
+    clients need it to tell the movies apart and pagination needs it for the cursor.
+    """
+    if requested is None:
+        return MOVIE_ROW_FIELDS
+    wanted = {field.strip() for field in requested if field.strip()}
+    unknown = wanted.difference(MOVIE_ROW_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}. Choose from {', '.join(MOVIE_ROW_FIELDS)}")
+    wanted.add("id")
+    return tuple(field for field in MOVIE_ROW_FIELDS if field in wanted)
+
+
+def parse_fields(fields: Optional[str]) -> Tuple[str, ...]:
+    return select_fields(None if fields is None else fields.split(","))
+
+
+def parse_ids(ids: str, limit: int = MAX_QUERY_IDS) -> List[int]:
+    try:
+        parsed = [int(value) for value in ids.split(",") if value.strip()]
+    except ValueError:
+        raise ValueError(f"ids must be a comma separated list of integers: {ids}")
+    if len(parsed) > limit:
+        raise ValueError(f"At most {limit} ids per request")
+    return parsed
+
+
+def project_json(body: bytes, fields: Sequence[str]) -> bytes:
+    """
+    Narrow an already encoded movie, or list of movies, to ``fields``
+    """
+    if tuple(fields) == MOVIE_ROW_FIELDS:
+        return body
+    document = orjson.loads(body)
+    if isinstance(document, list):
+        return orjson.dumps([{field: movie[field] for field in fields} for movie in document])
+    return orjson.dumps({field: document[field] for field in fields})
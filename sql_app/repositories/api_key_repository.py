@@ -1,24 +1,33 @@
 import base64
+import hashlib
+import hmac
 import os
 import random
 import string
+from sqlalchemy import text
 from sqlalchemy.orm import Session
-from sql_app.models.api_key_model import ApiKey
+from sql_app.cache.api_key_cache import unknown_api_keys, verified_api_keys
+from sql_app.models.api_key_model import ApiKey, encryption_key
 from sql_app.schemas.api_key_schema import ApiKeyCreate
 
 
 class ApiKeyRepo:
 
     @staticmethod
-    async def create(db: Session, api_key: ApiKeyCreate):
+    def create(db: Session, api_key: ApiKeyCreate, commit: bool = True):
         db_api_key = ApiKey(
             secret=api_key.secret,
             public=api_key.public,
+            public_digest=ApiKeyRepo.digest_public_key(api_key.public),
             domain=api_key.domain,
         )
+        unknown_api_keys.pop(db_api_key.public_digest)
         db.add(db_api_key)
-        db.commit()
-        db.refresh(db_api_key)
+        if commit:
+            db.commit()
+            db.refresh(db_api_key)
+        else:
+            db.flush()
         return db_api_key
 
     @staticmethod
@@ -31,7 +40,11 @@ class ApiKeyRepo:
 
     @staticmethod
     def fetch_by_public(db: Session, public):
-        return db.query(ApiKey).filter(ApiKey.public == public).first()
+        return ApiKeyRepo.fetch_by_digest(db, ApiKeyRepo.digest_public_key(public))
+
+    @staticmethod
+    def fetch_by_digest(db: Session, digest):
+        return db.query(ApiKey).filter(ApiKey.public_digest == digest).first()
 
     @staticmethod
     def fetch_by_domain(db: Session, domain):
@@ -42,17 +55,55 @@ class ApiKeyRepo:
         return db.query(ApiKey).filter(ApiKey.public == public and ApiKey.domain == domain).first()
 
     @staticmethod
-    async def delete(db: Session, api_key_id):
+    def delete(db: Session, api_key_id, commit: bool = True) -> bool:
+        """
+        Returns False when there was no such key. With commit=False the caller owns the
+        transaction (see WriteBatcher), as for every write below.
+        """
         db_api_key = db.query(ApiKey).filter_by(id=api_key_id).first()
+        if db_api_key is None:
+            return False
         db.delete(db_api_key)
-        db.commit()
+        if commit:
+            db.commit()
+        else:
+            db.flush()
+        verified_api_keys.pop(db_api_key.public_digest)
+        return True
 
     @staticmethod
-    async def update(db: Session, api_key_data):
+    def update(db: Session, api_key_data, commit: bool = True):
+        previous_digest = api_key_data.public_digest
+        api_key_data.public_digest = ApiKeyRepo.digest_public_key(api_key_data.public)
         updated_api_key = db.merge(api_key_data)
-        db.commit()
+        if commit:
+            db.commit()
+        else:
+            db.flush()
+        unknown_api_keys.pop(updated_api_key.public_digest)
+        verified_api_keys.pop(previous_digest)
+        verified_api_keys.pop(updated_api_key.public_digest)
         return updated_api_key
 
+    @staticmethod
+    def set_rate_limit(db: Session, domain, rate_limit_per_minute, rate_limit_burst, commit: bool = True):
+        db_api_key = ApiKeyRepo.fetch_by_domain(db, domain)
+        if db_api_key is None:
+            return None
+        db_api_key.rate_limit_per_minute = rate_limit_per_minute
+        db_api_key.rate_limit_burst = rate_limit_burst
+        if commit:
+            db.commit()
+            db.refresh(db_api_key)
+        else:
+            db.flush()
+        verified_api_keys.pop(db_api_key.public_digest)
+        return db_api_key
+
+    @staticmethod
+    def digest_public_key(public: str) -> str:
+        return hmac.new(encryption_key.encode("utf-8"), public.encode("utf-8"), hashlib.sha256).hexdigest()
+
     @staticmethod
     def generate_public_key(length: int = 50) -> str:
         choices = string.ascii_letters + string.digits
@@ -64,3 +115,10 @@ class ApiKeyRepo:
     def generate_secret_key(length: int = 50) -> str:
         key = ''.join(random.choice(string.ascii_lowercase + string.digits) for x in range(length))
         return key
+
+    @staticmethod
+    def fetch_keys_version(db: Session) -> int:
+        """
+        Counter incremented by triggers on every insert, update and delete of a key
+        """
+        return db.execute(text("SELECT version FROM cache_versions WHERE name = 'api_keys'")).scalar() or 0
@@ -0,0 +1,69 @@
+import json
+from datetime import datetime, timezone
+from typing import NamedTuple, Optional
+
+from sqlalchemy.orm import Session
+
+from sql_app.cache.movie_cache import movie_cache
+from sql_app.conditional import movie_etag
+from sql_app.repositories.movie_repository import MovieRepo
+from sql_app.schemas.movie_schema import Movie
+
+
+def _encode(payload) -> bytes:
+    return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+
+class CachedMovie(NamedTuple):
+    body: bytes
+    etag: str
+    last_modified: Optional[datetime]
+
+
+class CachedTitle(NamedTuple):
+    body: bytes
+    catalog_version: int
+
+
+class CachedMovieRepo:
+    """
+    MovieRepo lookups answered from movie_cache as ready-to-send JSON bodies
+    """
+
+    @staticmethod
+    def fetch_movie_by_id(db: Session, _id) -> Optional[CachedMovie]:
+        """
+        The movie's JSON body together with its validators, so a conditional request can be
+        answered without touching the database or the serializer
+        """
+        def load():
+            db_movie = MovieRepo.fetch_movie_by_id(db, _id)
+            if db_movie is None:
+                return None
+            updated_at = db_movie.updated_at
+            return CachedMovie(
+                body=_encode(Movie.from_orm(db_movie).dict()),
+                etag=movie_etag(db_movie.id, db_movie.version),
+                last_modified=None if updated_at is None else updated_at.replace(tzinfo=timezone.utc),
+            )
+
+        return movie_cache.get_or_load(db, ("id", _id), load)
+
+    @staticmethod
+    def fetch_by_title(db: Session, title, catalog_version: int) -> bytes:
+        """
+        The JSON body of the title lookup as of ``catalog_version``. The cache only notices
+        a write made by another worker at its next version check, so an entry stored under
+        an older version is not served; the lookup then goes to the database.
+        """
+        def load():
+            db_movie = MovieRepo.fetch_by_title(db, title)
+            return CachedTitle(
+                body=_encode([] if db_movie is None else [Movie.from_orm(db_movie).dict()]),
+                catalog_version=catalog_version,
+            )
+
+        cached = movie_cache.get_or_load(db, ("title", title), load)
+        if cached.catalog_version != catalog_version:
+            cached = load()
+        return cached.body
@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+from typing import Tuple
+
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+
+from sql_app.models.movie_change_model import MovieChange
+
+COMPACT_SUPERSEDED_SQL = text("""
+    DELETE FROM movie_changes
+    WHERE seq < (SELECT max(later.seq) FROM movie_changes AS later WHERE later.movie_id = movie_changes.movie_id)
+""")
+
+
+class ChangeLogRepo:
+
+    @staticmethod
+    def fetch_since(db: Session, since: int, limit: int = 500):
+        """
+        (seq, movie_id, action) rows after ``since``, oldest first
+        """
+        return db.query(MovieChange.seq, MovieChange.movie_id, MovieChange.action) \
+            .filter(MovieChange.seq > since).order_by(MovieChange.seq).limit(limit).all()
+
+    @staticmethod
+    def fetch_latest_seq(db: Session) -> int:
+        """
+        Highest seq ever issued; sqlite_sequence remembers it even once compaction removed the row
+        """
+        latest = db.execute(text("SELECT seq FROM sqlite_sequence WHERE name = 'movie_changes'")).scalar()
+        return latest or db.query(func.max(MovieChange.seq)).scalar() or 0
+
+    @staticmethod
+    def fetch_horizon(db: Session) -> int:
+        """
+        Newest seq removed by tombstone trimming: clients syncing from before it may have missed a delete
+        """
+        return db.execute(text("SELECT version FROM cache_versions WHERE name = 'movie_changes_horizon'")).scalar() or 0
+
+    @staticmethod
+    def compact(db: Session, tombstone_retention: timedelta) -> Tuple[int, int]:
+        """
+        Drop entries superseded by a later change of the same movie, which loses nothing a
+        syncing client needs, then trim tombstones older than ``tombstone_retention`` and move
+        the horizon past them. Returns (superseded, trimmed) row counts.
+        """
+        superseded = db.execute(COMPACT_SUPERSEDED_SQL).rowcount
+        cutoff = datetime.utcnow() - tombstone_retention
+        expired = db.query(MovieChange).filter(MovieChange.action == "delete", MovieChange.changed_at < cutoff)
+        newest_trimmed = expired.with_entities(func.max(MovieChange.seq)).scalar()
+        trimmed = expired.delete(synchronize_session=False)
+        if newest_trimmed is not None:
+            db.execute(text(
+                "UPDATE cache_versions SET version = max(version, :seq) WHERE name = 'movie_changes_horizon'"
+            ), {"seq": newest_trimmed})
+        db.commit()
+        return superseded, trimmed
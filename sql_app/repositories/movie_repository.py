@@ -1,23 +1,94 @@
+import html
+import re
+from datetime import datetime
+from typing import List, Optional, Sequence
+from sqlalchemy import delete, func, text, update
+from sqlalchemy.dialects.sqlite import insert
 from sqlalchemy.orm import Session
+from sql_app.events import publish_after_commit
 from sql_app.models.movie_model import Movie
+from sql_app.movie_query import MovieFilter, SortKey, keyset_after
 from sql_app.schemas.movie_schema import MovieCreate
 
+# the field order of the Movie response schema
+MOVIE_ROW_FIELDS = ("title", "subtitle", "price", "description", "id")
+MOVIE_ROW_COLUMNS = tuple(getattr(Movie, field) for field in MOVIE_ROW_FIELDS)
+# ids per IN (...) clause, comfortably below SQLite's bound parameter limit
+IN_QUERY_CHUNK = 500
+SEARCH_TOKEN = re.compile(r"\w+", re.UNICODE)
+# snippet() wraps matches in these; the text around them is HTML-escaped before they become tags
+SNIPPET_OPEN, SNIPPET_CLOSE = "\x02", "\x03"
+SEARCH_SQL = text("""
+    SELECT movies.id, movies.title, movies.subtitle, movies.price, movies.description,
+           bm25(movies_fts, 10.0, 5.0, 1.0) AS rank,
+           snippet(movies_fts, -1, :mark_open, :mark_close, '...', 12) AS snippet
+    FROM movies_fts JOIN movies ON movies.id = movies_fts.rowid
+    WHERE movies_fts MATCH :query
+    ORDER BY rank
+    LIMIT :limit OFFSET :offset
+""")
+
+
+def match_query(terms: str) -> str:
+    # quote every word so user input is never parsed as FTS5 query syntax
+    return " ".join('"%s"*' % token for token in SEARCH_TOKEN.findall(terms or ""))
+
+
+def highlight(snippet: Optional[str], mark_open: str, mark_close: str) -> Optional[str]:
+    if snippet is None:
+        return None
+    return html.escape(snippet).replace(SNIPPET_OPEN, mark_open).replace(SNIPPET_CLOSE, mark_close)
+
 
 class MovieRepo:
 
     @staticmethod
-    async def create(db: Session, movie: MovieCreate):
-        db_movie = Movie(
-            title=movie.title,
-            subtitle=movie.subtitle,
-            price=movie.price,
-            description=movie.description,
-        )
-        db.add(db_movie)
-        db.commit()
-        db.refresh(db_movie)
+    def create(db: Session, movie: MovieCreate, commit: bool = True):
+        """
+        Insert the movie with a single INSERT .. ON CONFLICT DO NOTHING against the unique
+        (title, subtitle) index. Returns None when an equal movie already exists.
+        With commit=False the caller owns the transaction (see WriteBatcher).
+        """
+        values = movie.dict()
+        result = db.execute(insert(Movie).values(**values).on_conflict_do_nothing())
+        db_movie = None
+        if result.rowcount == 1:
+            db_movie = Movie(id=result.inserted_primary_key[0], **values)
+            publish_after_commit(db, "created", db_movie.id)
+        if commit:
+            db.commit()
         return db_movie
 
+    @staticmethod
+    def bulk_create(db: Session, movies: List[MovieCreate], commit: bool = True) -> List[str]:
+        """
+        Insert a batch of movies in one transaction with a single executemany, skipping any
+        whose (title, subtitle) already exists in the database or earlier in the batch.
+        Returns "created" or "duplicate" for each movie, in order, as decided by the INSERT
+        itself. With commit=False the caller owns the transaction (see WriteBatcher).
+        """
+        if not movies:
+            return []
+        # the write transaction holds the database lock and new rows get ids above the largest
+        # one, so every id above this one is a row inserted by the statement below
+        last_id = db.query(func.max(Movie.id)).scalar() or 0
+        db.execute(insert(Movie).on_conflict_do_nothing(), [movie.dict() for movie in movies])
+        inserted = {
+            (title, subtitle or "")
+            for title, subtitle in db.query(Movie.title, Movie.subtitle).filter(Movie.id > last_id)
+        }
+        statuses = []
+        for movie in movies:
+            key = (movie.title, movie.subtitle or "")
+            # the first of several equal rows in the batch is the one that went in
+            statuses.append("created" if key in inserted else "duplicate")
+            inserted.discard(key)
+        if "created" in statuses:
+            publish_after_commit(db, "bulk_created")
+        if commit:
+            db.commit()
+        return statuses
+
     @staticmethod
     def fetch_movie_by_id(db: Session, _id):
         return db.query(Movie).filter(Movie.id == _id).first()
@@ -28,20 +99,142 @@ class MovieRepo:
 
     @staticmethod
     def fetch_by_title_and_subtitle(db: Session, title, subtitle):
-        return db.query(Movie).filter(Movie.title == title and Movie.subtitle == subtitle).first()
+        return db.query(Movie).filter(
+            Movie.title == title, func.coalesce(Movie.subtitle, "") == (subtitle or "")
+        ).first()
 
     @staticmethod
     def fetch_all(db: Session, skip: int = 0, limit: int = 50):
         return db.query(Movie).offset(skip).limit(limit).all()
 
     @staticmethod
-    async def delete(db: Session, movie_id):
-        db_movie = db.query(Movie).filter_by(id=movie_id).first()
-        db.delete(db_movie)
-        db.commit()
+    def delete(db: Session, movie_id, commit: bool = True) -> bool:
+        """
+        Delete the movie with a single DELETE. Returns False when there was no such movie,
+        e.g. because a concurrent request deleted it first.
+        """
+        result = db.execute(
+            delete(Movie).where(Movie.id == movie_id).execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            if commit:
+                db.rollback()
+            return False
+        publish_after_commit(db, "deleted", movie_id)
+        if commit:
+            db.commit()
+        return True
 
     @staticmethod
-    async def update(db: Session, movie_data):
-        updated_movie = db.merge(movie_data)
-        db.commit()
+    def update(db: Session, movie_data, expected_version: Optional[int] = None, commit: bool = True):
+        """
+        Write the movie's fields, bump its version and updated_at. With ``expected_version``
+        the UPDATE only matches while the stored version is still that one, so a concurrent
+        change is never overwritten; returns None when nothing was updated.
+        """
+        statement = update(Movie).where(Movie.id == movie_data.id)
+        if expected_version is not None:
+            statement = statement.where(Movie.version == expected_version)
+        result = db.execute(statement.values(
+            title=movie_data.title,
+            subtitle=movie_data.subtitle,
+            price=movie_data.price,
+            description=movie_data.description,
+            version=Movie.version + 1,
+            updated_at=datetime.utcnow(),
+        ).execution_options(synchronize_session=False))
+        if result.rowcount != 1:
+            # nothing was written; only end the transaction when it is ours
+            if commit:
+                db.rollback()
+            return None
+        updated_movie = db.get(Movie, movie_data.id, populate_existing=True)
+        publish_after_commit(db, "updated", updated_movie.id)
+        if commit:
+            db.commit()
         return updated_movie
+
+    @staticmethod
+    def fetch_latest(db: Session, limit: int = 50):
+        return db.query(Movie).order_by(Movie.id.desc()).limit(limit).all()
+
+    @staticmethod
+    def fetch_by_ids(db: Session, ids: Sequence[int], fields: Sequence[str] = MOVIE_ROW_FIELDS):
+        """
+        Row tuples of the requested ``fields`` for the movies with the given ids, in the order
+        asked for and each once; unknown ids are skipped. Up to IN_QUERY_CHUNK ids take a
+        single IN query.
+        """
+        columns = [getattr(Movie, field) for field in fields]
+        unique_ids = list(dict.fromkeys(ids))
+        found = {}
+        for start in range(0, len(unique_ids), IN_QUERY_CHUNK):
+            chunk = unique_ids[start:start + IN_QUERY_CHUNK]
+            for row in db.query(*columns).filter(Movie.id.in_(chunk)):
+                found[row.id] = row
+        return [found[movie_id] for movie_id in unique_ids if movie_id in found]
+
+    @staticmethod
+    def fetch_page_rows(db: Session, after_id: Optional[int] = None, limit: int = 50,
+                        fields: Sequence[str] = MOVIE_ROW_FIELDS):
+        """
+        Keyset page ordered by id: rows strictly after ``after_id``, so the cost of a page
+        does not grow with how deep into the catalog it is. Rows are plain tuples of ``fields``
+        (MOVIE_ROW_FIELDS by default), without building ORM objects; ``fields`` must include id.
+        """
+        query = db.query(*(getattr(Movie, field) for field in fields)).order_by(Movie.id)
+        if after_id is not None:
+            query = query.filter(Movie.id > after_id)
+        return query.limit(limit).all()
+
+    @staticmethod
+    def fetch_sorted_keys(db: Session, movie_filter: MovieFilter, sort: Sequence[SortKey],
+                          after: Optional[Sequence] = None, limit: int = 50):
+        """
+        One page of the filtered catalog in ``sort`` order, as row tuples of just the sort
+        keys (id last). Those all live in one of the sort indexes, so the page is read from
+        the index alone; fetch_by_ids then loads the rows of the page.
+        """
+        query = db.query(*(key.column for key in sort)).filter(*movie_filter.conditions())
+        if after is not None:
+            query = query.filter(keyset_after(sort, after))
+        return query.order_by(*(key.order_by() for key in sort)).limit(limit).all()
+
+    @staticmethod
+    def iter_rows(db: Session, batch_size: int = 1000):
+        """
+        Every movie as a row tuple in MOVIE_ROW_FIELDS order, ``batch_size`` rows at a time
+        """
+        return db.query(*MOVIE_ROW_COLUMNS).order_by(Movie.id).execution_options(stream_results=True) \
+            .yield_per(batch_size)
+
+    @staticmethod
+    def search(db: Session, terms: str, limit: int = 50, offset: int = 0,
+               mark_open: str = "<mark>", mark_close: str = "</mark>") -> List[dict]:
+        """
+        Ranked full-text search over title, subtitle and description. Every word of ``terms``
+        must match the start of a word in the movie; title matches weigh the most. Snippets
+        are HTML: the movie text is escaped and the matches wrapped in ``mark_open``/``mark_close``.
+        """
+        query = match_query(terms)
+        if not query:
+            return []
+        rows = db.execute(SEARCH_SQL, {
+            "query": query, "limit": limit, "offset": offset,
+            "mark_open": SNIPPET_OPEN, "mark_close": SNIPPET_CLOSE,
+        }).all()
+        return [dict(row._asdict(), snippet=highlight(row.snippet, mark_open, mark_close)) for row in rows]
+
+    @staticmethod
+    def fetch_last_modified(db: Session) -> Optional[datetime]:
+        """
+        Newest updated_at in the catalog (naive UTC), or None when it is empty
+        """
+        return db.query(func.max(Movie.updated_at)).scalar()
+
+    @staticmethod
+    def fetch_catalog_version(db: Session) -> int:
+        """
+        Counter incremented by triggers on every insert, update and delete of a movie
+        """
+        return db.execute(text("SELECT version FROM cache_versions WHERE name = 'movies'")).scalar() or 0
@@ -1,5 +1,5 @@
 from typing import Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class ApiKeyBase(BaseModel):
@@ -28,3 +28,11 @@ class ApiDomain(ApiKeyBase):
 
 class ApiKeyUpdate(ApiKeyBase):
     id: int
+
+
+class ApiKeyRateLimit(BaseModel):
+    rate_limit_per_minute: Optional[int] = Field(None, ge=1)
+    rate_limit_burst: Optional[int] = Field(None, ge=1)
+
+    class Config:
+        orm_mode = True
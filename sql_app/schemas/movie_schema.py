@@ -1,5 +1,8 @@
-from typing import List, Optional
-from pydantic import BaseModel
+from typing import Dict, List, Optional
+from pydantic import BaseModel, Field
+
+# ids accepted by POST /movies/by-ids
+MAX_BATCH_IDS = 5000
 
 
 class MovieBase(BaseModel):
@@ -20,6 +23,22 @@ class Movie(MovieBase):
         orm_mode = True
 
 
+class MovieFields(BaseModel):
+    """
+    A movie restricted to the columns picked with ``fields=``; id is always present
+    """
+    id: int
+    title: Optional[str] = None
+    subtitle: Optional[str] = None
+    price: Optional[float] = None
+    description: Optional[str] = None
+
+
+class MovieIdsRequest(BaseModel):
+    ids: List[int] = Field(..., max_items=MAX_BATCH_IDS)
+    fields: Optional[List[str]] = None
+
+
 class Movies(MovieBase):
     id: int
     movies: List[Movie]
@@ -30,3 +49,50 @@ class Movies(MovieBase):
 
 class MovieUpdate(MovieBase):
     id: int
+
+
+class MovieSearchResult(Movie):
+    rank: float
+    snippet: Optional[str] = None
+
+
+class MovieChange(BaseModel):
+    seq: int
+    action: str
+    id: int
+    movie: Optional[Movie] = None
+
+
+class MovieChangePage(BaseModel):
+    changes: List[MovieChange]
+    next_since: int
+    has_more: bool
+    latest: int
+
+
+class PriceHistogram(BaseModel):
+    # bins + 1 edges; counts[i] holds the prices in [edges[i], edges[i + 1])
+    edges: List[float]
+    counts: List[int]
+
+
+class MoviePriceStats(BaseModel):
+    count: int
+    min: Optional[float] = None
+    max: Optional[float] = None
+    mean: Optional[float] = None
+    percentiles: Dict[str, float]
+    histogram: PriceHistogram
+
+
+class BulkMovieResult(BaseModel):
+    index: int
+    status: str
+    error: Optional[str] = None
+
+
+class BulkMovieReport(BaseModel):
+    created: int
+    duplicates: int
+    invalid: int
+    results: List[BulkMovieResult]
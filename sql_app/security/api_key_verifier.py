@@ -0,0 +1,89 @@
+from typing import NamedTuple, Optional
+
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from sql_app.cache.api_key_cache import unknown_api_keys, verified_api_keys
+from sql_app.cache.movie_cache import build_invalidation
+from sql_app.repositories.api_key_repository import ApiKeyRepo
+
+# key writes made by other workers reach this one's caches through the api_keys version counter
+api_key_invalidation = build_invalidation(ApiKeyRepo.fetch_keys_version)
+
+
+class VerifiedKey(NamedTuple):
+    id: int
+    domain: str
+    rate_limit_per_minute: Optional[int] = None
+    rate_limit_burst: Optional[int] = None
+
+
+class ApiKeyVerifier:
+
+    @staticmethod
+    def verify(db: Session, api_token: Optional[str]) -> Optional[VerifiedKey]:
+        """
+        Resolve an Authorization header value to the key it belongs to, hitting the
+        database only when the key has not been verified recently
+        """
+        if not api_token:
+            return None
+        ApiKeyVerifier.drop_stale(db)
+        digest = ApiKeyRepo.digest_public_key(ApiKeyVerifier.strip_scheme(api_token))
+        verified = verified_api_keys.get(digest)
+        if verified is None and not ApiKeyVerifier.is_unknown(digest):
+            verified = ApiKeyVerifier._load(db, digest)
+        return verified
+
+    @staticmethod
+    async def verify_in_threadpool(db: Session, api_token: Optional[str]) -> Optional[VerifiedKey]:
+        """
+        Same as verify for async endpoints holding a plain Session; only cache misses leave
+        the event loop
+        """
+        if not api_token:
+            return None
+        if api_key_invalidation.is_due():
+            await run_in_threadpool(ApiKeyVerifier.drop_stale, db)
+        digest = ApiKeyRepo.digest_public_key(ApiKeyVerifier.strip_scheme(api_token))
+        verified = verified_api_keys.get(digest)
+        if verified is None and not ApiKeyVerifier.is_unknown(digest):
+            verified = await run_in_threadpool(ApiKeyVerifier._load, db, digest)
+        return verified
+
+    @staticmethod
+    def _load(db: Session, digest: str) -> Optional[VerifiedKey]:
+        db_key = ApiKeyRepo.fetch_by_digest(db, digest)
+        if db_key is None:
+            unknown_api_keys.set(digest, True)
+            return None
+        verified = VerifiedKey(
+            id=db_key.id, domain=db_key.domain,
+            rate_limit_per_minute=db_key.rate_limit_per_minute, rate_limit_burst=db_key.rate_limit_burst
+        )
+        verified_api_keys.set(digest, verified)
+        return verified
+
+    @staticmethod
+    def drop_stale(db: Session):
+        """
+        Forget every verified and unknown key once the api_keys version moved: another worker
+        created, changed or deleted a key, which this one's write paths never saw
+        """
+        if api_key_invalidation.is_stale(db):
+            verified_api_keys.clear()
+            unknown_api_keys.clear()
+
+    @staticmethod
+    def is_unknown(digest: str) -> bool:
+        """
+        True when the digest matched no key a moment ago; not worth another query yet
+        """
+        return unknown_api_keys.get(digest) is not None
+
+    @staticmethod
+    def strip_scheme(api_token: str) -> str:
+        scheme, _, credentials = api_token.partition(" ")
+        if credentials and scheme.lower() == "bearer":
+            return credentials.strip()
+        return api_token.strip()
@@ -0,0 +1,102 @@
+from typing import Optional
+
+import orjson
+from starlette.concurrency import run_in_threadpool
+
+from sql_app.cache.api_key_cache import verified_api_keys
+from sql_app.repositories.api_key_repository import ApiKeyRepo
+from sql_app.security.api_key_verifier import ApiKeyVerifier, VerifiedKey, api_key_invalidation
+from sql_app.security.rate_limiter import RateLimiter, rate_limiter
+from sqlite_db.sqlite import ReadSessionLocal
+
+TOO_MANY_REQUESTS = orjson.dumps({"detail": "Too many requests"})
+
+
+class RateLimitMiddleware:
+    """
+    Applies the rate limiter before routing, so a rejected request never reaches the database.
+    Requests with a valid API key spend from that key's bucket, everything else from the
+    bucket of the client address. Every response carries the RateLimit-* headers.
+    """
+
+    def __init__(self, app, limiter: Optional[RateLimiter] = rate_limiter, exempt_paths=("/metrics",)):
+        self.app = app
+        self.limiter = limiter
+        self.exempt_paths = frozenset(exempt_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.limiter is None or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        client = scope.get("client")
+        address = client[0] if client else "unknown"
+        decision = None
+        verified = None
+        api_token = self.api_token(scope)
+        if api_token:
+            if api_key_invalidation.is_due():
+                await run_in_threadpool(RateLimitMiddleware._drop_stale)
+            # the verifier's cache answers almost every request without leaving the event loop
+            digest = ApiKeyRepo.digest_public_key(ApiKeyVerifier.strip_scheme(api_token))
+            verified = verified_api_keys.get(digest)
+            if verified is None and not ApiKeyVerifier.is_unknown(digest):
+                # a lookup costs a query, so the address pays for it first: made-up tokens are
+                # limited like anonymous requests instead of each reaching SQLite
+                decision = await self.take(self.limiter.check_address, address)
+                if decision.allowed:
+                    verified = await run_in_threadpool(RateLimitMiddleware._load, api_token)
+        if verified is not None:
+            decision = await self.take(
+                self.limiter.check_key, verified.id, verified.rate_limit_per_minute, verified.rate_limit_burst
+            )
+        elif decision is None:
+            decision = await self.take(self.limiter.check_address, address)
+
+        if not decision.allowed:
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(TOO_MANY_REQUESTS)).encode("latin-1")),
+                ] + decision.headers(),
+            })
+            await send({"type": "http.response.body", "body": TOO_MANY_REQUESTS})
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + decision.headers()
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+    async def take(self, check, *args):
+        # shared buckets wait on a file lock; only those leave the event loop
+        if self.limiter.buckets.blocking:
+            return await run_in_threadpool(check, *args)
+        return check(*args)
+
+    @staticmethod
+    def api_token(scope) -> Optional[str]:
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                return value.decode("latin-1")
+        return None
+
+    @staticmethod
+    def _drop_stale():
+        db = ReadSessionLocal()
+        try:
+            ApiKeyVerifier.drop_stale(db)
+        finally:
+            db.close()
+
+    @staticmethod
+    def _load(api_token: str) -> Optional[VerifiedKey]:
+        db = ReadSessionLocal()
+        try:
+            return ApiKeyVerifier.verify(db, api_token)
+        finally:
+            db.close()
@@ -0,0 +1,225 @@
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimit(NamedTuple):
+    per_minute: int
+    burst: int
+
+    @property
+    def per_second(self) -> float:
+        return self.per_minute / 60.0
+
+
+class Decision(NamedTuple):
+    allowed: bool
+    limit: int
+    remaining: int
+    # seconds until the bucket is full again, and until the next request may pass
+    reset: float
+    retry_after: float
+
+    def headers(self) -> list:
+        headers = [
+            (b"ratelimit-limit", str(self.limit).encode("latin-1")),
+            (b"ratelimit-remaining", str(self.remaining).encode("latin-1")),
+            (b"ratelimit-reset", str(math.ceil(self.reset)).encode("latin-1")),
+        ]
+        if not self.allowed:
+            headers.append((b"retry-after", str(max(1, math.ceil(self.retry_after))).encode("latin-1")))
+        return headers
+
+
+def refill(tokens: float, elapsed: float, limit: RateLimit) -> Tuple[bool, float]:
+    """
+    Token bucket step: add what accrued since the last request, then try to spend one token
+    """
+    tokens = min(float(limit.burst), tokens + max(elapsed, 0.0) * limit.per_second)
+    if tokens >= 1.0:
+        return True, tokens - 1.0
+    return False, tokens
+
+
+def decide(allowed: bool, tokens: float, limit: RateLimit) -> Decision:
+    return Decision(
+        allowed=allowed,
+        limit=limit.burst,
+        remaining=int(tokens),
+        reset=(limit.burst - tokens) / limit.per_second,
+        retry_after=0.0 if allowed else (1.0 - tokens) / limit.per_second,
+    )
+
+
+class MemoryBuckets:
+    """
+    Buckets of one process. Idle buckets are dropped least recently used first once maxsize
+    is reached; a dropped bucket simply starts full again.
+    """
+
+    # take never waits on I/O, so it runs on the event loop
+    blocking = False
+
+    def __init__(self, maxsize: int = 100000, timer=time.monotonic):
+        self.maxsize = maxsize
+        self._timer = timer
+        # key -> (tokens, updated_at)
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, limit: RateLimit) -> Decision:
+        now = self._timer()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (float(limit.burst), now))
+            allowed, tokens = refill(tokens, now - updated_at, limit)
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            if len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return decide(allowed, tokens, limit)
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class SqliteBuckets:
+    """
+    Buckets shared by every worker on the host through a small SQLite file of their own, so
+    limiter writes never queue behind the catalog writer. Each take is one short IMMEDIATE
+    transaction; durability is deliberately off since losing bucket state only resets limits.
+    A take that cannot get the file's lock within ``busy_timeout`` seconds lets the request
+    through rather than hold it up.
+    """
+
+    PRUNE_EVERY = 10000
+    # take waits on the file lock, so callers on an event loop run it in a thread
+    blocking = True
+
+    def __init__(self, path: str, timer=time.time, busy_timeout: float = 0.05):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.failed_open = 0
+        self._timer = timer
+        self._takes = 0
+        self._lock = threading.Lock()
+        self._connection = self._connect()
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS rate_limit_buckets ("
+            "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL, full_at REAL NOT NULL)"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False,
+                                     timeout=self.busy_timeout)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=OFF")
+        return connection
+
+    def reopen(self):
+        """
+        Open a connection of this process's own after a fork; the inherited one stays with
+        the parent
+        """
+        self._lock = threading.Lock()
+        self._connection = self._connect()
+
+    def take(self, key: str, limit: RateLimit) -> Decision:
+        try:
+            return self._take(key, limit)
+        except sqlite3.OperationalError as err:
+            # another worker (or a backup) holds the file; limiting is not worth a stalled request
+            self.failed_open += 1
+            logger.warning("Rate limit bucket %s unavailable, letting the request through: %s", key, err)
+            return decide(True, float(limit.burst - 1), limit)
+
+    def _take(self, key: str, limit: RateLimit) -> Decision:
+        now = self._timer()
+        with self._lock:
+            connection = self._connection
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = connection.execute(
+                    "SELECT tokens, updated_at FROM rate_limit_buckets WHERE key = ?", (key,)
+                ).fetchone()
+                tokens, updated_at = row if row is not None else (float(limit.burst), now)
+                allowed, tokens = refill(tokens, now - updated_at, limit)
+                full_at = now + (limit.burst - tokens) / limit.per_second
+                connection.execute(
+                    "INSERT INTO rate_limit_buckets (key, tokens, updated_at, full_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, "
+                    "updated_at = excluded.updated_at, full_at = excluded.full_at",
+                    (key, tokens, now, full_at)
+                )
+                self._takes += 1
+                if self._takes % self.PRUNE_EVERY == 0:
+                    # a bucket that has refilled completely is the same as no bucket
+                    connection.execute("DELETE FROM rate_limit_buckets WHERE full_at < ?", (now,))
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        return decide(allowed, tokens, limit)
+
+    def close(self):
+        self._connection.close()
+
+
+class RateLimiter:
+    """
+    Token bucket per API key, or per client address for requests without a valid key.
+    A key's own limits come from its ApiKey row; the defaults apply when they are unset.
+    """
+
+    def __init__(self, buckets, default_limit: RateLimit, anonymous_limit: RateLimit):
+        self.buckets = buckets
+        self.default_limit = default_limit
+        self.anonymous_limit = anonymous_limit
+
+    def check_key(self, key_id: int, per_minute: Optional[int] = None, burst: Optional[int] = None) -> Decision:
+        limit = RateLimit(per_minute or self.default_limit.per_minute, burst or self.default_limit.burst)
+        return self.buckets.take(f"key:{key_id}", limit)
+
+    def check_address(self, address: str) -> Decision:
+        return self.buckets.take(f"ip:{address}", self.anonymous_limit)
+
+    def after_fork(self):
+        if isinstance(self.buckets, SqliteBuckets):
+            self.buckets.reopen()
+
+
+def build_rate_limiter() -> Optional[RateLimiter]:
+    """
+    Configured from RATE_LIMIT_* environment variables; RATE_LIMIT_ENABLED=0 turns limiting off
+    """
+    if os.environ.get("RATE_LIMIT_ENABLED", "1").lower() in ("0", "false", "no", "off"):
+        return None
+    backend = os.environ.get("RATE_LIMIT_BACKEND", "memory")
+    if backend == "memory":
+        buckets = MemoryBuckets(maxsize=int(os.environ.get("RATE_LIMIT_MAX_BUCKETS", 100000)))
+    elif backend == "sqlite":
+        buckets = SqliteBuckets(
+            os.environ.get("RATE_LIMIT_SQLITE_PATH", "./rate_limits.db"),
+            busy_timeout=float(os.environ.get("RATE_LIMIT_SQLITE_TIMEOUT_MS", 50)) / 1000.0,
+        )
+    else:
+        raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {backend}")
+    return RateLimiter(
+        buckets,
+        default_limit=RateLimit(
+            int(os.environ.get("RATE_LIMIT_PER_MINUTE", 600)), int(os.environ.get("RATE_LIMIT_BURST", 100))
+        ),
+        anonymous_limit=RateLimit(
+            int(os.environ.get("RATE_LIMIT_ANONYMOUS_PER_MINUTE", 120)),
+            int(os.environ.get("RATE_LIMIT_ANONYMOUS_BURST", 30))
+        ),
+    )
+
+
+rate_limiter = build_rate_limiter()
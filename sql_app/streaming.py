@@ -0,0 +1,43 @@
+from typing import Iterator
+
+from sqlalchemy.orm import Session
+
+from sql_app.fast_json import encode_movie_row
+from sql_app.repositories.movie_repository import MovieRepo
+
+STREAM_BATCH_SIZE = 1000
+
+
+def _encoded_movies(db: Session) -> Iterator[bytes]:
+    for row in MovieRepo.iter_rows(db, batch_size=STREAM_BATCH_SIZE):
+        yield encode_movie_row(row)
+
+
+def iter_movies_ndjson(db: Session) -> Iterator[bytes]:
+    """
+    The whole catalog as newline delimited JSON, one chunk per database batch
+    """
+    lines = []
+    for encoded in _encoded_movies(db):
+        lines.append(encoded)
+        if len(lines) == STREAM_BATCH_SIZE:
+            yield b"\n".join(lines) + b"\n"
+            lines = []
+    if lines:
+        yield b"\n".join(lines) + b"\n"
+
+
+def iter_movies_json_array(db: Session) -> Iterator[bytes]:
+    """
+    The whole catalog as a single JSON array, written out in chunks
+    """
+    yield b"["
+    separator = b""
+    chunk = []
+    for encoded in _encoded_movies(db):
+        chunk.append(separator + encoded)
+        separator = b","
+        if len(chunk) == STREAM_BATCH_SIZE:
+            yield b"".join(chunk)
+            chunk = []
+    yield b"".join(chunk) + b"]"
@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import os
+from typing import Any, Callable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from sql_app.events import PENDING_CHANGES
+from sqlite_db.sqlite import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+# (operation, args, kwargs, future of the caller)
+PendingWrite = Tuple[Callable[..., Any], tuple, dict, asyncio.Future]
+
+
+class WriteFailed:
+    __slots__ = ("error",)
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def apply_batch(db: Session, writes: List[Tuple[Callable[..., Any], tuple, dict]]) -> list:
+    """
+    Run every write in its own SAVEPOINT of one transaction and commit once. A write that
+    raises is rolled back alone and reported as WriteFailed; the others still commit.
+    """
+    outcomes = []
+    for operation, args, kwargs in writes:
+        pending = len(db.info.get(PENDING_CHANGES, ()))
+        savepoint = db.begin_nested()
+        try:
+            result = operation(db, *args, commit=False, **kwargs)
+            savepoint.commit()
+            outcomes.append(result)
+        except Exception as err:
+            savepoint.rollback()
+            # changes the failed write queued must not be announced
+            del db.info.get(PENDING_CHANGES, [])[pending:]
+            outcomes.append(WriteFailed(err))
+    db.commit()
+    return outcomes
+
+
+class WriteBatcher:
+    """
+    Group commit for the single SQLite writer. Writes submitted while a batch is open (up to
+    max_delay seconds after the first, or until max_batch are waiting) share one transaction,
+    so concurrent requests pay for one commit instead of queueing for the lock one by one.
+    Writes arriving while a batch commits form the next batch, which starts as soon as the
+    current one is done.
+
+    Operations are repository methods taking ``(db, *args, commit=False, **kwargs)``, such as
+    MovieRepo.create. Each caller gets its own result or exception.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal, max_delay: float = 0.002, max_batch: int = 64):
+        self.session_factory = session_factory
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self.batches = 0
+        self.writes = 0
+        self._pending: List[PendingWrite] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushing = False
+
+    async def submit(self, operation: Callable[..., Any], *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # batches, timers and futures all belong to the loop that created them
+            self._loop, self._pending, self._timer, self._flushing = loop, [], None, False
+        future = loop.create_future()
+        self._pending.append((operation, args, kwargs, future))
+        if not self._flushing:
+            if len(self._pending) >= self.max_batch or self.max_delay <= 0:
+                self._flush_now()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.max_delay, self._flush_now)
+        return await future
+
+    def _flush_now(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._flushing:
+            self._flushing = True
+            self._loop.create_task(self._flush())
+
+    async def _flush(self):
+        try:
+            while self._pending:
+                batch = self._pending[:self.max_batch]
+                del self._pending[:self.max_batch]
+                await self._commit(batch)
+        finally:
+            self._flushing = False
+
+    async def _commit(self, batch: List[PendingWrite]):
+        writes = [(operation, args, kwargs) for operation, args, kwargs, _ in batch]
+        try:
+            async with self.session_factory() as db:
+                outcomes = await db.run_sync(apply_batch, writes)
+        except Exception as err:
+            # the commit itself failed: nothing in the batch was written
+            logger.exception("Write batch of %d failed", len(batch))
+            outcomes = [WriteFailed(err)] * len(batch)
+        self.batches += 1
+        self.writes += len(batch)
+        for (_, _, _, future), outcome in zip(batch, outcomes):
+            if future.done():
+                continue
+            if isinstance(outcome, WriteFailed):
+                future.set_exception(outcome.error)
+            else:
+                future.set_result(outcome)
+
+
+def build_write_batcher() -> WriteBatcher:
+    """
+    WRITE_BATCH_DELAY_MS (default 2) and WRITE_BATCH_MAX (default 64) size the batches;
+    WRITE_BATCH_MAX=1 commits every write on its own
+    """
+    return WriteBatcher(
+        max_delay=float(os.environ.get("WRITE_BATCH_DELAY_MS", 2)) / 1000.0,
+        max_batch=max(1, int(os.environ.get("WRITE_BATCH_MAX", 64))),
+    )
+
+
+write_batcher = build_write_batcher()
@@ -0,0 +1,92 @@
+import os
+from dataclasses import dataclass
+
+from sqlalchemy import event
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+@dataclass(frozen=True)
+class EngineProfile:
+    """
+    Connection settings for the SQLite engines, read from ``SQLITE_*`` environment variables
+    """
+    path: str = "./sqlite.db"
+    debug: bool = False
+    journal_mode: str = "WAL"
+    synchronous: str = "NORMAL"
+    mmap_size: int = 256 * 1024 * 1024
+    cache_size_kib: int = 64 * 1024
+    busy_timeout_ms: int = 5000
+    read_pool_size: int = 8
+    read_pool_overflow: int = 8
+
+    @classmethod
+    def from_env(cls) -> "EngineProfile":
+        return cls(
+            path=os.environ.get("SQLITE_PATH", cls.path),
+            debug=_env_flag("SQLITE_DEBUG", cls.debug),
+            journal_mode=os.environ.get("SQLITE_JOURNAL_MODE", cls.journal_mode),
+            synchronous=os.environ.get("SQLITE_SYNCHRONOUS", cls.synchronous),
+            mmap_size=int(os.environ.get("SQLITE_MMAP_SIZE", cls.mmap_size)),
+            cache_size_kib=int(os.environ.get("SQLITE_CACHE_SIZE_KIB", cls.cache_size_kib)),
+            busy_timeout_ms=int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", cls.busy_timeout_ms)),
+            read_pool_size=int(os.environ.get("SQLITE_READ_POOL_SIZE", cls.read_pool_size)),
+            read_pool_overflow=int(os.environ.get("SQLITE_READ_POOL_OVERFLOW", cls.read_pool_overflow)),
+        )
+
+    @property
+    def url(self) -> str:
+        return f"sqlite:///{self.path}"
+
+    @property
+    def async_url(self) -> str:
+        return f"sqlite+aiosqlite:///{self.path}"
+
+    @property
+    def read_only_url(self) -> str:
+        return f"sqlite:///file:{self.path}?mode=ro&uri=true"
+
+    def connection_pragmas(self) -> list:
+        # per-connection settings; journal_mode is persisted in the file and set by the writer
+        return [
+            f"PRAGMA synchronous={self.synchronous}",
+            f"PRAGMA mmap_size={self.mmap_size}",
+            f"PRAGMA cache_size=-{self.cache_size_kib}",
+            f"PRAGMA busy_timeout={self.busy_timeout_ms}",
+            "PRAGMA foreign_keys=ON",
+        ]
+
+    def install_writer(self, engine):
+        """
+        Tune a read-write engine. Transactions open with BEGIN IMMEDIATE so a writer waits
+        on busy_timeout for the lock up front instead of failing when it upgrades a read.
+        """
+        pragmas = [f"PRAGMA journal_mode={self.journal_mode}"] + self.connection_pragmas()
+
+        @event.listens_for(engine, "connect")
+        def _on_connect(dbapi_connection, connection_record):
+            dbapi_connection.isolation_level = None
+            cursor = dbapi_connection.cursor()
+            for pragma in pragmas:
+                cursor.execute(pragma)
+            cursor.close()
+
+        @event.listens_for(engine, "begin")
+        def _on_begin(connection):
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+    def install_reader(self, engine):
+        pragmas = self.connection_pragmas() + ["PRAGMA query_only=ON"]
+
+        @event.listens_for(engine, "connect")
+        def _on_connect(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for pragma in pragmas:
+                cursor.execute(pragma)
+            cursor.close()
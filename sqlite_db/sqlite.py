@@ -1,17 +1,64 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./sqlite.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}, echo=True)
+from monitoring.sql_metrics import instrument_engine
+from sqlite_db.profile import EngineProfile
+
+profile = EngineProfile.from_env()
+SQLALCHEMY_DATABASE_URL = profile.url
+ASYNC_SQLALCHEMY_DATABASE_URL = profile.async_url
+
+# SQLite admits one writer at a time, so each process keeps exactly one write connection
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}, echo=profile.debug,
+    poolclass=QueuePool, pool_size=1, max_overflow=0
+)
+profile.install_writer(engine)
+instrument_engine(engine, "writer")
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# readers never block each other under WAL, so they get a pool of read-only connections
+read_engine = create_engine(
+    profile.read_only_url, connect_args={"check_same_thread": False}, echo=profile.debug,
+    poolclass=QueuePool, pool_size=profile.read_pool_size, max_overflow=profile.read_pool_overflow
+)
+profile.install_reader(read_engine)
+instrument_engine(read_engine, "reader")
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+# the write batcher's connection (sql_app/write_batcher.py); every write of this process goes
+# through it, so no request holds it while waiting on a client
+async_engine = create_async_engine(
+    ASYNC_SQLALCHEMY_DATABASE_URL, echo=profile.debug,
+    poolclass=AsyncAdaptedQueuePool, pool_size=1, max_overflow=0
+)
+profile.install_writer(async_engine.sync_engine)
+instrument_engine(async_engine.sync_engine, "async_writer")
+# objects must stay readable after commit: an expired attribute cannot lazy load outside the greenlet
+AsyncSessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, expire_on_commit=False, bind=async_engine, class_=AsyncSession
+)
 Base = declarative_base()
 
 
-# Dependency
+def dispose_after_fork():
+    """
+    Drop the pooled connections a forked worker inherited from its parent without closing
+    them, since the parent still owns them; the worker then opens its own on first use
+    """
+    engine.dispose(close=False)
+    read_engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
+
+
+# Dependency for read-only endpoints
 def get_db():
-    sqlite_db = SessionLocal()
+    sqlite_db = ReadSessionLocal()
     try:
         yield sqlite_db
     finally:
         sqlite_db.close()
+
@@ -0,0 +1,15 @@
+import os
+import tempfile
+
+# point the engines at a throwaway database before anything imports sqlite_db.sqlite
+os.environ.setdefault("SQLITE_PATH", os.path.join(tempfile.mkdtemp(prefix="movie-api-test-"), "sqlite.db"))
+# the suite shares one client address; rate limiting is exercised on its own in test_rate_limit
+os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+
+
+def pytest_configure(config):
+    # the app no longer sets up the schema on import; this is what `manage.py migrate` does
+    from sql_app.migrations import create_schema
+    from sqlite_db.sqlite import engine
+
+    create_schema(engine)
@@ -51,8 +51,8 @@ class TestAPIs:
         json_resp = response.json()
         assert 'secret' in json_resp
         assert 'public' in json_resp
-        self.my_api_secret_key = json_resp['secret']
-        self.my_api_public_key = json_resp['public']
+        TestAPIs.my_api_secret_key = json_resp['secret']
+        TestAPIs.my_api_public_key = json_resp['public']
         print(f"Bearer {self.my_api_public_key}")
         assert len(self.my_api_public_key) >= 50
         assert len(self.my_api_secret_key) >= 50
@@ -0,0 +1,93 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from sql_app.cache.api_key_cache import verified_api_keys
+from sql_app.cache.ttl_cache import TTLCache
+from sql_app.migrations import add_api_key_version_counter, add_catalog_version_counter
+from sql_app.repositories.api_key_repository import ApiKeyRepo
+from sql_app.schemas.api_key_schema import ApiKeyCreate
+from sql_app.security.api_key_verifier import ApiKeyVerifier, api_key_invalidation
+from sqlite_db.sqlite import Base
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    add_catalog_version_counter(engine)
+    add_api_key_version_counter(engine)
+    session = sessionmaker(bind=engine)()
+    verified_api_keys.clear()
+    yield session
+    session.close()
+    verified_api_keys.clear()
+
+
+@pytest.fixture
+def api_key(db):
+    key_request = ApiKeyCreate(
+        secret=ApiKeyRepo.generate_secret_key(),
+        public=ApiKeyRepo.generate_public_key(),
+        domain="http://verifier.test",
+    )
+    return ApiKeyRepo.create(db, api_key=key_request)
+
+
+class TestTTLCache:
+
+    def test_evicts_least_recently_used(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        assert "a" in cache and "c" in cache
+        assert "b" not in cache
+        assert cache.evictions == 1
+
+    def test_expires_entries(self):
+        now = [0.0]
+        cache = TTLCache(maxsize=2, ttl=10, timer=lambda: now[0])
+        cache.set("a", 1)
+        now[0] = 11.0
+        assert cache.get("a") is None
+        assert cache.misses == 1
+
+
+class TestApiKeyVerifier:
+
+    def test_verifies_bearer_and_raw_tokens(self, db, api_key):
+        assert ApiKeyVerifier.verify(db, "Bearer " + api_key.public).id == api_key.id
+        assert ApiKeyVerifier.verify(db, api_key.public).domain == api_key.domain
+        assert ApiKeyVerifier.verify(db, "Bearer unknown") is None
+        assert ApiKeyVerifier.verify(db, None) is None
+
+    def test_second_verification_is_served_from_cache(self, db, api_key):
+        ApiKeyVerifier.verify(db, api_key.public)
+        hits = verified_api_keys.hits
+        db.close()
+        assert ApiKeyVerifier.verify(db, api_key.public) is not None
+        assert verified_api_keys.hits == hits + 1
+
+    def test_delete_invalidates_cached_key(self, db, api_key):
+        ApiKeyVerifier.verify(db, api_key.public)
+        ApiKeyRepo.delete(db, api_key.id)
+        assert ApiKeyVerifier.verify(db, api_key.public) is None
+
+    def test_update_invalidates_previous_public_key(self, db, api_key):
+        previous_public = api_key.public
+        ApiKeyVerifier.verify(db, previous_public)
+        api_key.public = ApiKeyRepo.generate_public_key()
+        ApiKeyRepo.update(db, api_key_data=api_key)
+        assert ApiKeyVerifier.verify(db, previous_public) is None
+        assert ApiKeyVerifier.verify(db, api_key.public).id == api_key.id
+
+    def test_key_changed_by_another_worker_is_reloaded(self, db, api_key, monkeypatch):
+        monkeypatch.setattr(api_key_invalidation, "check_interval", 0)
+        assert ApiKeyVerifier.verify(db, api_key.public).rate_limit_per_minute is None
+        # another worker's write: this process's caches are not told about it
+        db.execute(text("UPDATE api_keys SET rate_limit_per_minute = 5 WHERE id = :id"), {"id": api_key.id})
+        db.commit()
+        assert ApiKeyVerifier.verify(db, api_key.public).rate_limit_per_minute == 5
@@ -0,0 +1,117 @@
+import os
+import sqlite3
+import threading
+
+import orjson
+import pytest
+from starlette.testclient import TestClient
+
+import main
+from main import app
+from sql_app.repositories.movie_repository import MovieRepo
+from sql_app.schemas.movie_schema import MovieCreate
+from sqlite_db.backup import backup_database, restore_database
+from sqlite_db.sqlite import SessionLocal, profile
+
+client = TestClient(app)
+ADMIN_KEY = "test-admin-key"
+
+
+def _create(title: str) -> int:
+    db = SessionLocal()
+    try:
+        return MovieRepo.create(db, MovieCreate(title=title, subtitle="Backup", price=12.5)).id
+    finally:
+        db.close()
+
+
+def _count(path: str, query: str = "SELECT count(*) FROM movies"):
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute(query).fetchone()[0]
+    finally:
+        connection.close()
+
+
+class TestBackup:
+
+    @pytest.mark.parametrize("compression", ["zstd", "gzip", "none"])
+    def test_snapshot_restores_to_an_equal_database(self, tmp_path, compression):
+        if compression == "zstd":
+            pytest.importorskip("zstandard")
+        _create(f"Backup {compression}")
+        steps = []
+        report = backup_database(profile.path, str(tmp_path / "snapshot"), compression=compression,
+                                 step_pages=2, progress=steps.append)
+        assert report.compression == compression and os.path.exists(report.path)
+        assert steps[-1].copied == steps[-1].total == report.pages and len(steps) > 1
+        if compression != "none":
+            assert report.snapshot_bytes < report.database_bytes
+
+        restored = str(tmp_path / "restored.db")
+        assert restore_database(report.path, restored).compression == compression
+        assert _count(restored) == _count(profile.path)
+        assert _count(restored, "PRAGMA integrity_check") == "ok"
+
+    def test_writers_carry_on_during_a_backup(self, tmp_path):
+        stop = threading.Event()
+        created = []
+
+        def write():
+            while not stop.is_set():
+                created.append(_create(f"Backup concurrent {len(created)}"))
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        try:
+            report = backup_database(profile.path, str(tmp_path / "live.db.gz"), compression="gzip",
+                                     step_pages=1, pause=0.002)
+        finally:
+            stop.set()
+            writer.join()
+        assert created
+        restored = str(tmp_path / "restored.db")
+        restore_database(report.path, restored)
+        assert _count(restored, "PRAGMA integrity_check") == "ok"
+
+    def test_restore_moves_counters_past_the_replaced_database(self, tmp_path):
+        report = backup_database(profile.path, str(tmp_path / "counters.db.gz"), compression="gzip")
+        live = str(tmp_path / "live.db")
+        restore_database(report.path, live)
+        connection = sqlite3.connect(live)
+        with connection:
+            connection.execute("INSERT INTO movies (title, subtitle, price) VALUES ('Backup rewound', 'Backup', 1)")
+        version, = connection.execute("SELECT version FROM cache_versions WHERE name = 'movies'").fetchone()
+        seq, = connection.execute("SELECT seq FROM sqlite_sequence WHERE name = 'movie_changes'").fetchone()
+        connection.close()
+
+        restore_database(report.path, live)
+        assert _count(live, "SELECT count(*) FROM movies WHERE title = 'Backup rewound'") == 0
+        # no client ETag of the replaced catalog matches, and every syncing client resyncs
+        assert _count(live, "SELECT version FROM cache_versions WHERE name = 'movies'") > version
+        assert _count(live, "SELECT version FROM cache_versions WHERE name = 'movie_changes_horizon'") > seq
+
+    def test_rejects_files_that_are_not_snapshots(self, tmp_path):
+        bogus = tmp_path / "bogus.db"
+        bogus.write_bytes(b"not a database")
+        with pytest.raises(ValueError):
+            restore_database(str(bogus), str(tmp_path / "restored.db"))
+
+
+class TestBackupEndpoint:
+
+    def test_streams_progress_then_the_report(self, monkeypatch, tmp_path):
+        monkeypatch.setenv("ADMIN_API_KEY", ADMIN_KEY)
+        monkeypatch.setattr(main, "BACKUP_DIR", str(tmp_path))
+        response = client.post("/admin/backups", params={"compression": "gzip", "step_pages": 4},
+                               headers={"X-Admin-Key": ADMIN_KEY})
+        assert response.status_code == 200
+        lines = [orjson.loads(line) for line in response.text.splitlines()]
+        assert all("progress" in line for line in lines[:-1]) and len(lines) > 1
+        report = lines[-1]["backup"]
+        assert os.path.dirname(report["path"]) == str(tmp_path) and report["path"].endswith(".db.gz")
+        assert lines[-2]["progress"]["copied"] == report["pages"]
+
+    def test_requires_the_admin_key(self, monkeypatch):
+        monkeypatch.setenv("ADMIN_API_KEY", ADMIN_KEY)
+        assert client.post("/admin/backups").status_code == 403
@@ -0,0 +1,67 @@
+from starlette.testclient import TestClient
+
+from main import app
+from monitoring.sql_metrics import RequestStats, current_request_stats
+from sql_app.repositories.movie_repository import MovieRepo
+from sql_app.schemas.movie_schema import MovieCreate
+from sqlite_db.sqlite import ReadSessionLocal, SessionLocal
+
+client = TestClient(app)
+
+
+def _create_movies(count: int, subtitle: str):
+    db = SessionLocal()
+    movies = [
+        MovieRepo.create(db, MovieCreate(title=f"Batch {number}", subtitle=subtitle, price=number, description="long"))
+        for number in range(count)
+    ]
+    db.close()
+    return movies
+
+
+class TestBatchFetch:
+
+    def test_fetch_by_ids_keeps_request_order_in_one_query(self):
+        movies = _create_movies(3, "Order")
+        ids = [movies[2].id, 999999999, movies[0].id, movies[2].id]
+        db = ReadSessionLocal()
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        try:
+            rows = MovieRepo.fetch_by_ids(db, ids, ("title", "id"))
+        finally:
+            current_request_stats.reset(token)
+            db.close()
+        assert [tuple(row) for row in rows] == [("Batch 2", movies[2].id), ("Batch 0", movies[0].id)]
+        assert stats.statements == 1
+
+    def test_get_movies_by_ids_with_fields(self):
+        movies = _create_movies(2, "Fields")
+        ids = ",".join(str(movie.id) for movie in reversed(movies))
+        response = client.get("/movies", params={"ids": ids, "fields": "title,price"})
+        assert response.status_code == 200
+        assert response.json() == [
+            {"title": "Batch 1", "price": 1.0, "id": movies[1].id},
+            {"title": "Batch 0", "price": 0.0, "id": movies[0].id},
+        ]
+
+    def test_post_variant_and_single_movie_projection(self):
+        movies = _create_movies(1, "Ids")
+        response = client.post("/movies/by-ids", json={"ids": [movies[0].id], "fields": ["subtitle"]})
+        assert response.json() == [{"subtitle": "Ids", "id": movies[0].id}]
+        single = client.get(f"/movies/{movies[0].id}", params={"fields": "title"})
+        assert single.json() == {"title": "Batch 0", "id": movies[0].id}
+
+    def test_pages_are_projected(self):
+        page = client.get("/movies", params={"limit": 3, "fields": "title"})
+        assert all(set(movie) == {"title", "id"} for movie in page.json())
+        assert "X-Next-Cursor" in page.headers
+
+    def test_projection_is_documented(self):
+        schema = app.openapi()["paths"]["/movies"]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+        assert schema["items"] == {"$ref": "#/components/schemas/MovieFields"}
+
+    def test_invalid_requests_are_rejected(self):
+        assert client.get("/movies", params={"fields": "title,secret"}).status_code == 400
+        assert client.get("/movies", params={"ids": "1,two"}).status_code == 400
+        assert client.get("/movies", params={"ids": ",".join(["1"] * 501)}).status_code == 400
@@ -0,0 +1,99 @@
+import asyncio
+import json
+
+import pytest
+from starlette.testclient import TestClient
+
+from main import app
+from sql_app.repositories.movie_repository import MovieRepo
+from sql_app.schemas.movie_schema import MovieCreate
+from sql_app.write_batcher import write_batcher
+
+client = TestClient(app)
+
+
+@pytest.fixture(scope="module")
+def headers():
+    response = client.post("/keys", json={"domain": "http://bulk.test"})
+    return {"authorization": "Bearer " + response.json()["public"]}
+
+
+class TestBulkImport:
+
+    def test_requires_valid_key(self):
+        response = client.post("/movies/bulk", json=[], headers={"authorization": "Bearer nope"})
+        assert response.status_code == 403
+
+    def test_reports_status_per_row_for_json_array(self, headers):
+        rows = [
+            {"title": "Bulk One", "subtitle": "A", "price": 1.0},
+            {"title": "Bulk One", "subtitle": "A", "price": 1.0},
+            {"title": "Bulk Two", "price": "not a price"},
+            "not an object",
+            {"title": "Bulk Two", "subtitle": "B", "price": 2.0},
+        ]
+        response = client.post("/movies/bulk", json=rows, headers=headers)
+        assert response.status_code == 200
+        report = response.json()
+        assert [result["status"] for result in report["results"]] == [
+            "created", "duplicate", "invalid", "invalid", "created"
+        ]
+        assert (report["created"], report["duplicates"], report["invalid"]) == (2, 1, 2)
+
+        again = client.post("/movies/bulk", json=rows[:1], headers=headers).json()
+        assert again["results"][0]["status"] == "duplicate"
+
+    def test_accepts_ndjson_stream_across_chunks(self, headers):
+        lines = [json.dumps({"title": f"Bulk Stream {number}", "price": number}) for number in range(2500)]
+        body = "\n".join(lines[:3] + ["{broken"] + lines[3:]) + "\n"
+        response = client.post(
+            "/movies/bulk", data=body.encode(), headers=dict(headers, **{"content-type": "application/x-ndjson"})
+        )
+        report = response.json()
+        assert report["created"] == 2500
+        assert report["invalid"] == 1
+        assert report["results"][3]["status"] == "invalid"
+        assert client.get("/movies/search", params={"q": "bulk stream 2499"}).json()[0]["title"] == "Bulk Stream 2499"
+
+    def test_rejects_non_array_json(self, headers):
+        response = client.post("/movies/bulk", json={"title": "x"}, headers=headers)
+        assert response.status_code == 400
+
+    def test_slow_upload_does_not_hold_up_other_writes(self, headers):
+        lines = [json.dumps({"title": f"Bulk Slow {number}", "price": number}).encode() + b"\n" for number in range(4)]
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST", "scheme": "http",
+            "path": "/movies/bulk", "raw_path": b"/movies/bulk", "root_path": "", "query_string": b"",
+            "client": ("127.0.0.1", 50000), "server": ("testserver", 80),
+            "headers": [(b"host", b"testserver"), (b"content-type", b"application/x-ndjson"),
+                        (b"authorization", headers["authorization"].encode())],
+        }
+
+        async def scenario():
+            first_line_read = asyncio.Event()
+
+            async def receive():
+                if lines:
+                    if first_line_read.is_set():
+                        await asyncio.sleep(0.2)
+                    line = lines.pop(0)
+                    first_line_read.set()
+                    return {"type": "http.request", "body": line, "more_body": bool(lines)}
+                return {"type": "http.disconnect"}
+
+            sent = []
+
+            async def send(message):
+                sent.append(message)
+
+            upload = asyncio.ensure_future(app(scope, receive, send))
+            await first_line_read.wait()
+            movie = await write_batcher.submit(MovieRepo.create, MovieCreate(title="Bulk Slow Bystander", price=1.0))
+            upload_still_open = not upload.done()
+            await upload
+            return movie, upload_still_open, sent
+
+        movie, upload_still_open, sent = asyncio.run(scenario())
+        assert movie is not None and upload_still_open
+        assert sent[0]["status"] == 200
+        assert json.loads(b"".join(message.get("body", b"") for message in sent[1:]))["created"] == 4
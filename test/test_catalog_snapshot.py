@@ -0,0 +1,159 @@
+import tracemalloc
+
+import numpy as np
+from starlette.testclient import TestClient
+
+from main import app
+from sql_app.cache.catalog_snapshot import CatalogSnapshot, catalog_snapshot
+from sql_app.models.movie_model import Movie
+from sql_app.repositories.change_log_repository import ChangeLogRepo
+from sql_app.repositories.movie_repository import MovieRepo
+from sql_app.schemas.movie_schema import Movie as MovieSchema, MovieCreate
+from sqlite_db.sqlite import ReadSessionLocal, SessionLocal
+
+client = TestClient(app)
+
+
+def _create(title: str, price: float) -> int:
+    db = SessionLocal()
+    try:
+        return MovieRepo.create(db, MovieCreate(title=title, subtitle="Snapshot", price=price)).id
+    finally:
+        db.close()
+
+
+def _prices_between(low: float, high: float) -> dict:
+    db = ReadSessionLocal()
+    try:
+        return dict(db.query(Movie.id, Movie.price).filter(Movie.price.between(low, high)).order_by(Movie.id))
+    finally:
+        db.close()
+
+
+def _with_read_session(operation):
+    db = ReadSessionLocal()
+    try:
+        return operation(db)
+    finally:
+        db.close()
+
+
+class TestCatalogSnapshot:
+
+    def test_price_range_matches_the_database(self):
+        for number, price in enumerate([7001.0, 7002.5, 7002.5, 7010.0, 7099.0, 7200.0]):
+            _create(f"Snapshot range {number}", price)
+        snapshot = CatalogSnapshot()
+
+        ids = _with_read_session(lambda db: snapshot.ids_in_price_range(db, 7002.5, 7099.0))
+        assert ids.tolist() == list(_prices_between(7002.5, 7099.0))
+        after = ids[0]
+        page = _with_read_session(lambda db: snapshot.ids_in_price_range(db, 7002.5, 7099.0, after_id=after, limit=2))
+        assert page.tolist() == ids[1:3].tolist()
+        # a range covering most of the catalog is scanned in id order instead
+        everything = _with_read_session(lambda db: snapshot.ids_in_price_range(db, 0.0, after_id=after))
+        assert everything.tolist() == [movie_id for movie_id in _prices_between(0.0, 1e12) if movie_id > after]
+
+    def test_writes_are_merged_without_reloading(self, monkeypatch):
+        kept = _create("Snapshot merge kept", 7300.0)
+        repriced = _create("Snapshot merge repriced", 7301.0)
+        removed = _create("Snapshot merge removed", 7302.0)
+        snapshot = CatalogSnapshot()
+        _with_read_session(snapshot.columns)
+
+        def reload(*_):
+            raise AssertionError("the snapshot was reloaded instead of merged")
+
+        monkeypatch.setattr(snapshot, "_load", reload)
+        db = SessionLocal()
+        try:
+            MovieRepo.update(db, MovieSchema(id=repriced, title="Snapshot merge repriced", subtitle="Snapshot",
+                                             price=7350.0))
+            MovieRepo.delete(db, removed)
+        finally:
+            db.close()
+        added = _create("Snapshot merge added", 7310.0)
+
+        ids = _with_read_session(lambda db: snapshot.ids_in_price_range(db, 7300.0, 7399.0))
+        assert ids.tolist() == [kept, repriced, added]
+        columns = snapshot._columns
+        assert np.all(np.diff(columns.ids) > 0) and np.all(np.diff(columns.by_price) >= 0)
+        assert snapshot.titles[columns.titles[np.searchsorted(columns.ids, added)]] == "Snapshot merge added"
+
+    def test_stats_endpoint(self):
+        for number, price in enumerate([7500.0, 7510.0, 7520.0, 7530.0]):
+            _create(f"Snapshot stats {number}", price)
+        response = client.get("/movies/stats", params={"min_price": 7500, "max_price": 7599, "bins": 3,
+                                                       "percentiles": "50,90"})
+        assert response.status_code == 200
+        prices = np.array(list(_prices_between(7500, 7599).values()))
+        stats = response.json()
+        assert (stats["count"], stats["min"], stats["max"], stats["mean"]) == (
+            len(prices), prices.min(), prices.max(), prices.mean()
+        )
+        assert stats["percentiles"] == {"p50": np.percentile(prices, 50), "p90": np.percentile(prices, 90)}
+        assert sum(stats["histogram"]["counts"]) == len(prices) and len(stats["histogram"]["edges"]) == 4
+
+        assert client.get("/movies/stats", params={"min_price": 10, "max_price": 5}).status_code == 400
+        assert client.get("/movies/stats", params={"percentiles": "150"}).status_code == 400
+        assert client.get("/movies/stats", params={"min_price": 99999999}).json()["count"] == 0
+
+    def test_movies_filtered_by_price_follow_cursors(self):
+        for number, price in enumerate([7700.0, 7750.0, 7760.0, 7799.0, 7800.5]):
+            _create(f"Snapshot page {number}", price)
+        expected = list(_prices_between(7700, 7800))
+        seen = []
+        params = {"min_price": 7700, "max_price": 7800, "limit": 2, "fields": "price"}
+        while True:
+            response = client.get("/movies", params=params)
+            assert response.status_code == 200
+            seen.extend(movie["id"] for movie in response.json())
+            assert all(7700 <= movie["price"] <= 7800 for movie in response.json())
+            if "X-Next-Cursor" not in response.headers:
+                break
+            params["cursor"] = response.headers["X-Next-Cursor"]
+        assert seen == expected
+
+    def test_memory_is_a_fraction_of_orm_objects(self):
+        snapshot = CatalogSnapshot()
+        _with_read_session(snapshot.columns)
+
+        db = ReadSessionLocal()
+        try:
+            tracemalloc.start()
+            movies = MovieRepo.fetch_all(db, limit=len(snapshot))
+            orm_bytes = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+        finally:
+            db.close()
+        assert len(movies) == len(snapshot)
+        assert snapshot.nbytes() * 4 < orm_bytes
+
+    def test_older_read_transactions_do_not_rewind_the_snapshot(self, monkeypatch):
+        snapshot = CatalogSnapshot()
+        _with_read_session(snapshot.columns)
+        position = snapshot.position
+
+        def refresh(*_):
+            raise AssertionError("an older reader refreshed the snapshot")
+
+        monkeypatch.setattr(snapshot, "_refresh", refresh)
+        monkeypatch.setattr(ChangeLogRepo, "fetch_latest_seq", lambda db: position - 1)
+        _with_read_session(snapshot.columns)
+        assert snapshot.position == position
+
+    def test_price_pages_recheck_rows_from_a_newer_snapshot(self, monkeypatch):
+        inside = [_create(f"Snapshot recheck {number}", 7900.0 + number) for number in range(3)]
+        outside = _create("Snapshot recheck outside", 100.0)
+        # a snapshot ahead of the request's transaction: one movie it does not see yet, one
+        # priced differently
+        ids = np.array(sorted(inside + [outside, max(inside + [outside]) + 1000]), dtype=np.int64)
+        monkeypatch.setattr(catalog_snapshot, "ids_in_price_range",
+                            lambda db, low, high, after_id, limit: ids[ids > (after_id or 0)][:limit])
+        response = client.get("/movies", params={"min_price": 7900, "max_price": 7999, "limit": 2, "fields": "title"})
+        assert [movie["id"] for movie in response.json()] == inside[:2]
+        assert set(response.json()[0]) == {"id", "title"}
+        response = client.get("/movies", params={"min_price": 7900, "max_price": 7999, "limit": 2, "fields": "title",
+                                                 "cursor": response.headers["X-Next-Cursor"]})
+        assert [movie["id"] for movie in response.json()] == inside[2:]
+        assert "X-Next-Cursor" not in response.headers
@@ -0,0 +1,83 @@
+from datetime import timedelta
+
+from starlette.testclient import TestClient
+
+from main import app
+from manage import main as manage
+from sql_app.repositories.change_log_repository import ChangeLogRepo
+from sql_app.repositories.movie_repository import MovieRepo
+from sql_app.schemas.movie_schema import MovieCreate
+from sqlite_db.sqlite import SessionLocal
+
+client = TestClient(app)
+
+
+def _latest_seq() -> int:
+    db = SessionLocal()
+    try:
+        return ChangeLogRepo.fetch_latest_seq(db)
+    finally:
+        db.close()
+
+
+def _create(db, title):
+    return MovieRepo.create(db, MovieCreate(title=title, subtitle="Changes", price=2.0))
+
+
+class TestChangeFeed:
+
+    def test_changes_collapse_to_latest_state_and_tombstones(self):
+        since = _latest_seq()
+        db = SessionLocal()
+        kept = _create(db, "Change Kept")
+        removed = _create(db, "Change Removed")
+        db_movie = MovieRepo.fetch_movie_by_id(db, kept.id)
+        db_movie.price = 3.0
+        MovieRepo.update(db, db_movie)
+        MovieRepo.delete(db, removed.id)
+        db.close()
+
+        page = client.get("/movies/changes", params={"since": since}).json()
+        assert [(change["action"], change["id"]) for change in page["changes"]] == [
+            ("upsert", kept.id), ("delete", removed.id)
+        ]
+        assert page["changes"][0]["movie"]["price"] == 3.0
+        assert page["next_since"] == page["latest"] == since + 4
+        assert not page["has_more"]
+        assert client.get("/movies/changes", params={"since": page["next_since"]}).json()["changes"] == []
+
+    def test_pages_follow_next_since(self):
+        since = _latest_seq()
+        db = SessionLocal()
+        created = [_create(db, f"Change Page {number}").id for number in range(5)]
+        db.close()
+        seen = []
+        has_more = True
+        while has_more:
+            page = client.get("/movies/changes", params={"since": since, "limit": 2}).json()
+            seen.extend(change["id"] for change in page["changes"])
+            since, has_more = page["next_since"], page["has_more"]
+        assert seen == created
+
+    def test_compaction_keeps_sync_result_and_expires_tombstones(self):
+        since = _latest_seq()
+        db = SessionLocal()
+        movie = _create(db, "Change Compacted")
+        for price in (5.0, 6.0):
+            db_movie = MovieRepo.fetch_movie_by_id(db, movie.id)
+            db_movie.price = price
+            MovieRepo.update(db, db_movie)
+        doomed = _create(db, "Change Compacted Away")
+        MovieRepo.delete(db, doomed.id)
+        before = client.get("/movies/changes", params={"since": since}).json()["changes"]
+
+        superseded, trimmed = ChangeLogRepo.compact(db, timedelta(days=30))
+        assert superseded >= 3 and trimmed == 0
+        assert client.get("/movies/changes", params={"since": since}).json()["changes"] == before
+
+        manage(["compact-changes", "--tombstone-days", "0"])
+        db.close()
+        expired = client.get("/movies/changes", params={"since": since})
+        assert expired.status_code == 410
+        latest = int(expired.headers["x-latest-seq"])
+        assert client.get("/movies/changes", params={"since": latest}).json()["changes"] == []
@@ -0,0 +1,110 @@
+import asyncio
+
+from main import app
+from sql_app.change_stream import DROPPED, ChangeStreamHub
+from sql_app.repositories.change_log_repository import ChangeLogRepo
+from sql_app.repositories.movie_repository import MovieRepo
+from sql_app.schemas.movie_schema import MovieCreate
+from sqlite_db.sqlite import SessionLocal
+
+
+def _create(title: str):
+    db = SessionLocal()
+    movie = MovieRepo.create(db, MovieCreate(title=title, subtitle="Stream", price=1.5))
+    db.close()
+    return movie
+
+
+def _latest_seq() -> int:
+    db = SessionLocal()
+    try:
+        return ChangeLogRepo.fetch_latest_seq(db)
+    finally:
+        db.close()
+
+
+async def _next(stream, timeout: float = 5.0) -> bytes:
+    return await asyncio.wait_for(stream.__anext__(), timeout)
+
+
+class TestChangeStream:
+
+    def test_live_changes_reach_subscribers(self):
+        async def scenario():
+            hub = ChangeStreamHub(poll_interval=0.02)
+            stream = hub.stream()
+            assert (await _next(stream)).startswith(b"retry:")
+            movie = _create("Streamed Live")
+            event = await _next(stream)
+            await stream.aclose()
+            return movie, event, len(hub)
+
+        movie, event, subscribers = asyncio.run(scenario())
+        assert event.startswith(b"id: %d\nevent: upsert\n" % _latest_seq())
+        assert b'"title":"Streamed Live"' in event and b'"id":%d' % movie.id in event
+        assert subscribers == 0
+
+    def test_resumes_after_last_event_id(self):
+        since = _latest_seq()
+        first, second = _create("Streamed Missed One"), _create("Streamed Missed Two")
+
+        async def scenario():
+            stream = ChangeStreamHub(poll_interval=0.02).stream(since)
+            await _next(stream)
+            events = [await _next(stream), await _next(stream)]
+            await stream.aclose()
+            return events
+
+        events = asyncio.run(scenario())
+        assert [event.split(b"\n")[0] for event in events] == [b"id: %d" % (since + 1), b"id: %d" % (since + 2)]
+        assert b'"id":%d' % first.id in events[0] and b'"id":%d' % second.id in events[1]
+
+    def test_slow_consumer_is_dropped(self):
+        async def scenario():
+            hub = ChangeStreamHub(queue_size=1, poll_interval=0.02)
+            stream = hub.stream()
+            await _next(stream)
+            _create("Streamed Slow One")
+            _create("Streamed Slow Two")
+            for _ in range(100):
+                if hub.dropped:
+                    break
+                await asyncio.sleep(0.02)
+            events = [event async for event in stream]
+            return hub.dropped, len(hub), events
+
+        dropped, subscribers, events = asyncio.run(scenario())
+        assert (dropped, subscribers) == (1, 0)
+        assert len(events) == 2 and events[-1] == DROPPED
+
+    def test_endpoint_streams_server_sent_events(self):
+        since = _latest_seq()
+        movie = _create("Streamed Endpoint")
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": "/movies/stream", "raw_path": b"/movies/stream", "root_path": "",
+            "query_string": b"", "headers": [(b"last-event-id", str(since).encode())],
+            "client": ("127.0.0.1", 50000), "server": ("testserver", 80),
+        }
+
+        async def scenario():
+            messages, received = [], asyncio.Event()
+
+            async def receive():
+                await received.wait()
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                messages.append(message)
+                if b"event: upsert" in message.get("body", b""):
+                    received.set()
+
+            await asyncio.wait_for(app(scope, receive, send), 5)
+            return messages
+
+        messages = asyncio.run(scenario())
+        assert messages[0]["status"] == 200
+        assert (b"content-type", b"text/event-stream; charset=utf-8") in messages[0]["headers"]
+        body = b"".join(message.get("body", b"") for message in messages[1:])
+        assert b"id: %d\nevent: upsert\n" % (since + 1) in body
+        assert b'"id":%d' % movie.id in body
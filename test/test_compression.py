@@ -0,0 +1,138 @@
+import asyncio
+import gzip
+import zlib
+
+from starlette.responses import Response, StreamingResponse
+from starlette.testclient import TestClient
+
+from main import app
+from sql_app.cache.ttl_cache import TTLCache
+from sql_app.compression import CompressionMiddleware, available_codecs, brotli, negotiate, zstandard
+
+client = TestClient(app)
+BODY = b'{"title":"Compressible"}' * 200
+
+
+def _call(asgi_app, accept_encoding: str = None):
+    """
+    Run one GET through ``asgi_app``; returns the response headers and every body chunk sent
+    """
+    headers = [] if accept_encoding is None else [(b"accept-encoding", accept_encoding.encode("latin-1"))]
+    scope = {"type": "http", "method": "GET", "path": "/", "raw_path": b"/", "query_string": b"",
+             "headers": headers, "http_version": "1.1", "scheme": "http", "server": ("test", 80)}
+    messages = []
+    requests = [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receive():
+        if requests:
+            return requests.pop()
+        # the client stays connected until the response is complete
+        await asyncio.Event().wait()
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(asgi_app(scope, receive, send))
+    start = {name.decode("latin-1"): value.decode("latin-1") for name, value in messages[0]["headers"]}
+    return start, [message["body"] for message in messages[1:]]
+
+
+def _fixed(body: bytes, media_type: str = "application/json", headers: dict = None):
+    return Response(body, media_type=media_type, headers=headers)
+
+
+def _middleware(response_app, **kwargs):
+    kwargs.setdefault("codecs", available_codecs())
+    kwargs.setdefault("cache", TTLCache(maxsize=8))
+    return CompressionMiddleware(response_app, **kwargs)
+
+
+class TestNegotiation:
+
+    def test_highest_weight_wins(self):
+        assert negotiate("gzip;q=0.5, br", ["zstd", "br", "gzip"]) == "br"
+        assert negotiate("gzip, br;q=0.9", ["zstd", "br", "gzip"]) == "gzip"
+
+    def test_ties_go_to_the_server_preference(self):
+        assert negotiate("gzip, br, zstd", ["zstd", "br", "gzip"]) == "zstd"
+        assert negotiate("*", ["br", "gzip"]) == "br"
+
+    def test_refused_or_unknown_codings(self):
+        assert negotiate("br;q=0, *;q=0", ["br", "gzip"]) is None
+        assert negotiate("identity", ["br", "gzip"]) is None
+        assert negotiate(None, ["gzip"]) is None
+
+
+class TestCompressionMiddleware:
+
+    def test_each_coding_round_trips(self):
+        decoders = {"gzip": gzip.decompress}
+        if brotli is not None:
+            decoders["br"] = brotli.decompress
+        if zstandard is not None:
+            decoders["zstd"] = lambda data: zstandard.ZstdDecompressor().decompressobj().decompress(data)
+        for coding, decode in decoders.items():
+            headers, chunks = _call(_middleware(_fixed(BODY)), coding)
+            assert headers["content-encoding"] == coding
+            assert headers["vary"] == "Accept-Encoding"
+            assert int(headers["content-length"]) == len(chunks[0]) < len(BODY)
+            assert decode(chunks[0]) == BODY
+
+    def test_small_and_binary_bodies_are_sent_as_is(self):
+        headers, chunks = _call(_middleware(_fixed(b'{"small":true}')), "gzip")
+        assert "content-encoding" not in headers and chunks == [b'{"small":true}']
+        assert headers["vary"] == "Accept-Encoding"
+        headers, chunks = _call(_middleware(_fixed(BODY, media_type="image/png")), "gzip")
+        assert "content-encoding" not in headers and chunks == [BODY]
+        assert "vary" not in headers
+        headers, chunks = _call(_middleware(_fixed(BODY, headers={"Vary": "Authorization"})), None)
+        assert "content-encoding" not in headers and chunks == [BODY]
+        assert headers["vary"] == "Authorization, Accept-Encoding"
+
+    def test_cached_representation_is_compressed_once(self):
+        calls = []
+
+        class CountingGzip(available_codecs()["gzip"].__class__):
+            def compress(self, body):
+                calls.append(len(body))
+                return super().compress(body)
+
+        middleware = _middleware(_fixed(BODY, headers={"ETag": '"catalog-v7"'}), codecs={"gzip": CountingGzip()})
+        first_headers, first = _call(middleware, "gzip")
+        second_headers, second = _call(middleware, "gzip")
+        assert calls == [len(BODY)] and first == second
+        assert first_headers["etag"] == second_headers["etag"] == 'W/"catalog-v7"'
+
+        # same validator, different body (another page of the same catalog version)
+        _call(_middleware(_fixed(BODY[::-1], headers={"ETag": '"catalog-v7"'}),
+                          codecs={"gzip": CountingGzip()}, cache=middleware.cache), "gzip")
+        assert len(calls) == 2
+
+    def test_streams_are_compressed_chunk_by_chunk(self):
+        async def chunks():
+            for number in range(3):
+                yield b'{"chunk":%d}\n' % number
+
+        streaming = StreamingResponse(chunks(), media_type="application/x-ndjson")
+        headers, sent = _call(_middleware(streaming), "gzip")
+        assert headers["content-encoding"] == "gzip" and "content-length" not in headers
+        decompressor = zlib.decompressobj(31)
+        # every chunk can be decoded as soon as it arrives
+        assert [decompressor.decompress(chunk) for chunk in sent[:3]] == [
+            b'{"chunk":0}\n', b'{"chunk":1}\n', b'{"chunk":2}\n'
+        ]
+        decompressor.decompress(b"".join(sent[3:]))
+        assert decompressor.eof
+
+
+class TestCompressedEndpoints:
+
+    def test_catalog_page_revalidates_with_weak_etag(self):
+        response = client.get("/movies", params={"limit": 500}, headers={"Accept-Encoding": "gzip"})
+        assert response.status_code == 200
+        etag = response.headers["etag"]
+        if response.headers.get("content-encoding") == "gzip":
+            assert etag.startswith("W/")
+        revalidated = client.get("/movies", params={"limit": 500},
+                                 headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+        assert revalidated.status_code == 304
@@ -0,0 +1,113 @@
+import os
+import shutil
+
+from sqlalchemy import create_engine, text
+from starlette.testclient import TestClient
+
+from main import app
+from sql_app.migrations import run_migrations
+from sql_app.repositories.movie_repository import MovieRepo
+from sql_app.schemas.movie_schema import MovieCreate
+from sqlite_db.sqlite import SessionLocal
+
+client = TestClient(app)
+
+
+def _create_movie(title: str):
+    db = SessionLocal()
+    movie = MovieRepo.create(db, MovieCreate(title=title, subtitle="Conditional", price=6.0))
+    db.close()
+    return movie
+
+
+def _api_key(domain: str = "conditional.example.com") -> str:
+    return client.post("/keys", json={"domain": domain}).json()["public"]
+
+
+class TestConditionalRequests:
+
+    def test_movie_revalidates_with_etag_and_last_modified(self):
+        movie = _create_movie("Conditional Movie")
+        first = client.get(f"/movies/{movie.id}")
+        etag, last_modified = first.headers["etag"], first.headers["last-modified"]
+        assert etag == f'"movie-{movie.id}-v1"'
+
+        not_modified = client.get(f"/movies/{movie.id}", headers={"If-None-Match": etag})
+        assert not_modified.status_code == 304
+        assert not_modified.content == b""
+        assert not_modified.headers["etag"] == etag
+        assert client.get(f"/movies/{movie.id}", headers={"If-Modified-Since": last_modified}).status_code == 304
+
+        db = SessionLocal()
+        db_movie = MovieRepo.fetch_movie_by_id(db, movie.id)
+        db_movie.price = 7.0
+        assert MovieRepo.update(db, db_movie).version == 2
+        db.close()
+        changed = client.get(f"/movies/{movie.id}", headers={"If-None-Match": etag})
+        assert changed.status_code == 200
+        assert changed.json()["price"] == 7.0
+        assert changed.headers["etag"] == f'"movie-{movie.id}-v2"'
+
+    def test_collections_carry_the_catalog_version(self):
+        page = client.get("/movies", params={"limit": 5})
+        etag = page.headers["etag"]
+        assert client.get("/movies", params={"limit": 5}, headers={"If-None-Match": etag}).status_code == 304
+        _create_movie("Conditional Catalog Change")
+        refreshed = client.get("/movies", params={"limit": 5}, headers={"If-None-Match": etag})
+        assert refreshed.status_code == 200
+        assert refreshed.headers["etag"] != etag
+
+    def test_put_with_stale_if_match_is_rejected(self):
+        movie = _create_movie("Conditional Update")
+        headers = {"Authorization": _api_key()}
+        etag = client.get(f"/movies/{movie.id}").headers["etag"]
+        body = {"id": movie.id, "title": "Conditional Update", "subtitle": "Conditional", "price": 8.0}
+
+        updated = client.put(f"/movies/{movie.id}", json=body, headers=dict(headers, **{"If-Match": etag}))
+        assert updated.status_code == 200
+        assert updated.headers["etag"] == f'"movie-{movie.id}-v2"'
+
+        stale = client.put(f"/movies/{movie.id}", json=dict(body, price=9.0), headers=dict(headers, **{"If-Match": etag}))
+        assert stale.status_code == 412
+        assert client.get(f"/movies/{movie.id}").json()["price"] == 8.0
+
+    def test_put_racing_a_delete_answers_not_found(self, monkeypatch):
+        movie = _create_movie("Conditional Update Racing Delete")
+        headers = {"Authorization": _api_key("conditional-race.example.com")}
+        fetch_movie_by_id = MovieRepo.fetch_movie_by_id
+
+        def fetch_then_delete(db, movie_id):
+            # the endpoint reads the movie, then a concurrent delete commits before its update
+            db_movie = fetch_movie_by_id(db, movie_id)
+            other = SessionLocal()
+            MovieRepo.delete(other, movie_id)
+            other.close()
+            return db_movie
+
+        monkeypatch.setattr(MovieRepo, "fetch_movie_by_id", staticmethod(fetch_then_delete))
+        body = {"id": movie.id, "title": "Conditional Update Racing Delete", "subtitle": "Conditional", "price": 3.0}
+        assert client.put(f"/movies/{movie.id}", json=body, headers=headers).status_code == 404
+
+    def test_compare_and_set_update(self):
+        movie = _create_movie("Conditional Compare And Set")
+        db = SessionLocal()
+        db_movie = MovieRepo.fetch_movie_by_id(db, movie.id)
+        db_movie.price = 1.0
+        assert MovieRepo.update(db, db_movie, expected_version=5) is None
+        assert MovieRepo.update(db, db_movie, expected_version=1).version == 2
+        db.close()
+
+    def test_migrations_upgrade_the_original_database(self, tmp_path):
+        # the database shipped with the repository predates every migration
+        legacy = tmp_path / "legacy.db"
+        shutil.copy(os.path.join(os.path.dirname(__file__), "..", "sqlite.db"), legacy)
+        engine = create_engine(f"sqlite:///{legacy}")
+        run_migrations(engine)
+        with engine.connect() as connection:
+            rows = connection.execute(text("SELECT version, updated_at FROM movies")).all()
+            missing_digests = connection.execute(
+                text("SELECT count(*) FROM api_keys WHERE public_digest IS NULL")
+            ).scalar()
+        engine.dispose()
+        assert rows and all(version == 1 and updated_at is not None for version, updated_at in rows)
+        assert missing_digests == 0
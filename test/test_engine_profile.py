@@ -0,0 +1,30 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from sqlite_db.profile import EngineProfile
+from sqlite_db.sqlite import engine, profile, read_engine
+
+
+class TestEngineProfile:
+
+    def test_reads_overrides_from_environment(self, monkeypatch):
+        monkeypatch.setenv("SQLITE_DEBUG", "true")
+        monkeypatch.setenv("SQLITE_READ_POOL_SIZE", "3")
+        env_profile = EngineProfile.from_env()
+        assert env_profile.debug is True
+        assert env_profile.read_pool_size == 3
+
+    def test_writer_runs_in_wal_mode(self):
+        with engine.connect() as connection:
+            assert connection.execute(text("PRAGMA journal_mode")).scalar().lower() == "wal"
+            assert connection.execute(text("PRAGMA synchronous")).scalar() == 1
+            assert connection.execute(text("PRAGMA busy_timeout")).scalar() == profile.busy_timeout_ms
+
+    def test_read_pool_rejects_writes(self):
+        with engine.begin() as connection:
+            connection.execute(text("CREATE TABLE IF NOT EXISTS profile_probe (id INTEGER)"))
+        with read_engine.connect() as connection:
+            assert connection.execute(text("SELECT count(*) FROM profile_probe")).scalar() == 0
+            with pytest.raises(OperationalError):
+                connection.execute(text("INSERT INTO profile_probe VALUES (1)"))
@@ -0,0 +1,103 @@
+import time
+from datetime import timezone
+from xml.etree import ElementTree
+
+from sqlalchemy import text
+from starlette.testclient import TestClient
+
+from feeds.feed_cache import feed_cache
+from main import app
+from sql_app.conditional import http_date
+from sql_app.repositories.movie_repository import MovieRepo
+from sql_app.schemas.movie_schema import MovieCreate
+from sqlite_db.sqlite import SessionLocal, engine
+
+client = TestClient(app)
+
+
+def _create_movie(title: str):
+    db = SessionLocal()
+    movie = MovieRepo.create(db, MovieCreate(title=title, subtitle="Feeds", price=7.5, description="In the feed"))
+    db.close()
+    return movie
+
+
+def _rss_titles() -> list:
+    response = client.get("/feeds/rss")
+    return [item.findtext("title") for item in ElementTree.fromstring(response.content).iter("item")]
+
+
+class TestFeeds:
+
+    def test_rss_is_xml_with_validators(self):
+        _create_movie("Feed Rss")
+        # the identity representation keeps the strong ETag; compressed ones get a weak one
+        response = client.get("/feeds/rss", headers={"Accept-Encoding": "identity"})
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/rss+xml")
+        assert response.headers["etag"].startswith('"')
+        assert "last-modified" in response.headers
+        titles = [item.findtext("title") for item in ElementTree.fromstring(response.content).iter("item")]
+        assert "Feed Rss" in titles
+
+    def test_atom_is_xml(self):
+        _create_movie("Feed Atom")
+        response = client.get("/feeds/atom")
+        assert response.headers["content-type"].startswith("application/atom+xml")
+        entries = ElementTree.fromstring(response.content).findall("{http://www.w3.org/2005/Atom}entry")
+        assert "Feed Atom" in [entry.findtext("{http://www.w3.org/2005/Atom}title") for entry in entries]
+
+    def test_pollers_get_not_modified_until_catalog_changes(self, monkeypatch):
+        # only this process writes here; a version check falling due mid-test would re-render
+        monkeypatch.setattr(feed_cache.invalidation, "check_interval", 3600)
+        first = client.get("/feeds/rss")
+        renders = feed_cache.renders
+        cached = client.get("/feeds/rss", headers={"If-None-Match": first.headers["etag"]})
+        assert cached.status_code == 304
+        assert cached.content == b""
+        by_date = client.get("/feeds/rss", headers={"If-Modified-Since": first.headers["last-modified"]})
+        assert by_date.status_code == 304
+        assert feed_cache.renders == renders
+
+        _create_movie("Feed Invalidation")
+        changed = client.get("/feeds/rss", headers={"If-None-Match": first.headers["etag"]})
+        assert changed.status_code == 200
+        assert changed.headers["etag"] != first.headers["etag"]
+        assert b"Feed Invalidation" in changed.content
+
+    def test_client_hosts_cannot_grow_the_cache(self, monkeypatch):
+        for number in range(feed_cache.maxsize + 5):
+            client.get("/feeds/rss", headers={"Host": f"host-{number}.example"})
+        assert len(feed_cache._feeds) <= feed_cache.maxsize
+
+        monkeypatch.setenv("PUBLIC_BASE_URL", "https://movies.example/")
+        response = client.get("/feeds/rss", headers={"Host": "attacker.example", "Accept-Encoding": "identity"})
+        assert b"attacker.example" not in response.content
+        assert b"https://movies.example/movies/" in response.content
+
+    def test_movies_added_by_other_workers_reach_the_feed(self, monkeypatch):
+        monkeypatch.setattr(feed_cache.invalidation, "check_interval", 0)
+        _create_movie("Feed Before Other Worker")
+        assert "Feed Before Other Worker" in _rss_titles()
+        # another worker's write: no catalog event reaches this process
+        with engine.begin() as connection:
+            connection.execute(text(
+                "INSERT INTO movies (title, subtitle, price, description) VALUES ('Feed Other Worker', 'Feeds', 1, '')"
+            ))
+        assert "Feed Other Worker" in _rss_titles()
+
+    def test_feed_bytes_depend_only_on_the_data(self):
+        movie = _create_movie("Feed Same Bytes")
+        headers = {"Accept-Encoding": "identity"}
+        first = client.get("/feeds/atom", headers=headers)
+        # another worker, or this one after a restart, renders later from the same data
+        feed_cache.invalidate()
+        time.sleep(1.1)
+        second = client.get("/feeds/atom", headers=headers)
+        assert second.content == first.content
+        assert second.headers["etag"] == first.headers["etag"]
+        db = SessionLocal()
+        updated_at = MovieRepo.fetch_movie_by_id(db, movie.id).updated_at
+        db.close()
+        # the newest movie's own date, not the moment the feed was rendered
+        assert first.headers["last-modified"] == http_date(updated_at.replace(tzinfo=timezone.utc))
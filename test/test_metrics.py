@@ -0,0 +1,49 @@
+from fastapi.testclient import TestClient
+
+from main import app
+from monitoring.metrics import Counter, Histogram, MetricsRegistry
+from monitoring.middleware import request_sql_statements, requests_total
+from monitoring.sql_metrics import sql_statements
+
+client = TestClient(app)
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    latency = registry.histogram("latency_seconds", "Latency.", ["route"], buckets=(0.1, 1.0))
+    latency.observe(0.05, "/a")
+    latency.observe(0.5, "/a")
+    latency.observe(5, "/a")
+    text = registry.render().decode()
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{route="/a",le="1"} 2' in text
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in text
+    assert 'latency_seconds_count{route="/a"} 3' in text
+
+
+def test_collectors_are_read_at_scrape_time():
+    registry = MetricsRegistry()
+    registry.collector(lambda: [Counter("dynamic_total", "Dynamic.")])
+    assert "# TYPE dynamic_total counter" in registry.render().decode()
+    assert isinstance(registry.histogram("h", "H."), Histogram)
+
+
+def test_requests_are_labelled_by_route_template():
+    before = requests_total.value("GET", "/movies/{movie_id}", "4xx")
+    observed = request_sql_statements.count("GET", "/movies/{movie_id}")
+    statements = sql_statements.value("reader")
+    assert client.get("/movies/999999999").status_code == 404
+    assert requests_total.value("GET", "/movies/{movie_id}", "4xx") == before + 1
+    assert request_sql_statements.count("GET", "/movies/{movie_id}") == observed + 1
+    assert sql_statements.value("reader") > statements
+    client.get("/no/such/path")
+    assert requests_total.value("GET", "unmatched", "4xx") >= 1
+
+
+def test_metrics_endpoint_exposes_prometheus_text():
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE http_request_duration_seconds histogram" in response.text
+    assert 'sqlite_statements_total{engine="reader"}' in response.text
+    assert 'cache_hits_total{cache="movies"}' in response.text
@@ -0,0 +1,71 @@
+from sqlalchemy import text
+from starlette.testclient import TestClient
+
+from main import app
+from sql_app.cache.movie_cache import DatabaseVersionInvalidation, MovieCache, movie_cache
+from sql_app.repositories.movie_repository import MovieRepo
+from sql_app.schemas.movie_schema import MovieCreate
+from sqlite_db.sqlite import ReadSessionLocal, SessionLocal, engine
+
+client = TestClient(app)
+
+
+def _create_movie(title: str):
+    db = SessionLocal()
+    movie = MovieRepo.create(db, MovieCreate(title=title, subtitle="Cache", price=4.0))
+    db.close()
+    return movie
+
+
+class TestMovieCache:
+
+    def test_second_lookup_is_a_hit(self):
+        movie = _create_movie("Cached Once")
+        first = client.get(f"/movies/{movie.id}")
+        hits = movie_cache.entries.hits
+        second = client.get(f"/movies/{movie.id}")
+        assert first.json() == second.json() == {
+            "id": movie.id, "title": "Cached Once", "subtitle": "Cache", "price": 4.0, "description": None
+        }
+        assert movie_cache.entries.hits == hits + 1
+        assert client.get("/movies", params={"title": "Cached Once"}).json()[0]["id"] == movie.id
+        assert client.get("/movies", params={"title": "Never Created"}).json() == []
+
+    def test_writes_invalidate_cached_responses(self):
+        movie = _create_movie("Cached Before Update")
+        client.get(f"/movies/{movie.id}")
+        db = SessionLocal()
+        db_movie = MovieRepo.fetch_movie_by_id(db, movie.id)
+        db_movie.price = 40.0
+        MovieRepo.update(db, db_movie)
+        assert client.get(f"/movies/{movie.id}").json()["price"] == 40.0
+        MovieRepo.delete(db, movie.id)
+        db.close()
+        assert client.get(f"/movies/{movie.id}").status_code == 404
+
+    def test_database_version_catches_writes_from_other_workers(self):
+        movie = _create_movie("Cached Elsewhere")
+        cache = MovieCache(DatabaseVersionInvalidation(check_interval=0))
+        db = ReadSessionLocal()
+        assert cache.get_or_load(db, "key", lambda: b"old") == b"old"
+        assert cache.get_or_load(db, "key", lambda: b"new") == b"old"
+        # another process writes straight to the database; no catalog event reaches this one
+        with engine.begin() as connection:
+            connection.execute(text("UPDATE movies SET price = 1 WHERE id = :id"), {"id": movie.id})
+        assert cache.get_or_load(db, "key", lambda: b"new") == b"new"
+        db.close()
+
+    def test_title_body_matches_its_etag_before_the_cache_sees_a_write(self):
+        movie = _create_movie("Cached Title Elsewhere")
+        first = client.get("/movies", params={"title": "Cached Title Elsewhere"})
+        # another worker's write; this cache only learns of it at its next version check
+        with engine.begin() as connection:
+            connection.execute(text("UPDATE movies SET price = 9 WHERE id = :id"), {"id": movie.id})
+        second = client.get("/movies", params={"title": "Cached Title Elsewhere"})
+        assert second.headers["etag"] != first.headers["etag"]
+        assert second.json()[0]["price"] == 9.0
+
+    def test_exposes_counters(self):
+        stats = client.get("/cache/stats").json()
+        assert set(stats["movies"]) == {"hits", "misses", "evictions", "size"}
+        assert "hits" in stats["api_keys"]
@@ -0,0 +1,142 @@
+import pytest
+from sqlalchemy import event
+from starlette.testclient import TestClient
+
+from main import app
+from sql_app.movie_query import MovieFilter, parse_sort, prefix_upper_bound
+from sql_app.repositories.movie_repository import MovieRepo
+from sql_app.schemas.movie_schema import MovieCreate
+from sqlite_db.sqlite import SessionLocal, engine
+
+client = TestClient(app)
+
+SORTED_MOVIES = [
+    ("Sorted Alpha", "Sorted", 8010.0),
+    ("Sorted Bravo", "Sorted", 8020.0),
+    ("Sorted Charlie", "Sorted", 8010.0),
+    ("Sorted Delta", "Sorted", 8030.0),
+    ("Sorted Echo", "Sorted", 8020.0),
+    ("Sorted Foxtrot", "Sorted", 8020.0),
+    ("sorted golf", "Sorted", 8005.0),
+]
+
+
+@pytest.fixture(scope="module", autouse=True)
+def sorted_movies():
+    db = SessionLocal()
+    try:
+        for title, subtitle, price in SORTED_MOVIES:
+            MovieRepo.create(db, MovieCreate(title=title, subtitle=subtitle, price=price))
+    finally:
+        db.close()
+
+
+def _query_plan(movie_filter: MovieFilter, sort: str, after=None) -> list:
+    """
+    EXPLAIN QUERY PLAN of the statement fetch_sorted_keys actually runs
+    """
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    db = SessionLocal()
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        MovieRepo.fetch_sorted_keys(db, movie_filter, parse_sort(sort), after=after, limit=10)
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    try:
+        statement, parameters = statements[-1]
+        return [row[3] for row in db.connection().exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)]
+    finally:
+        db.close()
+
+
+def _get(**params):
+    response = client.get("/movies", params=dict(subtitle="Sorted", **params))
+    assert response.status_code == 200, response.text
+    return response
+
+
+class TestSortParsing:
+
+    def test_id_breaks_ties_in_the_direction_of_the_first_key(self):
+        assert [tuple(key) for key in parse_sort("price,-title")] == [
+            ("price", False), ("title", True), ("id", False)
+        ]
+        assert [tuple(key) for key in parse_sort("-title")] == [("title", True), ("id", True)]
+        assert [tuple(key) for key in parse_sort("-id")] == [("id", True)]
+
+    def test_unknown_repeated_or_too_many_keys_are_rejected(self):
+        for sort in ("description", "price,price", "price,id", "title,price,-title"):
+            with pytest.raises(ValueError):
+                parse_sort(sort)
+        assert client.get("/movies", params={"sort": "description"}).status_code == 400
+
+    def test_prefix_upper_bound(self):
+        assert prefix_upper_bound("Sorted ") == "Sorted!"
+        assert prefix_upper_bound("az") == "a{"
+
+
+class TestQueryPlans:
+
+    @pytest.mark.parametrize("sort", ["price", "-price", "title", "-title", "price,title", "price,-title",
+                                      "-price,title", "title,price", "title,-price", "-title,-price"])
+    def test_every_sort_reads_an_index_in_order(self, sort):
+        first = parse_sort(sort)[0].field
+        after = [8000.0 if key.field == "price" else "M" if key.field == "title" else 1 for key in parse_sort(sort)]
+        for plan in (_query_plan(MovieFilter(), sort), _query_plan(MovieFilter(), sort, after)):
+            assert len(plan) == 1 and "COVERING INDEX" in plan[0], plan
+            assert "TEMP B-TREE" not in " ".join(plan)
+        # past the first page the index is searched from the cursor on, not scanned from the start
+        assert f"({first}" in _query_plan(MovieFilter(), sort, after)[0]
+
+    @pytest.mark.parametrize("movie_filter,sort", [
+        (MovieFilter(title_prefix="Sorted "), "title"),
+        (MovieFilter(title_prefix="Sorted "), "-title,price"),
+        (MovieFilter(min_price=8000, max_price=8100), "price"),
+        (MovieFilter(min_price=8000, max_price=8100), "-price,title"),
+        (MovieFilter(title_prefix="Sorted ", max_price=9000), "title,-price"),
+        (MovieFilter(subtitle="Sorted"), "-id"),
+    ])
+    def test_filters_search_an_index(self, movie_filter, sort):
+        plan = _query_plan(movie_filter, sort)
+        assert all(line.startswith("SEARCH movies USING") and "INDEX" in line for line in plan), plan
+        assert "TEMP B-TREE" not in " ".join(plan)
+
+
+class TestFilteredSortedPages:
+
+    def test_sort_by_price_then_title_descending(self):
+        titles = [movie["title"] for movie in _get(sort="price,-title", limit=50).json()]
+        assert titles == ["sorted golf", "Sorted Charlie", "Sorted Alpha", "Sorted Foxtrot", "Sorted Echo",
+                          "Sorted Bravo", "Sorted Delta"]
+
+    def test_cursor_pages_cover_the_sort_once(self):
+        expected = [movie["id"] for movie in _get(sort="-price,title", limit=50).json()]
+        seen, cursor = [], None
+        while True:
+            params = {"sort": "-price,title", "limit": 2}
+            if cursor:
+                params["cursor"] = cursor
+            response = _get(**params)
+            seen += [movie["id"] for movie in response.json()]
+            cursor = response.headers.get("x-next-cursor")
+            if cursor is None:
+                break
+        assert seen == expected and len(seen) == len(SORTED_MOVIES)
+
+    def test_cursor_of_another_sort_is_rejected(self):
+        cursor = _get(sort="price", limit=1).headers["x-next-cursor"]
+        assert client.get("/movies", params={"sort": "title", "cursor": cursor}).status_code == 400
+
+    def test_title_prefix_is_a_case_sensitive_prefix(self):
+        titles = [movie["title"] for movie in _get(title_prefix="Sorted ", sort="-title").json()]
+        assert titles == sorted((title for title, _, _ in SORTED_MOVIES if title.startswith("Sorted ")), reverse=True)
+
+    def test_price_range_with_a_sort_and_fields(self):
+        movies = _get(min_price=8010, max_price=8020, sort="title", fields="title,price").json()
+        assert [movie["title"] for movie in movies] == ["Sorted Alpha", "Sorted Bravo", "Sorted Charlie",
+                                                        "Sorted Echo", "Sorted Foxtrot"]
+        assert set(movies[0]) == {"id", "title", "price"}
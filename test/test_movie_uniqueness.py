@@ -0,0 +1,57 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from starlette.testclient import TestClient
+
+from main import app
+from sql_app.migrations import DuplicateMoviesError, add_movie_title_subtitle_unique_index, dedupe_movies
+from sql_app.repositories.movie_repository import MovieRepo
+from sql_app.schemas.movie_schema import MovieCreate
+from sqlite_db.sqlite import SessionLocal
+
+client = TestClient(app)
+
+
+class TestMovieUniqueness:
+
+    def test_create_rejects_existing_title_and_subtitle(self):
+        key = client.post("/keys", json={"domain": "http://unique.test"}).json()["public"]
+        headers = {"authorization": "Bearer " + key}
+        movie = {"title": "Unique Title", "subtitle": "Unique Subtitle", "price": 3.0}
+        assert client.post("/movies", json=movie, headers=headers).status_code == 201
+        duplicate = client.post("/movies", json=movie, headers=headers)
+        assert duplicate.status_code == 400
+        assert duplicate.json()["detail"] == "Movie already exists!"
+        other_title = dict(movie, title="Another Unique Title")
+        assert client.post("/movies", json=other_title, headers=headers).status_code == 201
+
+    def test_missing_subtitles_are_equal(self):
+        db = SessionLocal()
+        assert MovieRepo.create(db, MovieCreate(title="No Subtitle", price=1.0)) is not None
+        assert MovieRepo.create(db, MovieCreate(title="No Subtitle", price=2.0)) is None
+        assert MovieRepo.fetch_by_title_and_subtitle(db, "No Subtitle", None).price == 1.0
+        db.close()
+
+    def test_migration_stops_on_existing_duplicates_until_they_are_renamed(self):
+        engine = create_engine("sqlite://", poolclass=StaticPool)
+        with engine.begin() as connection:
+            connection.execute(text(
+                "CREATE TABLE movies (id INTEGER PRIMARY KEY, title VARCHAR(100) NOT NULL, "
+                "subtitle VARCHAR(150), price FLOAT NOT NULL, description VARCHAR(200))"
+            ))
+            connection.execute(text(
+                "INSERT INTO movies (title, subtitle, price) VALUES "
+                "('Twin', 'A', 1), ('Twin', 'A', 2), ('Twin', NULL, 3), ('Twin', NULL, 4), ('Solo', 'A', 5)"
+            ))
+        with pytest.raises(DuplicateMoviesError) as error:
+            add_movie_title_subtitle_unique_index(engine)
+        assert error.value.groups == {("Twin", ""): [3, 4], ("Twin", "A"): [1, 2]}
+        assert "dedupe-movies" in str(error.value)
+
+        assert dedupe_movies(engine) == [(4, "(copy 4)"), (2, "A (copy 2)")]
+        add_movie_title_subtitle_unique_index(engine)
+        add_movie_title_subtitle_unique_index(engine)
+        with sessionmaker(bind=engine)() as db:
+            rows = db.execute(text("SELECT subtitle, price FROM movies ORDER BY id")).all()
+        assert rows == [("A", 1), ("A (copy 2)", 2), (None, 3), ("(copy 4)", 4), ("A", 5)]
@@ -0,0 +1,62 @@
+import json
+
+import pytest
+from starlette.testclient import TestClient
+
+from main import app
+from sql_app.models.movie_model import Movie
+from sql_app.pagination import decode_cursor, encode_cursor
+from sql_app.repositories.movie_repository import MovieRepo
+from sql_app.schemas.movie_schema import MovieCreate
+from sqlite_db.sqlite import SessionLocal
+
+client = TestClient(app)
+
+
+@pytest.fixture(scope="module")
+def catalog_size():
+    db = SessionLocal()
+    for number in range(7):
+        MovieRepo.create(db, MovieCreate(title=f"Paged {number}", subtitle="Pagination", price=float(number)))
+    size = db.query(Movie).count()
+    db.close()
+    return size
+
+
+class TestPagination:
+
+    def test_cursor_round_trip(self):
+        assert decode_cursor(encode_cursor(42)) == 42
+        assert decode_cursor(None) is None
+        with pytest.raises(ValueError):
+            decode_cursor("not-a-cursor")
+
+    def test_walks_every_page_with_next_cursor(self, catalog_size):
+        seen = []
+        cursor = None
+        while True:
+            params = {"limit": 200}
+            if cursor:
+                params["cursor"] = cursor
+            response = client.get("/movies", params=params)
+            assert response.status_code == 200
+            page = response.json()
+            assert len(page) <= 200
+            seen.extend(movie["id"] for movie in page)
+            cursor = response.headers.get("X-Next-Cursor")
+            if cursor is None:
+                break
+            assert 'rel="next"' in response.headers["Link"]
+        assert seen == sorted(set(seen))
+        assert len(seen) == catalog_size
+
+    def test_rejects_invalid_cursor_and_oversized_pages(self):
+        assert client.get("/movies", params={"cursor": "bogus"}).status_code == 400
+        assert client.get("/movies", params={"limit": 100000}).status_code == 422
+
+    def test_exports_whole_catalog(self, catalog_size):
+        ndjson = client.get("/movies/export")
+        assert ndjson.headers["content-type"].startswith("application/x-ndjson")
+        assert len(ndjson.text.splitlines()) == catalog_size
+        array = client.get("/movies/export", params={"format": "json"})
+        assert [movie["id"] for movie in array.json()] == [json.loads(line)["id"] for line in ndjson.text.splitlines()]
@@ -0,0 +1,54 @@
+import marshal
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from monitoring.slow_queries import slow_queries
+
+ADMIN_KEY = "test-admin-key"
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def admin_key(monkeypatch):
+    monkeypatch.setenv("ADMIN_API_KEY", ADMIN_KEY)
+
+
+@pytest.mark.parametrize("mode", ["cprofile", "sample"])
+def test_profiled_request_records_profile_and_sql(mode):
+    response = client.get("/movies?limit=5", headers={"X-Profile": mode, "X-Admin-Key": ADMIN_KEY})
+    assert response.status_code == 200
+    profile_id = response.headers["x-profile-id"]
+
+    profile = client.get(f"/admin/profiles/{profile_id}", headers={"X-Admin-Key": ADMIN_KEY}).json()
+    assert profile["mode"] == mode
+    assert profile["path"] == "/movies"
+    assert profile["status"] == 200
+    assert profile["sql_statements"] == len(profile["statements"]) >= 1
+    assert any("FROM movies" in statement["statement"] for statement in profile["statements"])
+
+    raw = client.get(f"/admin/profiles/{profile_id}?format=raw", headers={"X-Admin-Key": ADMIN_KEY})
+    if mode == "cprofile":
+        assert "function calls" in profile["report"]
+        assert isinstance(marshal.loads(raw.content), dict)
+
+
+def test_profiling_requires_the_admin_key():
+    response = client.get("/movies?limit=5", headers={"X-Profile": "cprofile", "X-Admin-Key": "wrong"})
+    assert response.status_code == 200
+    assert "x-profile-id" not in response.headers
+    assert client.get("/admin/profiles", headers={"X-Admin-Key": "wrong"}).status_code == 403
+    assert client.get("/admin/slow-queries").status_code == 403
+
+
+def test_slow_query_log_keeps_query_plan(monkeypatch):
+    monkeypatch.setattr(slow_queries, "threshold_ms", 0)
+    slow_queries.clear()
+    client.get("/movies?limit=5")
+    monkeypatch.setattr(slow_queries, "threshold_ms", 100)
+
+    logged = client.get("/admin/slow-queries", headers={"X-Admin-Key": ADMIN_KEY}).json()["queries"]
+    select = next(entry for entry in logged if entry["statement"].lstrip().startswith("SELECT"))
+    assert select["plan"]
+    assert any("movies" in step for step in select["plan"])
@@ -0,0 +1,117 @@
+import sqlite3
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from main import app
+from sql_app.repositories.api_key_repository import ApiKeyRepo
+from sql_app.security.rate_limit_middleware import RateLimitMiddleware
+from sql_app.security.rate_limiter import MemoryBuckets, RateLimit, RateLimiter, SqliteBuckets
+
+ADMIN_KEY = "test-admin-key"
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_refills_over_time():
+    timer = FakeTimer()
+    buckets = MemoryBuckets(timer=timer)
+    limit = RateLimit(per_minute=60, burst=2)
+    assert buckets.take("k", limit).allowed
+    assert buckets.take("k", limit).remaining == 0
+    denied = buckets.take("k", limit)
+    assert not denied.allowed
+    assert denied.retry_after == 1.0
+    timer.now += 1
+    assert buckets.take("k", limit).allowed
+    assert buckets.take("other", limit).allowed
+
+
+def test_sqlite_buckets_are_shared_between_workers(tmp_path):
+    timer = FakeTimer()
+    path = str(tmp_path / "rate_limits.db")
+    first, second = SqliteBuckets(path, timer=timer), SqliteBuckets(path, timer=timer)
+    limit = RateLimit(per_minute=60, burst=2)
+    assert first.take("k", limit).allowed
+    assert second.take("k", limit).allowed
+    assert not first.take("k", limit).allowed
+    first.close()
+    second.close()
+
+
+def test_sqlite_buckets_fail_open_when_the_file_is_locked(tmp_path):
+    path = str(tmp_path / "rate_limits.db")
+    buckets = SqliteBuckets(path, busy_timeout=0.05)
+    holder = sqlite3.connect(path, isolation_level=None)
+    holder.execute("BEGIN IMMEDIATE")
+    started = time.perf_counter()
+    decision = buckets.take("k", RateLimit(per_minute=60, burst=2))
+    assert time.perf_counter() - started < 1.0
+    assert decision.allowed and buckets.failed_open == 1
+    holder.execute("ROLLBACK")
+    holder.close()
+    buckets.close()
+
+
+def limited_client(limiter: RateLimiter) -> TestClient:
+    limited = FastAPI()
+    limited.add_middleware(RateLimitMiddleware, limiter=limiter)
+
+    @limited.get("/ping")
+    def ping():
+        return {"pong": True}
+
+    return TestClient(limited)
+
+
+def test_anonymous_requests_get_429_with_retry_after():
+    client = limited_client(RateLimiter(MemoryBuckets(), RateLimit(600, 100), RateLimit(60, 2)))
+    first = client.get("/ping")
+    assert first.status_code == 200
+    assert first.headers["ratelimit-limit"] == "2"
+    assert first.headers["ratelimit-remaining"] == "1"
+    client.get("/ping")
+    rejected = client.get("/ping")
+    assert rejected.status_code == 429
+    assert rejected.headers["retry-after"] == "1"
+    assert rejected.headers["ratelimit-remaining"] == "0"
+
+
+def test_api_key_uses_its_domain_limit(monkeypatch):
+    monkeypatch.setenv("ADMIN_API_KEY", ADMIN_KEY)
+    api = TestClient(app)
+    key = api.post("/keys", json={"domain": "ratelimited.example.com"}).json()
+    response = api.put(
+        "/admin/keys/ratelimited.example.com/rate-limit",
+        json={"rate_limit_per_minute": 60, "rate_limit_burst": 1},
+        headers={"X-Admin-Key": ADMIN_KEY},
+    )
+    assert response.json() == {"rate_limit_per_minute": 60, "rate_limit_burst": 1}
+
+    client = limited_client(RateLimiter(MemoryBuckets(), RateLimit(600, 100), RateLimit(60, 5)))
+    headers = {"Authorization": key["public"]}
+    assert client.get("/ping", headers=headers).status_code == 200
+    assert client.get("/ping", headers=headers).status_code == 429
+    # a key's bucket is separate from the anonymous one
+    assert client.get("/ping").status_code == 200
+
+
+def test_unknown_tokens_spend_the_address_bucket_and_are_looked_up_once(monkeypatch):
+    lookups = []
+    monkeypatch.setattr(ApiKeyRepo, "fetch_by_digest", lambda db, digest: lookups.append(digest))
+    client = limited_client(RateLimiter(MemoryBuckets(), RateLimit(600, 100), RateLimit(60, 2)))
+    headers = {"Authorization": "made-up-token"}
+    assert client.get("/ping", headers=headers).status_code == 200
+    assert client.get("/ping", headers=headers).status_code == 200
+    assert client.get("/ping", headers=headers).status_code == 429
+    assert len(lookups) == 1
+    # and a rejected address gets no lookup for a fresh token either
+    assert client.get("/ping", headers={"Authorization": "another-made-up-token"}).status_code == 429
+    assert len(lookups) == 1
@@ -0,0 +1,57 @@
+from sqlalchemy import text
+from starlette.testclient import TestClient
+
+from main import app
+from sql_app.migrations import rebuild_movie_search_index
+from sql_app.repositories.movie_repository import MovieRepo, match_query
+from sql_app.schemas.movie_schema import MovieCreate
+from sqlite_db.sqlite import SessionLocal, engine
+
+client = TestClient(app)
+
+
+def _create_movie(**fields):
+    db = SessionLocal()
+    movie = MovieRepo.create(db, MovieCreate(price=5.0, **fields))
+    db.close()
+    return movie
+
+
+class TestSearch:
+
+    def test_match_query_quotes_user_input(self):
+        assert match_query('star "wars" OR -') == '"star"* "wars"* "OR"*'
+        assert match_query("   ") == ""
+
+    def test_ranks_title_matches_first_with_snippets(self):
+        _create_movie(title="Nebula Drift", subtitle="Space", description="A quiet film")
+        _create_movie(title="Harbour Lights", subtitle="Drama", description="Sailors lost in a nebula storm")
+        response = client.get("/movies/search", params={"q": "nebu"})
+        assert response.status_code == 200
+        results = response.json()
+        assert [result["title"] for result in results[:2]] == ["Nebula Drift", "Harbour Lights"]
+        assert "<mark>" in results[1]["snippet"]
+
+    def test_snippet_escapes_movie_text(self):
+        _create_movie(title="Quasar Markup", subtitle="Escaping",
+                      description='Pulsar <img src=x onerror="alert(1)"> & more')
+        result = client.get("/movies/search", params={"q": "pulsar"}).json()[0]
+        assert result["snippet"] == "<mark>Pulsar</mark> &lt;img src=x onerror=&quot;alert(1)&quot;&gt; &amp; more"
+
+    def test_index_follows_updates_and_deletes(self):
+        movie = _create_movie(title="Glacier Run", subtitle="Ice", description="Cold")
+        db = SessionLocal()
+        db_movie = MovieRepo.fetch_movie_by_id(db, movie.id)
+        db_movie.title = "Volcano Run"
+        MovieRepo.update(db, db_movie)
+        assert client.get("/movies/search", params={"q": "glacier"}).json() == []
+        assert client.get("/movies/search", params={"q": "volcano"}).json()[0]["id"] == movie.id
+        MovieRepo.delete(db, movie.id)
+        db.close()
+        assert client.get("/movies/search", params={"q": "volcano"}).json() == []
+
+    def test_rebuild_restores_rows_loaded_without_triggers(self):
+        with engine.begin() as connection:
+            connection.execute(text("INSERT INTO movies_fts(movies_fts) VALUES ('delete-all')"))
+            rebuild_movie_search_index(connection)
+        assert client.get("/movies/search", params={"q": "nebula drift"}).json()[0]["title"] == "Nebula Drift"
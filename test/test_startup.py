@@ -0,0 +1,48 @@
+import os
+import sqlite3
+import subprocess
+import sys
+
+from main import after_fork
+from sql_app.security.rate_limiter import RateLimit, RateLimiter, SqliteBuckets
+from sqlite_db.sqlite import ReadSessionLocal, read_engine
+
+REPOSITORY_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestStartup:
+
+    def test_importing_the_app_leaves_the_schema_alone(self, tmp_path):
+        database = str(tmp_path / "untouched.db")
+        env = dict(os.environ, SQLITE_PATH=database, RATE_LIMIT_ENABLED="0")
+        subprocess.run([sys.executable, "-c", "import main"], cwd=REPOSITORY_ROOT, env=env, check=True)
+        connection = sqlite3.connect(database)
+        try:
+            tables = connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()
+        finally:
+            connection.close()
+        assert tables == []
+
+    def test_after_fork_drops_inherited_connections(self):
+        db = ReadSessionLocal()
+        db.execute("SELECT 1")
+        db.close()
+        pool = read_engine.pool
+        assert pool.checkedin() >= 1
+
+        after_fork()
+        assert read_engine.pool is not pool and read_engine.pool.checkedin() == 0
+        db = ReadSessionLocal()
+        try:
+            assert db.execute("SELECT 1").scalar() == 1
+        finally:
+            db.close()
+
+    def test_sqlite_buckets_reopen_keep_their_state(self, tmp_path):
+        limiter = RateLimiter(SqliteBuckets(str(tmp_path / "limits.db")), RateLimit(60, 2), RateLimit(60, 2))
+        inherited = limiter.buckets._connection
+        assert limiter.check_key(1).remaining == 1
+
+        limiter.after_fork()
+        assert limiter.buckets._connection is not inherited
+        assert limiter.check_key(1).remaining == 0
@@ -0,0 +1,132 @@
+import asyncio
+
+from starlette.testclient import TestClient
+
+from main import app
+from sql_app.events import catalog_events
+from sql_app.repositories.movie_repository import MovieRepo
+from sql_app.schemas.movie_schema import MovieCreate
+from sql_app.write_batcher import WriteBatcher, write_batcher
+from sqlite_db.sqlite import ReadSessionLocal
+
+
+def _movie(title: str) -> MovieCreate:
+    return MovieCreate(title=title, subtitle="Group commit", price=4.5, description="Batched")
+
+
+def _failing_write(db, commit=True):
+    MovieRepo.create(db, _movie("Batcher rolled back"), commit=commit)
+    raise RuntimeError("write failed")
+
+
+def _titles_in_database(titles):
+    db = ReadSessionLocal()
+    try:
+        return {title for title in titles if MovieRepo.fetch_by_title(db, title) is not None}
+    finally:
+        db.close()
+
+
+class TestWriteBatcher:
+
+    def test_concurrent_writes_share_one_commit(self):
+        batcher = WriteBatcher(max_delay=0.05)
+        titles = [f"Batcher coalesced {number}" for number in range(8)]
+
+        async def scenario():
+            return await asyncio.gather(*(batcher.submit(MovieRepo.create, _movie(title)) for title in titles))
+
+        movies = asyncio.run(scenario())
+        assert [movie.title for movie in movies] == titles
+        assert len({movie.id for movie in movies}) == len(titles)
+        assert (batcher.batches, batcher.writes) == (1, len(titles))
+        assert _titles_in_database(titles) == set(titles)
+
+    def test_max_batch_splits_batches(self):
+        batcher = WriteBatcher(max_delay=0.05, max_batch=3)
+
+        async def scenario():
+            return await asyncio.gather(
+                *(batcher.submit(MovieRepo.create, _movie(f"Batcher split {number}")) for number in range(7))
+            )
+
+        assert all(movie is not None for movie in asyncio.run(scenario()))
+        assert batcher.batches == 3
+
+    def test_failed_write_does_not_affect_the_others(self):
+        batcher = WriteBatcher(max_delay=0.05)
+        published = []
+        listener = lambda change: published.append(tuple(change))
+        catalog_events.subscribe(listener)
+
+        async def scenario():
+            return await asyncio.gather(
+                batcher.submit(MovieRepo.create, _movie("Batcher survivor 1")),
+                batcher.submit(_failing_write),
+                batcher.submit(MovieRepo.create, _movie("Batcher survivor 2")),
+                return_exceptions=True,
+            )
+
+        try:
+            first, failed, second = asyncio.run(scenario())
+        finally:
+            catalog_events.unsubscribe(listener)
+        assert isinstance(failed, RuntimeError)
+        assert batcher.batches == 1
+        assert _titles_in_database(["Batcher survivor 1", "Batcher survivor 2", "Batcher rolled back"]) == {
+            "Batcher survivor 1", "Batcher survivor 2"
+        }
+        # only the committed writes are announced, and only once the batch committed
+        assert published == [("created", first.id), ("created", second.id)]
+
+    def test_duplicate_resolves_to_none(self):
+        batcher = WriteBatcher(max_delay=0.05)
+
+        async def scenario():
+            return await asyncio.gather(
+                batcher.submit(MovieRepo.create, _movie("Batcher duplicate")),
+                batcher.submit(MovieRepo.create, _movie("Batcher duplicate")),
+            )
+
+        created, duplicate = asyncio.run(scenario())
+        assert created is not None and duplicate is None
+
+    def test_max_batch_of_one_commits_every_write(self):
+        batcher = WriteBatcher(max_delay=0.05, max_batch=1)
+
+        async def scenario():
+            return await asyncio.gather(
+                *(batcher.submit(MovieRepo.create, _movie(f"Batcher single {number}")) for number in range(3))
+            )
+
+        asyncio.run(scenario())
+        assert batcher.batches == 3
+
+    def test_concurrent_deletes_of_one_movie(self):
+        batcher = WriteBatcher(max_delay=0.05)
+
+        async def scenario():
+            movie = await batcher.submit(MovieRepo.create, _movie("Batcher deleted twice"))
+            return await asyncio.gather(
+                batcher.submit(MovieRepo.delete, movie.id),
+                batcher.submit(MovieRepo.delete, movie.id),
+            )
+
+        # the second DELETE finds nothing instead of failing the batch
+        assert asyncio.run(scenario()) == [True, False]
+        assert _titles_in_database(["Batcher deleted twice"]) == set()
+
+    def test_key_endpoints_write_through_the_batcher(self, monkeypatch):
+        # requests never hold the writer connection themselves, so they cannot starve a batch
+        monkeypatch.setenv("ADMIN_API_KEY", "test-admin-key")
+        client = TestClient(app)
+        key = client.post("/keys", json={"domain": "batcher-keys.example.com"}).json()
+        writes = write_batcher.writes
+        limited = client.put(
+            "/admin/keys/batcher-keys.example.com/rate-limit", headers={"X-Admin-Key": "test-admin-key"},
+            json={"rate_limit_per_minute": 30, "rate_limit_burst": 3},
+        )
+        assert limited.json() == {"rate_limit_per_minute": 30, "rate_limit_burst": 3}
+        deleted = client.delete("/keys/batcher-keys.example.com", headers={"Authorization": key["public"]})
+        assert deleted.status_code == 200
+        assert write_batcher.writes == writes + 2